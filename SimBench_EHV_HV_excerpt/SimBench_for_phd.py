@@ -1,5 +1,7 @@
 import typing
 import os
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 import pandapower as pp
@@ -33,7 +35,8 @@ def SimBench_for_phd(
     Parameters
     ----------
     time_steps : typing.Any, optional
-        list of time steps to be included in net.profiles. Special values:
+        list of time steps or TimeSteps selection, e.g. TimeSteps.every(4), to be included in
+        net.profiles. Special values:
             True -> time steps of a complete year are included;
             False -> no net.profiles is provided;
             By default False
@@ -66,10 +69,76 @@ def SimBench_for_phd(
     pp.pandapowerNet
         _description_
     """
-    if control not in ["LocalCtrl", "QofV", "QofV_old", "NoControl", None]:
-        logger.warning(f"{control=} is unknown and thus ignored.")
-        control = None
+    net = SimBench_for_phd_base_net(time_steps=time_steps, from_json=from_json, **kwargs)
+    apply_scenario_options(net, merged_same_bus_gens=merged_same_bus_gens, control=control,
+                           wbb=wbb, ehv_grids=ehv_grids, fixed_p=kwargs.get("fixed_p", True))
+    return net
+
+
+def SimBench_for_phd_base_net(
+        time_steps:typing.Any = False,
+        from_json:bool = True,
+        **kwargs
+    ) -> pp.pandapowerNet:
+    """Returns the net of SimBench_for_phd() before any scenario options (cf.
+    apply_scenario_options()) are applied. This base net can be shared by multiple scenarios.
+
+    Parameters
+    ----------
+    time_steps : typing.Any, optional
+        list of time steps to be included in net.profiles, cf. SimBench_for_phd(), by default False
+    from_json : bool, optional
+        whether the net should be loaded from json file or, if False,
+        created by calculations, by default True
 
+    Other Parameters
+    ----------------
+    profiles_folder : str | None, optional
+        folder of the parquet profiles if from_json is True, by default None
+
+    simbench_profiles_folder : str | None, optional
+        cache folder of the load and sgen profiles which are not bundled with this repository and
+        thus generated from SimBench if from_json is True, cf. add_profiles_from_parquet_to_net(),
+        by default None
+
+    fast_reduce_ehv : bool, optional
+        if from_json is False, the boundary flows which become the ExtL_* load profiles are
+        calculated by linearized AC sensitivities instead of an AC time series, cf. reduce_ehv(),
+        by default False
+
+    run_gen_timeseries : bool, optional
+        if from_json is False, the time series with distributed slack which determines the
+        gen.p_mw and gen.vm_pu profiles is run instead of reading precalculated results,
+        by default False
+
+    gen_timeseries_chunk_size : int, optional
+        number of time steps per chunk of the gen time series, cf. run_chunked_timeseries(),
+        by default 96*7
+
+    gen_timeseries_folder : str | None, optional
+        folder to write the chunks of the gen time series to. If given, an interrupted time series
+        is resumed. If None, a temporary folder is used, by default None
+
+    n_jobs : int, optional
+        number of processes to run chunks of the gen time series in parallel. Parallel chunks
+        start with the controller state of the net, cf. run_chunked_timeseries(), by default 1
+
+    cache_folder : str | None, optional
+        if from_json is False, the outputs of the build stages (SimBench net, pre-manipulation,
+        gen time series, reduce_ehv, finalization) are cached in this folder and reused as long
+        as their inputs, parameters and code do not change, cf. ArtifactCache. If None, nothing
+        is cached, by default None
+
+    export_folder : str | None, optional
+        if from_json is False, the resulting net and its profiles are exported to this folder,
+        cf. export_net(). If None, nothing is exported, by default
+        os.path.join(home, "Desktop", "SimBench_EHV_HV_excerpt")
+
+    Returns
+    -------
+    pp.pandapowerNet
+        net without applied scenario options
+    """
     # --- only read from json file -----------------------------------------------------------------
     if from_json:
         net = pp.from_json(os.path.join(data_path, "net.json"))
@@ -80,137 +149,278 @@ def SimBench_for_phd(
             if col not in net[et].columns:
                 net[et][col] = False
 
-        add_profiles_from_parquet_to_net(net, time_steps, False, kwargs.get("profiles_folder", None))
+        add_profiles_from_parquet_to_net(
+            net, time_steps, False, kwargs.get("profiles_folder", None),
+            simbench_profiles_folder=kwargs.get("simbench_profiles_folder", None))
 
     # --- create net -------------------------------------------------------------------------------
     else:
-        # start creating the net
-        code = "1-EHVHV-mixed-all-0-no_sw"
-        net = sb.get_simbench_net(code)
-        boundary_buses, zone_boundary_buses, inner_buses = pre_manipulation_simbench_data(net)
-
-        # get variable "time_steps"
-        if time_steps is True:
-            time_steps = range(net.profiles["load.p_mw"].shape[0])
-        elif time_steps != False:
-            downcast_profiles(net.profiles)
-            reduce_profiles_by_time_steps(net.profiles, time_steps)
-
-        # -- timeseries run incl. distr. slack and gen.vm_pu profiles determination
-        if not time_steps:
-            del net["profiles"]
-
-        else:  # --- run timeseries incl. distributed_slack and gen.vm_pu
-            if 0:  # writing net to json may lead to memory error. Then you can restart the script
-                # setting this if clause to False
-                ds_idx = consider_distr_slack(net, initial_slack_distribution=False,
-                                              first_step_factor=2/3)
-                q_range_diff = net.gen.max_q_mvar - net.gen.min_q_mvar
-
-                # add some "safety gap" around timeseries for resulting gen.vm_pu by enforce_q_lims
-                net.gen["max_q_mvar"] -= q_range_diff*0.01
-                net.gen["min_q_mvar"] += q_range_diff*0.01
-
-                res = run_custom_timeseries(net, time_steps, None, enforce_q_lims=True,
-                    add_output_vals=[("gen", "p_mw"), ("gen", "vm_pu")])
-
-                # remove back the "safety gap"
-                net.gen["max_q_mvar"] += q_range_diff*0.01
-                net.gen["min_q_mvar"] -= q_range_diff*0.01
-
-                # remove back the distr slack controller
-                net.controller = net.controller.drop(ds_idx)
-
-            else:  # don't run time consuming time series but use precalculated gen ts results
-                jsons_path = os.path.join(data_path, "net_creation_timeseries_results")
-                res = read_ts_results_from_json(jsons_path)
-
-            # add gen.vm_pu and gen.p_mw to profiles
-            gen_vm_key = "res_gen.vm_pu" if "res_gen.vm_pu" in res.keys() else "gen.vm_pu"
-            net.profiles["gen.vm_pu"] = res[gen_vm_key][net.gen.index]
-            gen_p_key = "res_gen.p_mw" if "res_gen.p_mw" in res.keys() else "gen.p_mw"
-            net.profiles["gen.p_mw"] = res[gen_p_key][net.gen.index]
-            del res
-
-            # downcast profiles
-            downcast_profiles(net.profiles)
-
-            # -- reduce the net to the relevant part
-            logger.info("reduce_ehv() starts.")
-            net = reduce_ehv(net, time_steps, boundary_buses, zone_boundary_buses, inner_buses)
-
-            # set first time_step to power columns and remove results from time series
-            set_time_step(net, time_steps[0])
-            pp.clear_result_tables(net)
-
-        for elm in ["bus", "res_bus"]:
-            net[elm] = net[elm].sort_index()
-
-        # change parallel appearance
-        sb.convert_parallel_branches(
-            net, multiple_entries=False, elm_to_convert=["trafo"],
-            exclude_cols_from_parallel_finding=net.trafo.columns.difference(
-                {"hv_bus", "lv_bus", "vn_hv_kv", "vn_lv_kv", "std_type"}))
-
-        # add origin_id
-        for elm in pp.pp_elements():
-            net[elm]["origin_id"] = net[elm].name
-
-        # controllable sgens
-        net.sgen["controllable"] = ~net.sgen.profile.str.startswith("mv_")
-        ctrl_sgens = net.sgen.index[net.sgen["controllable"]]
-
-        # q constraint information (VDE 4130 & 4120)
-        net["sgen"]["qcurve1"] = ""
-        sgens4120 = pd.Index(sb.voltlvl_idx(net, "sgen", 3)).intersection(ctrl_sgens)
-        sgens4130_220 = net.sgen.index[(net.bus.vn_kv.loc[net.sgen.bus] > 145).values &
-                                       (net.bus.vn_kv.loc[net.sgen.bus] < 255).values &
-                                       net.sgen.controllable]
-        sgens4130_380 = net.sgen.index[(net.bus.vn_kv.loc[net.sgen.bus] > 255).values &
-                                       net.sgen.controllable]
-        net["sgen"].loc[sgens4120, "qcurve1"] = "4120_v2"
-        net["sgen"].loc[sgens4130_220, "qcurve1"] = "4130_220_v2"
-        net["sgen"].loc[sgens4130_380, "qcurve1"] = "4130_380_v2"
-
-        # add slack_weight column to sgens
-        net.sgen["slack_weight"] = 0.
-        net.sgen["slack_weight"] = net.sgen["slack_weight"].astype(float)
-
-        # add name to net
-        net.name = "SimBench_EHV_HV_excerpt"
-
-        # --- store resulting net and profiles to json and h5 file
-        _store_files_to_desktop(net)
+        net = _create_net(time_steps, **kwargs)
 
     # --- create end -------------------------------------------------------------------------------
 
+    return net
+
+
+def _create_net(time_steps:typing.Any, **kwargs) -> pp.pandapowerNet:
+    """Creates the net from SimBench data by a pipeline of stages. If kwargs["cache_folder"] is
+    given, the stage outputs are cached there and a rebuild only reruns the stages whose inputs,
+    parameters or code changed, cf. ArtifactCache.
+    """
+    cache = ArtifactCache(kwargs.get("cache_folder", None))
+
+    # start creating the net
+    net = cache.run("simbench_net", simbench_grid, params={"code": SIMBENCH_CODE},
+                    salt=sb.__version__)
+    net = cache.run("pre_manipulation", _stage_pre_manipulation, net, code=[
+        pre_manipulation_simbench_data, set_bus_zones,
+        repl_ext_grid_by_gen_slack_weight_consideration, TopologyIndex])
+
+    # get variable "time_steps"
+    if time_steps is True:
+        time_steps = range(net.value[0].profiles["load.p_mw"].shape[0])
+    elif isinstance(time_steps, TimeSteps):
+        time_steps = time_steps.resolve(net.value[0].profiles["load.p_mw"].index)
+    time_steps = list() if time_steps is None or time_steps is False else list(time_steps)
+
+    # -- timeseries run incl. distr. slack and gen.vm_pu profiles determination
+    if not time_steps:
+        net = cache.run("without_profiles", _stage_without_profiles, net, store=False)
+
+    else:  # --- run timeseries incl. distributed_slack and gen.vm_pu
+        net = cache.run("time_steps", _stage_time_steps, net, params={"time_steps": time_steps},
+                        store=False)
+        res = cache.run("gen_timeseries", _stage_gen_timeseries, net, params={
+            "time_steps": time_steps,
+            "run_timeseries": kwargs.get("run_gen_timeseries", False),
+            "chunk_size": kwargs.get("gen_timeseries_chunk_size", 96*7)}, unkeyed_params={
+            "folder": kwargs.get("gen_timeseries_folder", None),
+            "n_jobs": kwargs.get("n_jobs", 1)}, code=[
+            _gen_timeseries, run_chunked_timeseries, run_custom_timeseries, consider_distr_slack])
+        net = cache.run("reduce_ehv", _stage_reduce_ehv, net, res, params={
+            "time_steps": time_steps, "fast": kwargs.get("fast_reduce_ehv", False)}, code=[
+            reduce_ehv, TopologyIndex, linearized_line_flows, LineFlowSensitivities])
+
+    net = cache.run("finalize", _stage_finalize, net).value
+
+    # --- store resulting net and profiles to json and parquet files
+    export_folder = kwargs.get("export_folder", os.path.join(
+        home, "Desktop", "SimBench_EHV_HV_excerpt"))
+    if export_folder is not None:
+        export_net(net, export_folder)
+    return net
+
+
+def _stage_pre_manipulation(net:pp.pandapowerNet) -> tuple[pp.pandapowerNet, set, set, set]:
+    boundary_buses, zone_boundary_buses, inner_buses = pre_manipulation_simbench_data(net)
+    return net, boundary_buses, zone_boundary_buses, inner_buses
+
+
+def _stage_without_profiles(pre:tuple) -> pp.pandapowerNet:
+    net = pre[0]
+    del net["profiles"]
+    return net
+
+
+def _stage_time_steps(pre:tuple, time_steps:list[int]) -> tuple[pp.pandapowerNet, set, set, set]:
+    net = pre[0]
+    if len(time_steps) < net.profiles["load.p_mw"].shape[0]:
+        downcast_profiles(net.profiles)
+        reduce_profiles_by_time_steps(net.profiles, time_steps)
+    return pre
+
+
+def _stage_gen_timeseries(pre:tuple, time_steps:list[int], run_timeseries:bool=False,
+                          chunk_size:int=96*7, folder:str|None=None,
+                          n_jobs:int=1) -> dict[str, pd.DataFrame]:
+    net = pre[0]
+    if run_timeseries:
+        res = _gen_timeseries(net, time_steps, chunk_size=chunk_size, folder=folder,
+                              n_jobs=n_jobs)
+    else:  # don't run time consuming time series but use precalculated gen ts results
+        jsons_path = os.path.join(data_path, "net_creation_timeseries_results")
+        res = read_ts_results_from_json(jsons_path)
+
+    # gen.vm_pu and gen.p_mw profiles
+    gen_vm_key = "res_gen.vm_pu" if "res_gen.vm_pu" in res.keys() else "gen.vm_pu"
+    gen_p_key = "res_gen.p_mw" if "res_gen.p_mw" in res.keys() else "gen.p_mw"
+    return {"gen.vm_pu": res[gen_vm_key][net.gen.index],
+            "gen.p_mw": res[gen_p_key][net.gen.index]}
+
+
+def _gen_timeseries(net:pp.pandapowerNet, time_steps:list[int], chunk_size:int=96*7,
+                    folder:str|None=None, n_jobs:int=1) -> dict[str, pd.DataFrame]:
+    """Runs the time series with distributed slack and enforced reactive power limits whose
+    generator results become the gen.p_mw and gen.vm_pu profiles. The time steps are run in
+    chunks whose results are written to parquet files in folder, cf. run_chunked_timeseries().
+    If folder is given, an interrupted time series can be resumed, otherwise a temporary folder
+    is used.
+    """
+    if distr_slack_available():
+        ds_idx = consider_distr_slack(net, initial_slack_distribution=False,
+                                      first_step_factor=2/3)
+        pf_kwargs = dict()
+    else:
+        logger.info("pandaplan-core is not available. Thus, the distributed slack is considered "
+                    "by pandapower's runpp(distributed_slack=True).")
+        ds_idx = pd.Index([])
+        pf_kwargs = {"distributed_slack": True}
+    q_range_diff = net.gen.max_q_mvar - net.gen.min_q_mvar
+
+    # add some "safety gap" around timeseries for resulting gen.vm_pu by enforce_q_lims
+    net.gen["max_q_mvar"] -= q_range_diff*0.01
+    net.gen["min_q_mvar"] += q_range_diff*0.01
+
+    tmp_folder = folder is None
+    if tmp_folder:
+        folder = tempfile.mkdtemp(prefix="gen_timeseries_")
+    try:
+        res = run_chunked_timeseries(
+            net, time_steps, folder, chunk_size=chunk_size, n_jobs=n_jobs, kernel="pp",
+            enforce_q_lims=True, output_vals=[("res_gen", "p_mw"), ("res_gen", "vm_pu")],
+            verbose=False, **pf_kwargs)
+    finally:
+        # remove back the "safety gap"
+        net.gen["max_q_mvar"] += q_range_diff*0.01
+        net.gen["min_q_mvar"] -= q_range_diff*0.01
+
+        # remove back the distr slack controller
+        net.controller = net.controller.drop(ds_idx)
+
+        if tmp_folder:
+            shutil.rmtree(folder, ignore_errors=True)
+    return res
+
+
+def _iter_boundary_flows(chunks:list[range]
+                         ) -> typing.Iterator[tuple[range, dict[str, pd.DataFrame]]]:
+    """Yields the flows over the boundary lines of SimBench's complete grid, which become the
+    profiles of the ExtL_* loads (columns named as the loads), per chunk of time steps. As in the
+    net creation (from_json=False), each chunk runs the gen time series with distributed slack,
+    cf. _gen_timeseries(), and the AC time series of reduce_ehv() with the resulting gen
+    profiles. Only the flows of the boundary lines are kept, so that the memory is bounded by the
+    results of one chunk.
+    """
+    net, boundary_buses, _, inner_buses = _stage_pre_manipulation(simbench_grid())
+    boundary_branches = boundary_lines(net, boundary_buses, inner_buses)
+    names = {direction: [f"ExtL_{idx}" for idx in boundary_branches[f"{direction[0]}_lines"]]
+             for direction in ["from", "to"]}
+    n_time_steps = net.profiles["load.p_mw"].shape[0]
+
+    # the AC time series uses downcasted profiles as _stage_reduce_ehv() while the gen time series
+    # uses the original profiles
+    profiles = dict(net.profiles)
+    downcast_profiles(profiles)
+    for chunk in chunks:
+        chunk = range(chunk.start, min(chunk.stop, n_time_steps))
+        res = _gen_timeseries(net, list(chunk), chunk_size=len(chunk))
+        gen_profiles = {"gen.vm_pu": res["res_gen.vm_pu"][net.gen.index],
+                        "gen.p_mw": res["res_gen.p_mw"][net.gen.index]}
+        downcast_profiles(gen_profiles)
+        res = boundary_line_flows(net, list(chunk), boundary_branches,
+                                  profiles={**profiles, **gen_profiles})
+        flows = dict()
+        for power, key in [("p_mw", "load.p_mw"), ("q_mvar", "load.q_mvar")]:
+            p_or_q, unit = power.split("_")
+            flows[key] = pd.concat([res[f"res_line.{p_or_q}_{direction}_{unit}"].set_axis(
+                names[direction], axis=1) for direction in ["from", "to"]], axis=1)
+            flows[key].index = pd.RangeIndex(chunk.start, chunk.stop)
+        yield chunk, flows
+
+
+def _stage_reduce_ehv(pre:tuple, gen_profiles:dict[str, pd.DataFrame], time_steps:list[int],
+                      fast:bool=False) -> pp.pandapowerNet:
+    net, boundary_buses, zone_boundary_buses, inner_buses = pre
+
+    # add gen.vm_pu and gen.p_mw to profiles
+    net.profiles["gen.vm_pu"] = gen_profiles["gen.vm_pu"]
+    net.profiles["gen.p_mw"] = gen_profiles["gen.p_mw"]
+
+    # downcast profiles
+    downcast_profiles(net.profiles)
+
+    # -- reduce the net to the relevant part
+    logger.info("reduce_ehv() starts.")
+    net = reduce_ehv(net, time_steps, boundary_buses, zone_boundary_buses, inner_buses, fast=fast)
+
+    # set first time_step to power columns and remove results from time series
+    set_time_step(net, time_steps[0])
+    pp.clear_result_tables(net)
+    return net
+
+
+def _stage_finalize(net:pp.pandapowerNet) -> pp.pandapowerNet:
+    for elm in ["bus", "res_bus"]:
+        net[elm] = net[elm].sort_index()
+
+    # change parallel appearance
+    sb.convert_parallel_branches(
+        net, multiple_entries=False, elm_to_convert=["trafo"],
+        exclude_cols_from_parallel_finding=net.trafo.columns.difference(
+            {"hv_bus", "lv_bus", "vn_hv_kv", "vn_lv_kv", "std_type"}))
+
+    # add origin_id
+    for elm in pp.pp_elements():
+        net[elm]["origin_id"] = net[elm].name
+
+    # controllable sgens
+    net.sgen["controllable"] = ~net.sgen.profile.str.startswith("mv_")
+    ctrl_sgens = net.sgen.index[net.sgen["controllable"]]
+
+    # q constraint information (VDE 4130 & 4120)
+    net["sgen"]["qcurve1"] = ""
+    sgens4120 = pd.Index(sb.voltlvl_idx(net, "sgen", 3)).intersection(ctrl_sgens)
+    sgens4130_220 = net.sgen.index[(net.bus.vn_kv.loc[net.sgen.bus] > 145).values &
+                                   (net.bus.vn_kv.loc[net.sgen.bus] < 255).values &
+                                   net.sgen.controllable]
+    sgens4130_380 = net.sgen.index[(net.bus.vn_kv.loc[net.sgen.bus] > 255).values &
+                                   net.sgen.controllable]
+    net["sgen"].loc[sgens4120, "qcurve1"] = "4120_v2"
+    net["sgen"].loc[sgens4130_220, "qcurve1"] = "4130_220_v2"
+    net["sgen"].loc[sgens4130_380, "qcurve1"] = "4130_380_v2"
+
+    # add slack_weight column to sgens
+    net.sgen["slack_weight"] = 0.
+    net.sgen["slack_weight"] = net.sgen["slack_weight"].astype(float)
+
+    # add name to net
+    net.name = "SimBench_EHV_HV_excerpt"
+    return net
+
+
+def apply_scenario_options(
+        net:pp.pandapowerNet,
+        merged_same_bus_gens:bool = False,
+        control:str|None = None,
+        wbb:bool = False,
+        ehv_grids:int = 2,
+        fixed_p:bool = True,
+    ) -> dict[str,pd.Index]|None:
+    """Applies the scenario options of SimBench_for_phd() to a base net, cf.
+    SimBench_for_phd_base_net(). The parameters are explained in SimBench_for_phd().
+
+    Returns
+    -------
+    dict[str, pd.Index] | None
+        elements which are controlled by the added control strategy and thus should not get
+        ConstControllers, cf. add_control_strategy()
+    """
+    control = _check_scenario_options(control, ehv_grids)
+
     if merged_same_bus_gens:
-        # do merge of same bus gens
-        pp.merge_same_bus_generation_plants(net, gen_elms=["ext_grid", "gen"])
-        pp.merge_same_bus_generation_plants(net, gen_elms=["sgen"])
+        # do merge of same bus gens (including all gen and sgen profiles, via cached merge plans)
+        merge_same_bus_gens(net, gen_elms=["ext_grid", "gen"])
+        merge_same_bus_gens(net, gen_elms=["sgen"])
 
     # set sgen limits according to Q(P) constraint of VDE 4130 & 4120
-    set_sgen_limits(net, fixed_p=kwargs.get("fixed_p", True))
+    set_sgen_limits(net, fixed_p=fixed_p)
     for col in ["min_p_mw", "max_p_mw", "min_q_mvar", "max_q_mvar"]:
         net.sgen[col] = net.sgen[col].astype(float)
 
     for elm in ["ext_grid", "gen", "sgen"]:
         assert not np.any(np.isclose(net[elm].sn_mva.values, 0))
 
-    # --- consider wbb
-    if not wbb:
-        is_bb = net.bus.zone == 0
-        net.bus.loc[is_bb & (net.bus.subnet == "EHV1_HV1"), "zone"] = 1
-        net.bus.loc[is_bb & (net.bus.subnet == "EHV1_HV2"), "zone"] = 2
-        net.bus.loc[is_bb & (net.bus.subnet == "EHV1"), "zone"] = 2
-
-    # --- consider ehv_grids
-    if ehv_grids not in [1, 2]:
-        raise ValueError(f"'ehv_grids' is implemented only for [1, 2], not for {ehv_grids=}.")
-    elif ehv_grids == 1:
-        if wbb:
-            net.bus.loc[(net.bus.zone == 0) & (net.bus.subnet == "EHV1"), "zone"] = 1
-        net.bus.loc[net.bus.zone == 2, "zone"] = 1
+    set_zones(net, wbb=wbb, ehv_grids=ehv_grids)
 
     # fix some dtypes
     for elm_type in pp.pp_elements():
@@ -223,26 +433,47 @@ def SimBench_for_phd(
         if "voltLvl" in net[elm_type].columns:
             net[elm_type].voltLvl = net[elm_type].voltLvl.astype("Int8")
 
-    add_control_strategy(net, control)
-    return net
+    return add_control_strategy(net, control)
 
 
-def _store_files_to_desktop(net) -> None:
-    # --- store net to json
-    net_wo_profiles = deepcopy(net)
-    del net_wo_profiles["profiles"]
-    pp.to_json(net_wo_profiles, os.path.join(home, "Desktop", "net.json"))
-    logger.info("net is stored to a json file at your desktop.")
-    del net_wo_profiles
-
-    # --- store profiles to h5
-    profiles_folder = os.path.join(home, "Desktop", "profiles")
-    dir_exists = os.path.exists(profiles_folder)
-    store_profiles_to_parquet_files(net.profiles, profiles_folder)
-    if dir_exists:
-        logger.info("The profile folders at the desktop were refilled by parquet files.")
-    else:
-        logger.info("profiles were written to parquet files in the profiles folder on your Desktop.")
+def set_zones(net:pp.pandapowerNet, wbb:bool = False, ehv_grids:int = 2) -> None:
+    """Sets net.bus.zone with regard to the options wbb and ehv_grids of SimBench_for_phd(). The
+    zones of the base net correspond to wbb=True and ehv_grids=2.
+    """
+    net.bus["zone"] = bus_zones(net.bus, wbb=wbb, ehv_grids=ehv_grids)
+
+
+def bus_zones(bus:pd.DataFrame, wbb:bool = False, ehv_grids:int = 2) -> pd.Series:
+    """Returns the bus zones with regard to the options wbb and ehv_grids of SimBench_for_phd()
+    without changing the given bus table. The zones of the given bus table are expected to
+    correspond to wbb=True and ehv_grids=2 (as given by SimBench_for_phd_base_net()).
+    """
+    zone = bus.zone.copy()
+
+    # --- consider wbb
+    if not wbb:
+        is_bb = zone == 0
+        zone.loc[is_bb & (bus.subnet == "EHV1_HV1")] = 1
+        zone.loc[is_bb & (bus.subnet == "EHV1_HV2")] = 2
+        zone.loc[is_bb & (bus.subnet == "EHV1")] = 2
+
+    # --- consider ehv_grids
+    if ehv_grids not in [1, 2]:
+        raise ValueError(f"'ehv_grids' is implemented only for [1, 2], not for {ehv_grids=}.")
+    elif ehv_grids == 1:
+        if wbb:
+            zone.loc[(zone == 0) & (bus.subnet == "EHV1")] = 1
+        zone.loc[zone == 2] = 1
+    return zone
+
+
+def _check_scenario_options(control:str|None, ehv_grids:int) -> str|None:
+    if control not in ["LocalCtrl", "QofV", "QofV_old", "NoControl", None]:
+        logger.warning(f"{control=} is unknown and thus ignored.")
+        control = None
+    if ehv_grids not in [1, 2]:
+        raise ValueError(f"'ehv_grids' is implemented only for [1, 2], not for {ehv_grids=}.")
+    return control
 
 
 if __name__ == "__main__":
@@ -6,11 +6,46 @@ sb_excerpt_dir = os.path.dirname(os.path.realpath(__file__))
 home = str(Path.home())
 data_path = os.path.join(sb_excerpt_dir, "data")
 
-# --- import functionality
-import SimBench_EHV_HV_excerpt.toolbox
+# --- import functionality lazily at first access (PEP 562)
+import importlib
+import sys
 
-from .SimBench_for_phd import SimBench_for_phd
+_MODULE_ATTRIBUTES = {
+    "toolbox": [],
+    "SimBench_for_phd": ["SimBench_for_phd", "SimBench_for_phd_base_net", "apply_scenario_options",
+                         "set_zones", "bus_zones"],
+    "overlays": ["overlay_net", "zone_variant", "zone_variants"],
+    "scenarios": ["scenario_grid", "run_scenarios", "scenario_net"],
+    "grid_parameters": ["SimBench_for_phd_obj_weights", "grid_parameters"],
+    "data_overview": ["electric_params", "element_numbers", "zone_statistics"],
+}
+_ATTRIBUTE_MODULES = {name: module for module, names in _MODULE_ATTRIBUTES.items() for name in
+                      names}
+__all__ = list(_ATTRIBUTE_MODULES.keys())
 
-from .grid_parameters import SimBench_for_phd_obj_weights, grid_parameters
 
-from .data_overview import electric_params, element_numbers
+def _bind_imported_modules():
+    """Binds the public names of all imported modules. Importing a module binds it to the
+    package which must not hide equally named functions, e.g. SimBench_for_phd()."""
+    for module_name, names in _MODULE_ATTRIBUTES.items():
+        module = sys.modules.get(f"{__name__}.{module_name}")
+        for name in names if module is not None else []:
+            if hasattr(module, name):
+                globals()[name] = getattr(module, name)
+
+
+def __getattr__(name:str):
+    if name in _ATTRIBUTE_MODULES.keys():
+        importlib.import_module(f".{_ATTRIBUTE_MODULES[name]}", __name__)
+    elif name in _MODULE_ATTRIBUTES.keys():
+        module = importlib.import_module(f".{name}", __name__)
+        _bind_imported_modules()
+        return module
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    _bind_imported_modules()
+    return globals()[name]
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals().keys()) | set(__all__))
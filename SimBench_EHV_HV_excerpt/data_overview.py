@@ -4,12 +4,7 @@ import math
 import numpy as np
 import pandas as pd
 import pandapower as pp
-
-try:
-    from smeinecke.python.Distributed_OPF.sequential.eq_fct.vi.run_eq_fct import preparations
-    preparations_imported = True
-except ImportError:
-    preparations_imported = False
+from scipy.sparse import csr_matrix
 
 try:
     import pandaplan.core.pplog as logging
@@ -19,6 +14,7 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox.element_groups import element_groups, regular_elements
 
 
 def digits(number:numbers.Number, add_minus_as_digit:bool=False) -> int:
@@ -50,8 +46,7 @@ def cable_length(neti, net):
 
 
 def p_sum(neti, profiles, et, extremum_fct):
-    eq_elms = neti[et].index[neti[et].name.str.contains("eq") | neti[et].name.str.startswith("Ext")]
-    idx = neti[et].index.intersection(neti[et].index).difference(eq_elms)
+    idx = regular_elements(neti, et)
     return extremum_fct(profiles[f"{et}.p_mw"][idx].sum(axis=1))
 
 
@@ -96,17 +91,30 @@ def number_to_str(number:numbers.Number, max_digits:int, decimals=int) -> str:
 
 
 def add_ph(df:pd.DataFrame) -> None:
+    """Converts the numeric columns of df to strings with thousands separators and LaTeX
+    placeholders (\\ph{}) of the digits missing compared to the longest number of the column,
+    cf. number_to_str()."""
     for col in df.select_dtypes(include=[int, float]):
-        max_digits = max([add_thousand_sep_digit(digits(val, add_minus_as_digit=True)) for val in
-            df[col]])
-        df[col] = df[col].apply(number_to_str, **{"max_digits": max_digits, "decimals": 1})
+        values = df[col].to_numpy()
+        is_zero = np.isclose(values, 0)
+        n_digits = np.where(is_zero, 1, np.trunc(np.log10(np.where(
+            values == 0, 1, np.abs(values)))).astype(np.int64) + 1 + (values < 0))
+        n_digits = n_digits + (n_digits - 1) // 3  # add_thousand_sep_digit()
+        max_digits = n_digits.max() + (n_digits.max() - 1) // 3
+        missing = max_digits - n_digits
+        if np.issubdtype(values.dtype, np.floating):
+            strings = [format(value, ",.1f") for value in np.round(values, 1)]
+        else:
+            strings = [format(int(value), ",d") for value in values]
+        df[col] = ["\\ph{%s}%s" % ("0"*miss, st) if miss else st for miss, st in zip(
+            missing, strings)]
 
 
 def element_number(net:pp.pandapowerNet, et:str, zone:int|str) -> int:
     if et == "bus" and zone != "Complete Grid":
         return net[et].zone.value_counts().at[zone]
     elif et in ["gen", "load"]:
-        return sum(~(net[et].name.str.contains("eq") | net[et].name.str.startswith("Ext")))
+        return len(regular_elements(net, et))
     else:
         return len(net[et])
 
@@ -115,34 +123,184 @@ def SimBenchZoneName(zone):
     return f"DSO{zone}" if zone > 2 else f"TSO{zone}"
 
 
-def electric_params(nets):
-    """ Produces data summarized in Table A.4 of the Dissertation
+def zone_statistics(net:pp.pandapowerNet, bus_zones:pd.Series|pd.DataFrame|None=None,
+                    profiles:dict[str, pd.DataFrame]|None=None, branch_zones:str="any",
+                    complete_grid:bool=True) -> pd.DataFrame:
+    """Returns the statistics of Table A.4 and A.5 for all zones in one vectorized pass over the
+    complete grid. The elements are mapped to zones via the zones of their buses by sparse
+    membership matrices, so that the statistics of all zones (and zone definitions) result from
+    one matrix product per element type and profile.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        complete grid
+    bus_zones : pd.Series | pd.DataFrame | None, optional
+        zone per bus. A DataFrame provides multiple zone definitions (one per column), e.g. of
+        different options of bus_zones(). By default net.bus.zone
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles to derive the minimum and maximum power, by default net.profiles (if available)
+    branch_zones : str, optional
+        zones of the branches: "any" (all zones of their buses, i.e. branches between zones
+        belong to both zones as in the subnets of ZoneDecomposition), "from" (zone of the
+        from/hv bus) or "min" (the lowest zone of their buses), by default "any"
+    complete_grid : bool, optional
+        whether to add the statistics of the complete grid as row "Complete Grid",
+        by default True
+
+    Returns
+    -------
+    pd.DataFrame
+        statistics (columns) per zone (rows; with multiple zone definitions per definition and
+        zone): element numbers "n_<et>" (gens and loads without equivalent and ExtL elements, as
+        in element_number()), "n_equivalent_gen", "n_ExtL_load", "voltage_levels",
+        "ohl_length_km", "cable_length_km" and, if profiles are available, the minimum and
+        maximum consumption and generation "p_load_min_mw", ..., "p_gen_max_mw" (without
+        equivalent and ExtL elements, as in p_sum())
+    """
+    if bus_zones is None:
+        bus_zones = net.bus.zone
+    if isinstance(bus_zones, pd.Series):
+        groups = pd.Index(sorted(bus_zones.dropna().unique()), name="zone")
+        codes = groups.get_indexer(bus_zones.loc[net.bus.index].values)[:, None]
+    else:
+        groups, codes = list(), list()
+        for definition in bus_zones.columns:
+            zones = pd.Index(sorted(bus_zones[definition].dropna().unique()))
+            zone_codes = zones.get_indexer(bus_zones[definition].loc[net.bus.index].values)
+            codes.append(np.where(zone_codes >= 0, zone_codes + len(groups), -1))
+            groups += [(definition, zone) for zone in zones]
+        groups = pd.MultiIndex.from_tuples(groups, names=["definition", "zone"])
+        codes = np.column_stack(codes)
+    if complete_grid:
+        groups = groups.append(pd.Index([("Complete Grid", "") if isinstance(
+            groups, pd.MultiIndex) else "Complete Grid"]))
+    profiles = net.get("profiles", dict()) if profiles is None else profiles
+
+    stats = pd.DataFrame(index=groups)
+    memberships = dict()
+    for et in pp.pp_elements():
+        if et not in net.keys() or not isinstance(net[et], pd.DataFrame) or not net[et].shape[0]:
+            continue
+        memberships[et] = _zone_membership(net, et, codes, len(groups), branch_zones,
+                                           complete_grid)
+        regular = np.ones(net[et].shape[0], dtype=bool)
+        if et in ["gen", "load"]:
+            regular = element_groups(net, et).values == "regular"
+        stats[f"n_{et}"] = (memberships[et].T @ regular).astype(np.int64)
+    for et, group, col in [("gen", "eq", "n_equivalent_gen"), ("load", "ExtL", "n_ExtL_load")]:
+        in_group = element_groups(net, et).values == group
+        stats[col] = (memberships[et].T @ in_group).astype(np.int64) if et in \
+            memberships.keys() else 0
+
+    # voltage levels of the buses
+    vn_kv = pd.Index(sorted(net.bus.vn_kv.unique(), reverse=True))
+    levels = memberships["bus"].T @ csr_matrix((np.ones(net.bus.shape[0]), (
+        np.arange(net.bus.shape[0]), vn_kv.get_indexer(net.bus.vn_kv))),
+        shape=(net.bus.shape[0], len(vn_kv)))
+    levels = levels.toarray() > 0
+    stats["voltage_levels"] = [", ".join(["%g" % vn for vn in vn_kv[row]]) for row in levels]
+
+    # line lengths
+    for col, types in [("ohl_length_km", ["ohl", "ol"]), ("cable_length_km", ["cs", "cable"])]:
+        length = net.line.length_km.where(net.line.type.isin(types), 0.).values
+        stats[col] = memberships["line"].T @ length if "line" in memberships.keys() else 0.
+
+    # minimum and maximum power sums over time
+    extrema = dict()
+    for et in ["load", "gen", "sgen"]:
+        key = f"{et}.p_mw"
+        if key not in profiles.keys() or et not in memberships.keys():
+            continue
+        df = profiles[key]
+        positions = net[et].index.get_indexer(df.columns)
+        regular = positions >= 0
+        regular[regular] = element_groups(net, et).values[positions[regular]] == "regular"
+        sums = (memberships[et][positions[regular]].T @ df.to_numpy(dtype=np.float64)[
+            :, regular].T).T
+        extrema[et] = (sums.min(axis=0), sums.max(axis=0))
+    if "load" in extrema.keys():
+        stats["p_load_min_mw"], stats["p_load_max_mw"] = extrema["load"]
+    if "gen" in extrema.keys() or "sgen" in extrema.keys():
+        stats["p_gen_min_mw"] = sum(extrema[et][0] for et in ["gen", "sgen"] if et in
+                                    extrema.keys())
+        stats["p_gen_max_mw"] = sum(extrema[et][1] for et in ["gen", "sgen"] if et in
+                                    extrema.keys())
+    return stats
+
+
+def _zone_membership(net:pp.pandapowerNet, et:str, codes:np.ndarray, n_groups:int,
+                     branch_zones:str, complete_grid:bool) -> csr_matrix:
+    """Returns the sparse membership (elements x groups) of the elements of et in the zones given
+    by the zone codes of the buses (buses x zone definitions, -1 for buses without zone)."""
+    n = net[et].shape[0]
+    if et == "bus":
+        bus_positions = np.arange(n)[:, None]
+    else:
+        bus_cols = [col for elm, col in pp.element_bus_tuples() if elm == et]
+        bus_positions = np.column_stack([net.bus.index.get_indexer(net[et][col].values) for col
+                                         in bus_cols])
+        if branch_zones == "from":
+            bus_positions = bus_positions[:, :1]
+        elif branch_zones not in ["any", "min"]:
+            raise ValueError(f"{branch_zones=} is unknown.")
+    rows, cols = list(), list()
+    for definition in range(codes.shape[1]):
+        elm_codes = codes[bus_positions, definition]  # elements x bus columns
+        if branch_zones == "min" and elm_codes.shape[1] > 1:
+            elm_codes = np.where(elm_codes >= 0, elm_codes, np.iinfo(np.int64).max).min(
+                axis=1, keepdims=True)
+            elm_codes[elm_codes == np.iinfo(np.int64).max] = -1
+        for column in elm_codes.T:
+            rows.append(np.flatnonzero(column >= 0))
+            cols.append(column[column >= 0])
+    if complete_grid:
+        rows.append(np.arange(n))
+        cols.append(np.full(n, n_groups-1))
+    membership = csr_matrix((np.ones(sum(len(r) for r in rows)), (np.concatenate(rows),
+                            np.concatenate(cols))), shape=(n, n_groups))
+    membership.data[:] = 1.  # branches with both buses in the same zone count once
+    return membership
+
+
+def _complete_grid_and_zones(nets:pd.Series|pp.pandapowerNet) -> tuple[pp.pandapowerNet, list]:
+    if isinstance(nets, pp.pandapowerNet):
+        return nets, sorted(nets.bus.zone.dropna().unique())
+    return nets["Complete Grid"], [key for key in nets.index if key != "Complete Grid"]
+
+
+def _zone_names(stats:pd.DataFrame, zones:list) -> pd.DataFrame:
+    stats = stats.loc[list(zones) + ["Complete Grid"]]
+    stats.index = [key if isinstance(key, str) else SimBenchZoneName(key) for key in stats.index]
+    return stats
+
+
+def electric_params(nets:pd.Series|pp.pandapowerNet):
+    """ Produces data summarized in Table A.4 of the Dissertation. The zone values are derived
+    from zone_statistics() of the complete grid, i.e. nets["Complete Grid"] if a Series of nets
+    as from get_SimBench_nets_series() is given.
     """
+    net, zones = _complete_grid_and_zones(nets)
+    stats = _zone_names(zone_statistics(net), zones)
+
     # --- electric params table
-    str_params = [
-        "{Voltage levels in kV}",
-        # "{Generation types}",
-    ]
-    str_param_fcts = [voltlvls] #, gen_types]
-    num_params = [
-        "{Total length of\\\\overhead lines in km}",
-        "{Total length of\\\\cables in km}",
-        "{Minimum active power\\\\consumption$^\\alpha$ in MW}",
-        "{Maximum active power\\\\consumption$^\\alpha$ in MW}",
-        "{Minimum active power\\\\generation$^\\alpha$ in MW}",
-        "{Maximum active power\\\\generation$^\\alpha$ in MW}",
-        ]
-    num_param_fcts = [ohl_length, cable_length, p_load_min, p_load_max, p_gen_min, p_gen_max]
-
-    df_num = pd.DataFrame({key if isinstance(key, str) else SimBenchZoneName(key): pd.Series({
-        el_param: el_param_fct(neti, nets["Complete Grid"].profiles) for el_param, el_param_fct in
-            zip(num_params, num_param_fcts)}) for key, neti in nets.items()})
+    str_params = {
+        "voltage_levels": "{Voltage levels in kV}",
+    }
+    num_params = {
+        "ohl_length_km": "{Total length of\\\\overhead lines in km}",
+        "cable_length_km": "{Total length of\\\\cables in km}",
+        "p_load_min_mw": "{Minimum active power\\\\consumption$^\\alpha$ in MW}",
+        "p_load_max_mw": "{Maximum active power\\\\consumption$^\\alpha$ in MW}",
+        "p_gen_min_mw": "{Minimum active power\\\\generation$^\\alpha$ in MW}",
+        "p_gen_max_mw": "{Maximum active power\\\\generation$^\\alpha$ in MW}",
+        }
+
+    df_num = stats[list(num_params.keys())].rename(columns=num_params).T.astype(float)
     df_num_for_tex = deepcopy(df_num)
     add_ph(df_num_for_tex)
 
-    df_str = pd.DataFrame({key if isinstance(key, str) else SimBenchZoneName(key): pd.Series({
-        el_param: el_param_fct(neti, nets["Complete Grid"]) for el_param, el_param_fct in zip(
-            str_params, str_param_fcts)}) for key, neti in nets.items()})
+    df_str = stats[list(str_params.keys())].rename(columns=str_params).T
     el_par = pd.concat([df_str, df_num_for_tex])
 
     st = "\n" + "-"*20 + "electric params table" + "-"*20
@@ -155,56 +313,60 @@ def electric_params(nets):
         }
 
 
-def element_numbers(nets):
-    """ Produces data summarized in Table A.5 of the Dissertation
+def element_numbers(nets:pd.Series|pp.pandapowerNet):
+    """ Produces data summarized in Table A.5 of the Dissertation. The zone values are derived
+    from zone_statistics() of the complete grid, i.e. nets["Complete Grid"] if a Series of nets
+    as from get_SimBench_nets_series() is given. Branches between zones count for both zones.
     """
+    net, zones = _complete_grid_and_zones(nets)
+    stats = _zone_names(zone_statistics(net, profiles=dict()), zones)
+
     # --- Element number tables
     ets = ["bus", "line", "trafo", "load", "gen", "sgen"]
     et_names_for_doc = ["Bus", "Line", "Transformer","$PQ$ consumption", "$PV$ generator",
                         "$PQ$ static generator"]
-    et_repl = dict(zip(ets, et_names_for_doc))
-
-    et_count_complete = pp.count_elements(nets["Complete Grid"])
 
-    et_count = pd.DataFrame({key if isinstance(key, str) else SimBenchZoneName(key): pd.Series({
-        et: element_number(neti, et, key) for et in et_count_complete.keys()}) for key, neti in
-        nets.items()})
-    et_count.index = pd.Index(pd.Series(et_count.index).replace(et_repl))
-    et_count = et_count.loc[et_names_for_doc]
-    sum_diff_row = [row for row in et_count.index if et_count.loc[row].iloc[:-1].sum() != \
-        et_count.loc[row].iat[-1]]
+    et_count = stats[[f"n_{et}" for et in ets]].T.astype(np.int64)
+    et_count.index = pd.Index(et_names_for_doc)
+    sum_diff_row = et_count.index[et_count.iloc[:, :-1].sum(axis=1) != et_count.iloc[:, -1]]
     et_count_for_tex = deepcopy(et_count)
     add_ph(et_count_for_tex)
 
     if len(sum_diff_row):
         logger.warning("Rows where 'Complete Grid' is not the sum of the individual SOs: "
-                       f"\n{sum_diff_row}")
+                       f"\n{list(sum_diff_row)}")
 
     st = "\n" + "-"*20 + "Element number tables" + "-"*20
     st += str(et_count)
     logger.info(st)
 
-    ExtL = pd.Series({key: sum(neti.load.name.str.startswith("ExtL")) for key, neti in nets.items()})
-    eq_gens = pd.Series({key: sum(neti.gen.name.str.startswith("equivalent gen")) for
-                         key, neti in nets.items()})
     return {
         "et_count": et_count,
         "et_count_for_tex": et_count_for_tex.to_latex(),
-        "equivalent gens": eq_gens.T,
-        "equivalent loads": ExtL.T,
+        "equivalent gens": stats.n_equivalent_gen,
+        "equivalent loads": stats.n_ExtL_load,
         }
 
 
 def get_SimBench_nets_series():
     """ Splits the net into four parts according to the zones and with respect to the boundary
-    definition used by the equivalent function method.
+    definition used by the equivalent function method. If the function 'preparations()' of the
+    equivalent function implementation is not available, the subnets of the open-source
+    ZoneDecomposition are used whose boundaries are the branches between the zones.
     """
-    if not preparations_imported:
-        raise ImportError("Function 'preparations()' from the equivalent function implementation is"
-                          "expected in get_SimBench_nets_series() but not imported successfully.")
     net = sbe.SimBench_for_phd(time_steps=range(2*96))
-    nets = preparations(net, 0.01, time_step=0, no_hv_zones_allowed=True,
-        objective={1: 'P_LOSS', 2: 'profile_loadings', 3: 'P_LOSS', 4: 'profile_loadings'})[0]
+    try:
+        from smeinecke.python.Distributed_OPF.sequential.eq_fct.vi.run_eq_fct import preparations
+    except ImportError:
+        preparations = None
+    if preparations is not None:
+        nets = preparations(net, 0.01, time_step=0, no_hv_zones_allowed=True,
+            objective={1: 'P_LOSS', 2: 'profile_loadings', 3: 'P_LOSS', 4: 'profile_loadings'})[0]
+    else:
+        logger.info("Function 'preparations()' from the equivalent function implementation is not "
+                    "available. Thus, the subnets of ZoneDecomposition are used.")
+        from SimBench_EHV_HV_excerpt.toolbox.zone_decomposition import ZoneDecomposition
+        nets = ZoneDecomposition(net, include_profiles=False).subnets
     nets = pd.Series(nets).sort_index()
     nets.loc["Complete Grid"] = net
     return nets
@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 import pandapower as pp
+from scipy.sparse import csr_matrix
+
+from SimBench_EHV_HV_excerpt.data_overview import zone_statistics
+from SimBench_EHV_HV_excerpt.toolbox.parquet_profiles import iter_profile_parquet
 
 
 def SimBench_for_phd_obj_weights() -> pd.Series:
@@ -14,44 +19,82 @@ def SimBench_for_phd_obj_weights() -> pd.Series:
     return pd.Series({1: 1.175832, 2: 2.383970, 3: 0.256285, 4: 0.183914}, name="predefined_weights")
 
 
-def grid_parameters(net:pp.pandapowerNet, net_zones:list|None=None) -> tuple[pd.DataFrame]:
+def grid_parameters(net:pp.pandapowerNet, net_zones:list|None=None,
+                    time_step_weights:pd.Series|None=None, bus_zones:pd.Series|None=None,
+                    batch_size:int=96*7, **kwargs) -> tuple[pd.DataFrame]:
     """Returns two DataFrames with relevant data to define weights independent of operational
     variables, cf. Table A.5
 
+    The line lengths per zone are computed from net.line, assigning lines between zones to the
+    lower zone, which reproduces the line lengths of the dissertation. The consumed energy per
+    zone sums up the load profiles batch by batch. If net.profiles does not include "load.p_mw",
+    the batches are read straight from the parquet files, cf. iter_profile_parquet(), so that the
+    whole year is considered without being held in memory.
+
     Parameters
     ----------
     net : pp.pandapowerNet
         net with zones which should be weighted against each other
     net_zones : list
-        list of zones. If None, net_zones is filled by data from net.bus.zone, by default None
+        list of zones. If None, net_zones is filled by data from bus_zones, by default None
+    time_step_weights : pd.Series | None, optional
+        weights of the time steps of the profiles, e.g. RepresentativePeriods.weights if the
+        profiles only include representative time steps. Time steps without weight are not
+        considered. If None, each time step has the weight 1, by default None
+    bus_zones : pd.Series | None, optional
+        zone per bus, e.g. of another zone definition, by default net.bus.zone
+    batch_size : int, optional
+        number of time steps summed up at once, by default 96*7
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments of iter_profile_parquet(), e.g. profiles_folder
 
     Returns
     -------
     tuple[pd.DataFrame]
         relevant data to define weights for the grid
+
+    Example
+    -------
+    >>> net = SimBench_for_phd()  # without profiles
+    >>> params, params_rel = grid_parameters(net)
+    >>> params_rel.weights  # cf. SimBench_for_phd_obj_weights()
     """
-    if not "profiles" in net.keys() or "load.p_mw" not in net.profiles.keys():
-        raise ValueError("grid_parameters() expectes load active power timeseries data stored as "
-                         "dictionary in net.profiles.")
+    bus_zones = net.bus.zone if bus_zones is None else bus_zones
     if net_zones is None:
-        net_zones = sorted(set(net.bus.zone))
+        net_zones = sorted(set(bus_zones.dropna()))
 
     params = pd.DataFrame(0., index=net_zones, columns=["line_length_km", "load_p_gwh"])
-    # copy from data_overview.py:
-    line_length = {1: 3515.6,
-                   2: 4010.3,
-                   3: 1082.1 +   1.4,
-                   4:  632.8 + 118.8,
-                   }
-
-    for zone in net_zones:
-        # remark: the following allocation is a quick approximation and does not correspond to any
-        # of the three definitions of boundaries presented in the dissertation
-        zone_buses = net.bus.index[net.bus.zone == zone]
-        zone_loads = net.load.zone[net.load.bus.isin(zone_buses)]
-        params.at[zone, "line_length_km"] = line_length[zone]
-        params.at[zone, "load_p_gwh"] = net.profiles["load.p_mw"][zone_loads].sum().sum() / \
-            4 / 1000  # -> GWh
+    stats = zone_statistics(net, bus_zones, profiles=dict(), branch_zones="min",
+                            complete_grid=False)
+    params["line_length_km"] = (stats.ohl_length_km + stats.cable_length_km).reindex(
+        net_zones, fill_value=0.)
+
+    # remark: the loads are allocated to the zones of their buses which is a quick approximation
+    # and does not correspond to any of the three definitions of boundaries presented in the
+    # dissertation
+    zones = pd.Index(net_zones)
+    codes = zones.get_indexer(bus_zones.loc[net.load.bus].values)
+    membership = csr_matrix((np.ones((codes >= 0).sum()), (np.flatnonzero(codes >= 0), codes[
+        codes >= 0])), shape=(net.load.shape[0], len(zones)))
+    if "profiles" in net.keys() and "load.p_mw" in net.profiles.keys():
+        profiles = net.profiles["load.p_mw"]
+        batches = (profiles.iloc[start:start+batch_size] for start in range(
+            0, profiles.shape[0], batch_size))
+    else:
+        batches = iter_profile_parquet(net, "load.p_mw", batch_size=batch_size,
+                                       columns=list(net.load.index), **kwargs)
+    load_p_mwh = np.zeros(len(zones))
+    for batch in batches:
+        positions = net.load.index.get_indexer(batch.columns)
+        values = batch.to_numpy(dtype=np.float64)[:, positions >= 0]
+        if time_step_weights is not None:
+            values = values * time_step_weights.reindex(batch.index, fill_value=0.).values[:, None]
+        load_p_mwh += (membership[positions[positions >= 0]].T @ np.nan_to_num(values).sum(
+            axis=0)) / 4
+    params["load_p_gwh"] = load_p_mwh / 1000  # -> GWh
     params_rel = params / params.sum()
     params_rel["mean"] = params_rel.mean(axis=1)
     params_rel["weights"] = params_rel["mean"] * len(params_rel)
@@ -90,13 +133,14 @@ def weights_from_opt(objective:str="profile_loadings", method:str="COPF") -> pd.
 
 if "__main__" == __name__:
 
-    from SimBench_EHV_HV_excerpt.SimBench_for_phd import SimBench_for_phd
+    from SimBench_EHV_HV_excerpt import SimBench_for_phd
 
-    net = SimBench_for_phd(time_steps=True)
+    net = SimBench_for_phd()  # the load profiles of the whole year are streamed
 
     params, params_rel = grid_parameters(net)
 
     print(params)
+    # values of the dissertation:
     # line_length_km    load_p_gwh
     # 1       3515.6  13911.192222
     # 2       4010.3  50020.810181
@@ -0,0 +1,124 @@
+import copy
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt import bus_zones
+
+
+def overlay_net(
+        base_net:pp.pandapowerNet,
+        overlays:dict[tuple[str, str], pd.Series|np.ndarray]
+    ) -> pp.pandapowerNet:
+    """Returns a lightweight variant of the base net in which only the given columns differ.
+    The tables of the overlays and the result tables are copied. The columns of all other tables
+    are shared with the base net as read-only views so that holding many variants side by side
+    needs about the memory of a single net. The variant is a usual pandapowerNet, thus
+    downstream code, e.g. grid_parameters() or the functions of data_overview, reads the overlay
+    transparently. Running power flows on a variant does not change the base net.
+
+    Note
+    ----
+    Assigning whole columns of a variant, e.g. net.line["in_service"] = ..., only changes the
+    variant. Changing shared values in place, e.g. via net.line.loc[...] = ..., raises a
+    ValueError. Use scenario_net() or deepcopy() to get an independent net.
+
+    Parameters
+    ----------
+    base_net : pp.pandapowerNet
+        net to be shared
+    overlays : dict[tuple[str, str], pd.Series | np.ndarray]
+        columns of the variant, e.g. {("bus", "zone"): zones}
+
+    Returns
+    -------
+    pp.pandapowerNet
+        variant of the base net
+    """
+    net = copy.copy(base_net)  # shallow copy: all tables are shared with base_net
+    copied_tables = {table for table, _ in overlays.keys()}
+    for key, value in base_net.items():
+        if not isinstance(value, pd.DataFrame):
+            continue
+        elif key.startswith("res_") or key in copied_tables:
+            net[key] = value.copy()
+        else:
+            net[key] = _read_only_view(value)
+    for (table, column), values in overlays.items():
+        net[table][column] = values
+    return net
+
+
+def _read_only_view(df:pd.DataFrame) -> pd.DataFrame:
+    """Returns a DataFrame which shares the numpy arrays of df's columns as read-only views.
+    Columns of extension dtypes are copied."""
+    columns = dict()
+    for i_col in range(df.shape[1]):
+        values = df.iloc[:, i_col].values
+        if isinstance(values, np.ndarray):
+            values = values.view()
+            values.flags.writeable = False
+        else:
+            values = values.copy()
+        columns[i_col] = values
+    view = pd.DataFrame(columns, index=df.index, copy=False)
+    view.columns = df.columns
+    view.attrs = df.attrs
+    return view
+
+
+def zone_variant(base_net:pp.pandapowerNet, wbb:bool = False,
+                 ehv_grids:int = 2) -> pp.pandapowerNet:
+    """Returns a variant of the base net which differs only by net.bus.zone with regard to the
+    options wbb and ehv_grids of SimBench_for_phd(), cf. overlay_net().
+
+    Parameters
+    ----------
+    base_net : pp.pandapowerNet
+        net with zones of wbb=True and ehv_grids=2, e.g. from SimBench_for_phd_base_net() or
+        SimBench_for_phd(wbb=True)
+    wbb : bool, optional
+        cf. SimBench_for_phd(), by default False
+    ehv_grids : int, optional
+        cf. SimBench_for_phd(), by default 2
+
+    Returns
+    -------
+    pp.pandapowerNet
+        variant of the base net with zone overlay
+    """
+    if not (base_net.bus.zone == 0).any() or not (base_net.bus.zone == 2).any():
+        raise ValueError("The zones of base_net are expected to correspond to wbb=True and "
+                         "ehv_grids=2.")
+    return overlay_net(base_net, {("bus", "zone"): bus_zones(
+        base_net.bus, wbb=wbb, ehv_grids=ehv_grids)})
+
+
+def zone_variants(base_net:pp.pandapowerNet,
+                  variants:dict[str, dict]|None = None) -> dict[str, pp.pandapowerNet]:
+    """Returns zone variants of the base net, cf. zone_variant().
+
+    Parameters
+    ----------
+    base_net : pp.pandapowerNet
+        net with zones of wbb=True and ehv_grids=2
+    variants : dict[str, dict] | None, optional
+        options wbb and ehv_grids per variant name. If None, all four combinations are returned,
+        by default None
+
+    Returns
+    -------
+    dict[str, pp.pandapowerNet]
+        variants of the base net
+
+    Example
+    -------
+    >>> nets = zone_variants(SimBench_for_phd(wbb=True))
+    >>> list(nets.keys())
+    ['wbb=False|ehv_grids=1', 'wbb=False|ehv_grids=2', 'wbb=True|ehv_grids=1',
+     'wbb=True|ehv_grids=2']
+    """
+    if variants is None:
+        variants = {f"wbb={wbb}|ehv_grids={ehv_grids}": {"wbb": wbb, "ehv_grids": ehv_grids} for
+                    wbb in [False, True] for ehv_grids in [1, 2]}
+    return {name: zone_variant(base_net, **options) for name, options in variants.items()}
@@ -0,0 +1,169 @@
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from time import perf_counter
+import typing
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt import SimBench_for_phd_base_net, apply_scenario_options
+from SimBench_EHV_HV_excerpt.toolbox.run_custom_timeseries import run_custom_timeseries
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+_base_net = None  # base net shared by all scenarios of a worker process
+
+
+def scenario_grid(**options) -> dict[str, dict]:
+    """Returns all combinations of the given scenario options.
+
+    Example
+    -------
+    >>> scenario_grid(wbb=[False, True], control=["LocalCtrl"])
+    {'wbb=False|control=LocalCtrl': {'wbb': False, 'control': 'LocalCtrl'},
+     'wbb=True|control=LocalCtrl': {'wbb': True, 'control': 'LocalCtrl'}}
+    """
+    keys = list(options.keys())
+    scenarios = [dict(zip(keys, values)) for values in product(*options.values())]
+    return {scenario_name(scenario): scenario for scenario in scenarios}
+
+
+def scenario_name(options:dict) -> str:
+    return "|".join([f"{key}={val}" for key, val in options.items()])
+
+
+def run_scenarios(
+        scenarios:dict[str, dict]|list[dict],
+        time_steps:typing.Any,
+        n_jobs:int = 1,
+        kernel:str = "pp",
+        **kwargs
+    ) -> tuple[dict[str, dict], pd.DataFrame]:
+    """Runs time series for multiple scenarios of SimBench_for_phd(). The base net including the
+    profiles is created only once and shared by all scenarios. Each scenario only applies its
+    options (cf. apply_scenario_options()) to a copy of the base net without profiles.
+
+    Parameters
+    ----------
+    scenarios : dict[str, dict] | list[dict]
+        scenario options, e.g. from scenario_grid(). Possible options are "merged_same_bus_gens",
+        "control", "wbb", "ehv_grids" and "fixed_p". If a list is given, the scenario names are
+        derived from the options
+    time_steps : typing.Any
+        time steps to include into the profiles and to run
+    n_jobs : int, optional
+        number of parallel processes. If 1, the scenarios are run one after another in the current
+        process, by default 1
+    kernel : str, optional
+        kernel of run_custom_timeseries(), by default "pp"
+
+    Other Parameters
+    ----------------
+    from_json : bool, optional
+        parameter of SimBench_for_phd_base_net(), by default True
+
+    profiles_folder : str | None, optional
+        parameter of SimBench_for_phd_base_net(), by default None
+
+    kwargs
+        further key word arguments are passed to run_custom_timeseries(), e.g.
+        output_vals=[("res_line", "loading_percent", "max")]
+
+    Returns
+    -------
+    tuple[dict[str, dict], pd.DataFrame]
+        time series results per scenario and the time in seconds spent in each stage per scenario.
+        The row "base net" includes the time to create the shared base net. The results of failed
+        scenarios are None and their errors are listed in the column "error" of the timings.
+
+    Example
+    -------
+    >>> res, timings = run_scenarios(scenario_grid(
+    ...     wbb=[False, True], control=["LocalCtrl", "NoControl"]), range(96), n_jobs=4)
+    """
+    if isinstance(scenarios, list):
+        scenarios = {scenario_name(scenario): scenario for scenario in scenarios}
+    time_steps = list(time_steps)
+    base_kwargs = {key: kwargs.pop(key) for key in ["from_json", "profiles_folder"] if key in
+                   kwargs.keys()}
+
+    t0 = perf_counter()
+    base_net = SimBench_for_phd_base_net(time_steps=time_steps, **base_kwargs)
+    base_time = perf_counter() - t0
+
+    tasks = [(name, options, time_steps, kernel, kwargs) for name, options in scenarios.items()]
+    if n_jobs == 1:
+        _init_worker(base_net)
+        outputs = [_run_scenario(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(base_net,)) as executor:
+            outputs = list(executor.map(_run_scenario, *zip(*tasks)))
+    _init_worker(None)
+
+    results = {name: res for name, res, _ in outputs}
+    timings = pd.DataFrame({name: timing for name, _, timing in outputs}).T
+    timings["build_s"] = np.nan
+    timings.loc["base net", "build_s"] = base_time
+    return results, timings
+
+
+def scenario_net(base_net:pp.pandapowerNet, **options) -> pp.pandapowerNet:
+    """Returns a net of the scenario defined by the options, cf. apply_scenario_options(). Only
+    the net tables are copied from the base net while the profiles are shared (and must not be
+    changed). If generators are merged, the merged generator profiles replace the shared ones, cf.
+    merge_same_bus_gens().
+    """
+    net = _copy_base_net(base_net)
+    apply_scenario_options(net, **options)
+    return net
+
+
+def _copy_base_net(base_net:pp.pandapowerNet) -> pp.pandapowerNet:
+    profiles = base_net.pop("profiles", None)
+    try:
+        net = deepcopy(base_net)
+    finally:
+        if profiles is not None:
+            base_net["profiles"] = profiles
+    if profiles is not None:
+        net["profiles"] = profiles.copy()  # shares the DataFrames and their statistics
+    return net
+
+
+def _init_worker(base_net:pp.pandapowerNet|None) -> None:
+    global _base_net
+    _base_net = base_net
+
+
+def _run_scenario(name:str, options:dict, time_steps:list[int], kernel:str,
+                  ts_kwargs:dict) -> tuple[str, dict, dict[str, float]]:
+    timing = dict()
+    t0 = perf_counter()
+    net = _copy_base_net(_base_net)
+    t1 = perf_counter()
+    timing["copy_s"] = t1 - t0
+
+    no_const_ctrls = apply_scenario_options(net, **options)
+    t2 = perf_counter()
+    timing["scenario_options_s"] = t2 - t1
+
+    ts_kwargs = deepcopy(ts_kwargs)
+    ts_kwargs["no_const_ctrls"] = ts_kwargs.get("no_const_ctrls", no_const_ctrls)
+    try:
+        res = run_custom_timeseries(net, time_steps, kernel, None, **ts_kwargs)
+    except Exception as e:
+        logger.error(f"The time series of scenario '{name}' failed: {e!r}")
+        res = None
+        timing["error"] = repr(e)
+    t3 = perf_counter()
+    timing["timeseries_s"] = t3 - t2
+    timing["total_s"] = t3 - t0
+    logger.info(f"Scenario '{name}' finished after {timing['total_s']:.1f} s.")
+    return name, res, timing
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from SimBench_EHV_HV_excerpt.toolbox import ArtifactCache, fingerprint
+
+calls = list()
+
+
+def _source(n):
+    calls.append("source")
+    return {"df": pd.DataFrame({"a": np.arange(n, dtype=float), "b": ["x"] * n})}
+
+
+def _double(data):
+    calls.append("double")
+    return data["df"].a * 2
+
+
+def _sum(series, offset=0.):
+    calls.append("sum")
+    return series.sum() + offset
+
+
+def test_fingerprint():
+    df = pd.DataFrame({"a": [1., 2.], "b": ["x", "y"]})
+    assert fingerprint(df) == fingerprint(df.copy())
+    assert fingerprint(df) != fingerprint(df.assign(a=[1., 3.]))
+    assert fingerprint({"x": df, "_ppc": 1}) == fingerprint({"x": df, "_ppc": 2})
+
+
+def test_artifact_cache(tmp_path):
+    def pipeline(n, offset):
+        cache = ArtifactCache(str(tmp_path))
+        source = cache.run("source", _source, params={"n": n})
+        double = cache.run("double", _double, source)
+        return cache.run("sum", _sum, double, params={"offset": offset}).value
+
+    calls.clear()
+    assert pipeline(3, 0.) == 6.
+    assert calls == ["source", "double", "sum"]
+
+    # nothing changed -> everything is loaded
+    calls.clear()
+    assert pipeline(3, 0.) == 6.
+    assert calls == []
+
+    # only the parameter of the last stage changed
+    calls.clear()
+    assert pipeline(3, 1.) == 7.
+    assert calls == ["sum"]
+
+    # the input of the first stage changed
+    calls.clear()
+    assert pipeline(4, 1.) == 13.
+    assert calls == ["source", "double", "sum"]
+
+    ArtifactCache(str(tmp_path)).clear("sum")
+    calls.clear()
+    assert pipeline(4, 1.) == 13.
+    assert calls == ["sum"]
+
+    # no caching without folder
+    calls.clear()
+    assert ArtifactCache(None).run("source", _source, params={"n": 2}).fingerprint == ""
+    assert calls == ["source"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,76 @@
+import os
+from copy import deepcopy
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower.networks as pn
+from pandapower.control.basic_controller import Controller
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import run_chunked_timeseries, run_custom_timeseries
+
+
+def test_run_chunked_timeseries(tmp_path):
+    net = sbe.SimBench_for_phd(time_steps=range(8))
+    output_vals = [("res_gen", "p_mw"), ("res_gen", "vm_pu")]
+    folder = str(tmp_path)
+
+    ref = run_custom_timeseries(net, list(range(8)), "pp", None, output_vals=output_vals)
+    res = run_chunked_timeseries(net, range(8), folder, chunk_size=3, output_vals=output_vals)
+    assert sorted(file for file in os.listdir(folder) if file.endswith(".done")) == [
+        "000000_000002.done", "000003_000005.done", "000006_000007.done"]
+    for key in ["res_gen.p_mw", "res_gen.vm_pu"]:
+        assert list(res[key].index) == list(range(8))
+        assert list(res[key].columns) == list(ref[key].columns)
+        assert np.allclose(res[key].values, ref[key].values)
+
+    # resume: only the chunk without marker is run again
+    chunk_file = os.path.join(folder, "res_gen.p_mw", "000000_000002.parquet")
+    mtime = os.path.getmtime(chunk_file)
+    os.remove(os.path.join(folder, "000003_000005.done"))
+    res = run_chunked_timeseries(net, range(8), folder, chunk_size=3, output_vals=output_vals)
+    assert os.path.getmtime(chunk_file) == mtime
+    assert os.path.exists(os.path.join(folder, "000003_000005.done"))
+    assert np.allclose(res["res_gen.p_mw"].values, ref["res_gen.p_mw"].values)
+
+    # results of other arguments must not be mixed up
+    with pytest.raises(ValueError):
+        run_chunked_timeseries(net, range(8), folder, chunk_size=4, output_vals=output_vals)
+
+
+class StepCounter(Controller):
+    """Controller with a state: sets the active power of sgen 0 to the number of time steps run."""
+
+    def __init__(self, net, **kwargs):
+        super().__init__(net, **kwargs)
+        self.n_steps = 0
+
+    def time_step(self, net, time):
+        self.n_steps += 1
+        net.sgen.loc[0, "p_mw"] = float(self.n_steps)
+
+    def is_converged(self, net):
+        return True
+
+
+def test_chunked_controller_state(tmp_path):
+    net = pn.example_simple()
+    net.profiles = {"load.p_mw": pd.DataFrame(1., index=range(8), columns=net.load.index)}
+    StepCounter(net)
+    output_vals = [("res_sgen", "p_mw")]
+    folder = str(tmp_path)
+
+    # chunks which run one after another carry over the controller state
+    res = run_chunked_timeseries(deepcopy(net), range(8), folder, chunk_size=3,
+                                 output_vals=output_vals, verbose=False)
+    assert res["res_sgen.p_mw"][0].tolist() == list(range(1, 9))
+
+    # a chunk which is run again starts with the state of the given net
+    os.remove(os.path.join(folder, "000003_000005.done"))
+    res = run_chunked_timeseries(deepcopy(net), range(8), folder, chunk_size=3,
+                                 output_vals=output_vals, verbose=False)
+    assert res["res_sgen.p_mw"][0].tolist() == [1, 2, 3, 1, 2, 3, 7, 8]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
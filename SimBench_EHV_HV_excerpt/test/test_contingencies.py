@@ -0,0 +1,65 @@
+from copy import deepcopy
+import pytest
+import numpy as np
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import LODFScreening, bus_injections, contingency_list, \
+    run_contingency_analysis, set_time_step
+
+
+@pytest.fixture(scope="module")
+def net():
+    return sbe.SimBench_for_phd(time_steps=[0, 48])
+
+
+def test_lodf_screening(net):
+    screening = LODFScreening(net)
+    contingencies = contingency_list(net, ets=["line"])
+    contingencies = contingencies.loc[~screening.islanding.loc[list(zip(
+        contingencies.et, contingencies.element))].values].iloc[:3]
+    p_mw = bus_injections(net, {}, [0])[0]
+
+    # base case flows and post-contingency loadings equal DC power flow results
+    net = deepcopy(net)
+    pp.rundcpp(net)
+    assert np.allclose(screening.flows(p_mw)[0, :net.line.shape[0]], net.res_line.p_from_mw)
+    loading, critical = screening.post_contingency_loading(p_mw, contingencies)
+    for i, line in enumerate(contingencies.element):
+        net.line.at[line, "in_service"] = False
+        pp.rundcpp(net)
+        net.line.at[line, "in_service"] = True
+        dc_loading = net.res_line.p_from_mw.abs() / (np.sqrt(3) * net.line.max_i_ka * \
+            net.bus.vn_kv.loc[net.line.from_bus].values) * 100
+        assert np.isclose(loading[0, i], dc_loading.max(), rtol=1e-6)
+        assert screening.branches[critical[0, i]] == ("line", dc_loading.idxmax())
+
+
+def test_run_contingency_analysis(net):
+    contingencies = contingency_list(net, zones=[3])
+    assert (net.bus.zone.loc[net.line.from_bus.loc[contingencies.element]] == 3).all()
+    res = run_contingency_analysis(net, contingencies, screening_margin=10.)
+    ac, summary = res["ac"], res["summary"]
+    assert list(summary.index) == [3]
+    assert summary.at[3, "n_contingencies"] == len(contingencies)
+    assert summary.at[3, "n_pairs"] == 2 * (len(contingencies) - summary.at[3, "n_islanding"])
+    assert summary.at[3, "n_flagged"] == len(ac) == (res["screening"] > 90.).values.sum()
+    assert summary.at[3, "n_violations"] == ac.violation.sum()
+    assert summary.at[3, "max_loading_percent"] == ac.max_loading_percent.max()
+
+    # AC results of a flagged pair are reproduced by a single power flow
+    row = ac.loc[ac.converged].iloc[0]
+    net_ts = deepcopy(net)
+    set_time_step(net_ts, row.time_step)
+    net_ts[row.et].at[row.element, "in_service"] = False
+    pp.runpp(net_ts)
+    assert np.isclose(max(net_ts.res_line.loading_percent.max(),
+                          net_ts.res_trafo.loading_percent.max()), row.max_loading_percent)
+
+    # parallel AC power flows give the same results
+    res_parallel = run_contingency_analysis(net, contingencies, screening_margin=10., n_jobs=2)
+    assert res_parallel["ac"].equals(ac)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
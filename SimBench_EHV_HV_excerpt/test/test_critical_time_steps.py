@@ -0,0 +1,110 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import CriticalTimeStepIndex, critical_time_step_index, \
+    export_net, Profiles, CRITICAL_TIME_STEPS_FILE
+
+
+def _net():
+    net = pp.create_empty_network()
+    b1 = pp.create_bus(net, 110, zone=1)
+    b2 = pp.create_bus(net, 110, zone=2)
+    pp.create_load(net, b1, 0., name="load 1")
+    pp.create_load(net, b2, 0., name="load 2")
+    pp.create_load(net, b2, 0., name="ExtL_1")
+    pp.create_sgen(net, b1, 0., name="wind 1")
+    pp.create_gen(net, b2, 0., name="eq gen 2")
+    index = pd.RangeIndex(100, 106)
+    net.profiles = {
+        "load.p_mw": pd.DataFrame({0: [5., 6, 7, 8, 9, 4], 1: [1., 2, 3, 2, 1, 0],
+                                   2: [0., 0, 0, 0, 10, 0]}, index=index),
+        "sgen.p_mw": pd.DataFrame({0: [0., 8, 1, 0, 0, 0]}, index=index),
+        "gen.p_mw": pd.DataFrame({0: [1., 1, 1, 1, 1, 1]}, index=index),
+    }
+    return net
+
+
+def test_critical_time_step_index(tmp_path):
+    net = _net()
+    index = critical_time_step_index(net)
+
+    assert list(index.metric("residual")[1]) == [5., -2, 6, 8, 9, 4]
+    assert list(index.metric("boundary")[2]) == [0., 0, 0, 0, 10, 0]
+    assert list(index.metric("import")[2]) == [0., 1, 2, 1, 10, -1]
+    assert list(index.metric("generation")[1]) == [0., 8, 1, 0, 0, 0]
+    assert list(index.top_k(1, "residual", k=2)) == [104, 103]
+    assert list(index.top_k(1, "residual", k=1, largest=False)) == [101]
+    # zone 2 has no generation except equivalents -> first time step
+    assert list(index.critical_time_steps(k=1, metrics=["load", "generation"])) == [
+        100, 101, 102, 104]
+    extremes = index.extremes()
+    assert extremes.at[("load", 2), "max_time_step"] == 102
+    assert extremes.at[("residual", 1), "min"] == -2.
+
+    # stored next to the profiles
+    file = str(tmp_path / CRITICAL_TIME_STEPS_FILE)
+    index.to_parquet(file)
+    loaded = CriticalTimeStepIndex.from_parquet(file)
+    pd.testing.assert_frame_equal(loaded.values, index.values)
+    assert loaded.elements_key == index.elements_key
+    assert list(loaded.top_k(1, "residual", k=2)) == [104, 103]
+
+    # the stored index is used for the profiles it belongs to and their subsets
+    net.profiles = Profiles(net.profiles)
+    net.profiles.critical_time_steps = loaded
+    assert critical_time_step_index(net) is loaded
+    assert critical_time_step_index(net, net.profiles.copy()) is loaded
+    subset = Profiles({key: df.loc[[102, 104]] for key, df in net.profiles.items()})
+    subset.critical_time_steps = loaded
+    assert list(critical_time_step_index(net, subset).values.index) == [102, 104]
+
+    # other elements or replaced profiles result in a new index
+    net.load.loc[2, "name"] = "load 3"
+    assert critical_time_step_index(net) is not loaded
+    net.load.loc[2, "name"] = "ExtL_1"
+    net.profiles["load.p_mw"] = net.profiles["load.p_mw"] * 2
+    assert net.profiles.critical_time_steps is None
+    assert list(critical_time_step_index(net).metric("load")[1]) == [10., 12, 14, 16, 18, 8]
+
+
+def test_stored_critical_time_step_index(tmp_path):
+    net = _net()
+    export_net(net, str(tmp_path / "export"))
+    folder = str(tmp_path / "export" / "profiles")
+    assert CRITICAL_TIME_STEPS_FILE in os.listdir(folder)
+
+    loaded = pp.from_json(str(tmp_path / "export" / "net.json"))
+    sbe.toolbox.add_profiles_from_parquet_to_net(
+        loaded, True, False, profiles_folder=folder, generate_missing=False)
+    stored = loaded.profiles.critical_time_steps
+    assert isinstance(stored, CriticalTimeStepIndex)
+    assert critical_time_step_index(loaded) is stored
+    pd.testing.assert_frame_equal(stored.values, CriticalTimeStepIndex(net).values,
+                                  check_freq=False, check_index_type=False)
+
+    # the index of the bundled profiles is computed at first use and cached next to the
+    # generated profiles
+    cache = str(tmp_path / "cache")
+    net = sbe.SimBench_for_phd(time_steps=range(2*96), simbench_profiles_folder=cache)
+    assert net.profiles.critical_time_steps is None
+    computed = critical_time_step_index(net)
+    assert net.profiles.critical_time_steps is computed
+    assert len([file for file in os.listdir(cache) if file.startswith(
+        "critical_time_steps-")]) == 1
+    net = sbe.SimBench_for_phd(time_steps=range(2*96), simbench_profiles_folder=cache)
+    cached = critical_time_step_index(net)
+    assert cached is not computed
+    assert np.allclose(cached.values, computed.values, rtol=1e-6, atol=1e-3)
+    # other zones result in another cache file
+    net.bus.loc[net.bus.zone == 1, "zone"] = 0
+    assert critical_time_step_index(net).zones.tolist() != computed.zones.tolist()
+    assert len([file for file in os.listdir(cache) if file.startswith(
+        "critical_time_steps-")]) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
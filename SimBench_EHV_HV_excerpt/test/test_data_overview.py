@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.data_overview import add_ph, add_thousand_sep_digit, cable_length, \
+    digits, element_number, number_to_str, ohl_length, p_gen_max, p_gen_min, p_load_max, \
+    p_load_min, zone_statistics
+from SimBench_EHV_HV_excerpt.toolbox import ZoneDecomposition
+
+
+@pytest.fixture(scope="module")
+def net():
+    return sbe.SimBench_for_phd(time_steps=range(96))
+
+
+def test_zone_statistics(net):
+    stats = zone_statistics(net)
+    assert list(stats.index) == [1, 2, 3, 4, "Complete Grid"]
+
+    # the zone statistics equal the per subnet functions (branches between zones count for both)
+    subnets = ZoneDecomposition(net, include_profiles=False).subnets
+    for zone, subnet in list(subnets.items()) + [("Complete Grid", net)]:
+        for et in ["bus", "line", "trafo", "load", "gen", "sgen"]:
+            assert stats.at[zone, f"n_{et}"] == element_number(subnet, et, zone)
+        assert np.isclose(stats.at[zone, "ohl_length_km"], ohl_length(subnet, net))
+        assert np.isclose(stats.at[zone, "cable_length_km"], cable_length(subnet, net))
+        for col, fct in [("p_load_min_mw", p_load_min), ("p_load_max_mw", p_load_max),
+                         ("p_gen_min_mw", p_gen_min), ("p_gen_max_mw", p_gen_max)]:
+            assert np.isclose(stats.at[zone, col], fct(subnet, net.profiles), rtol=1e-5)
+    assert stats.at["Complete Grid", "voltage_levels"] == "380, 220, 110"
+    assert stats.at[3, "voltage_levels"] == "110"
+    assert stats.n_ExtL_load.iat[-1] == (net.load.name.str.startswith("ExtL")).sum()
+
+    # branches between zones are assigned to the lowest zone of their buses
+    lengths = zone_statistics(net, profiles=dict(), branch_zones="min")
+    assert np.isclose(lengths.ohl_length_km.iloc[:-1].sum(), lengths.ohl_length_km.iat[-1])
+    assert np.allclose(lengths.ohl_length_km.loc[[2, 3]], [4010.3, 1082.126], atol=1e-3)
+
+    # multiple zone definitions at once
+    bus_zones = pd.DataFrame({"zones": net.bus.zone, "voltage": net.bus.vn_kv})
+    multi = zone_statistics(net, bus_zones, profiles=dict())
+    assert multi.loc["zones"].drop(columns="voltage_levels").equals(stats.drop(
+        columns=["voltage_levels"] + [col for col in stats.columns if col.startswith(
+            "p_")]).iloc[:-1])
+    assert multi.loc[("voltage", 110.), "n_bus"] == (net.bus.vn_kv == 110.).sum()
+
+
+def test_add_ph():
+    df = pd.DataFrame({"a": [1234.56, -7.04, 0., 81.95], "b": [12, 3, -45678, 1000]})
+    expected = {col: df[col].apply(number_to_str, max_digits=max(add_thousand_sep_digit(digits(
+        val, add_minus_as_digit=True)) for val in df[col]), decimals=1) for col in df.columns}
+    add_ph(df)
+    for col in df.columns:
+        assert list(df[col]) == list(expected[col])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,70 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from SimBench_EHV_HV_excerpt.toolbox import downcast_profiles, downcast_numerics
+
+
+def test_downcast_profiles():
+    vm = pd.DataFrame(np.linspace(0.95, 1.05, 20).reshape(10, 2))
+    profiles = {
+        "gen.vm_pu": vm,
+        "load.p_mw": pd.DataFrame({"a": np.arange(10) * 10.5, "b": [1e40] + [0.] * 9}),
+        "switch.closed": pd.DataFrame({"a": np.arange(10), "b": np.arange(10) * 1000}),
+    }
+    report = downcast_profiles(profiles)
+    assert (profiles["gen.vm_pu"].dtypes == np.float32).all()
+    assert np.allclose(profiles["gen.vm_pu"].values, vm.values, rtol=0., atol=1e-6)
+    # float32 would overflow for column b
+    assert list(profiles["load.p_mw"].dtypes) == [np.float32, np.float64]
+    assert list(profiles["switch.closed"].dtypes) == [np.int8, np.int16]
+    assert list(report.n_downcasted) == [2, 1, 2]
+    assert report.at["gen.vm_pu", "bytes_saved"] == 10 * 2 * 4
+    assert 0 < report.at["gen.vm_pu", "max_abs_error"] < 1e-7
+
+    # stricter tolerance for the voltages
+    profiles = {"gen.vm_pu": vm}
+    report = downcast_profiles(profiles, tolerances={"gen.vm_pu": (1e-12, 0.)})
+    assert profiles["gen.vm_pu"] is vm
+    assert report.at["gen.vm_pu", "n_downcasted"] == 0
+
+
+def test_downcast_hdf_store(tmp_path):
+    pytest.importorskip("tables")
+    vm = pd.DataFrame(np.linspace(0.95, 1.05, 20).reshape(10, 2), columns=["a", "b"])
+    p_mw = pd.DataFrame({"a": np.arange(10) * 10.5, "b": [1e40] + [0.] * 9})
+    with pd.HDFStore(os.path.join(tmp_path, "profiles.h5"), mode="w") as store:
+        store.put("gen/vm_pu", vm, format="table")
+        store.put("load/p_mw", p_mw, format="table")
+        store.put("sgen/p_mw", p_mw, format="fixed")
+        report = downcast_profiles(store, chunksize=4)  # three chunks per table
+
+        # the downcasted temporary keys replaced the original keys
+        assert sorted(store.keys()) == ["/gen/vm_pu", "/load/p_mw", "/sgen/p_mw"]
+        assert store.get_storer("gen/vm_pu").is_table
+        assert (store["gen/vm_pu"].dtypes == np.float32).all()
+        assert np.allclose(store["gen/vm_pu"].values, vm.values, rtol=0., atol=1e-6)
+        pd.testing.assert_index_equal(store["gen/vm_pu"].index, vm.index)
+        for key in ["load/p_mw", "sgen/p_mw"]:
+            assert list(store[key].dtypes) == [np.float32, np.float64]
+            assert np.allclose(store[key].values, p_mw.values)
+        assert store.get_storer("sgen/p_mw").is_table
+    assert list(report.n_downcasted.loc[["/gen/vm_pu", "/load/p_mw", "/sgen/p_mw"]]) == [2, 1, 1]
+    assert report.at["/gen/vm_pu", "bytes_saved"] == 10 * 2 * 4
+
+    # keys without downcastable columns are not rewritten
+    with pd.HDFStore(os.path.join(tmp_path, "profiles.h5")) as store:
+        report = downcast_profiles(store, tolerances={"vm_pu": (1e-12, 0.)}, chunksize=4)
+        assert report.n_downcasted.sum() == 0
+        assert sorted(store.keys()) == ["/gen/vm_pu", "/load/p_mw", "/sgen/p_mw"]
+
+
+def test_downcast_numerics():
+    df = pd.DataFrame({"a": [1.5, 2.], "b": [1, 300]})
+    downcast_numerics(df)
+    assert list(df.dtypes) == [np.float32, np.int16]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
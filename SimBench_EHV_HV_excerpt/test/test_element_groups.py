@@ -0,0 +1,21 @@
+import pytest
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import element_groups, regular_elements
+
+
+def test_element_groups():
+    net = pp.create_empty_network()
+    bus = pp.create_bus(net, 110)
+    for name in ["Load 1", "ExtL_12", "eq load", None]:
+        pp.create_load(net, bus, 1., name=name)
+    assert element_groups(net, "load").tolist() == ["regular", "ExtL", "eq", "regular"]
+    assert list(regular_elements(net, "load")) == [0, 3]
+
+    # the data overview neglects the same elements
+    assert sbe.data_overview.element_number(net, "load", "Complete Grid") == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
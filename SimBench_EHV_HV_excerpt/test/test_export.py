@@ -0,0 +1,70 @@
+import os
+import pytest
+import pandas as pd
+import pandapower as pp
+import pandapower.networks as pn
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import export_net
+
+
+def assert_tables_equal(net1, net2):
+    """Compares the element tables of both nets. Null values are normalized since the json
+    export does not distinguish between nan and None in object columns."""
+    tables = [key for key, df in net1.items() if isinstance(df, pd.DataFrame) and len(df) and
+              not key.startswith("_") and not key.startswith("res_")]
+    assert len(tables)
+    for key in tables:
+        pd.testing.assert_frame_equal(
+            net1[key].astype(object).where(net1[key].notna(), None),
+            net2[key].astype(object).where(net2[key].notna(), None))
+        pd.testing.assert_series_equal(net1[key].dtypes, net2[key].dtypes)
+
+
+def test_export_net(tmp_path, monkeypatch):
+    folder = os.path.join(str(tmp_path), "export")
+    net = pn.example_simple()
+    profiles = {"load.p_mw": pd.DataFrame({0: [1., 2., 3.]})}
+    net.profiles = profiles
+
+    export_net(net, folder)
+    assert net.profiles is profiles  # the profiles are detached only temporarily
+    assert sorted(os.listdir(folder)) == ["net.json", "profiles"]
+    net2 = pp.from_json(os.path.join(folder, "net.json"))
+    assert "profiles" not in net2.keys()
+    assert_tables_equal(net, net2)
+    net3 = pp.create_empty_network()
+    sbe.toolbox.add_profiles_from_parquet_to_net(net3, True, False, profiles_folder=os.path.join(
+        folder, "profiles"))
+    pd.testing.assert_frame_equal(net3.profiles["load.p_mw"], profiles["load.p_mw"])
+
+    # a failing export leaves the former export unchanged
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(sbe.toolbox.export, "store_profiles_to_parquet_files", fail)
+    net.profiles = {"load.p_mw": profiles["load.p_mw"] * 2}
+    with pytest.raises(OSError):
+        export_net(net, folder)
+    assert sorted(os.listdir(folder)) == ["net.json", "profiles"]
+    net3 = pp.create_empty_network()
+    sbe.toolbox.add_profiles_from_parquet_to_net(net3, True, False, profiles_folder=os.path.join(
+        folder, "profiles"))
+    pd.testing.assert_frame_equal(net3.profiles["load.p_mw"], profiles["load.p_mw"])
+    monkeypatch.undo()
+
+    # nets without profiles only get a json file, replacing the former export as a whole
+    del net["profiles"]
+    export_net(net, folder)
+    assert os.listdir(folder) == ["net.json"]
+    assert os.listdir(tmp_path) == ["export"]  # no temporary folders are left
+
+    # folders with other files are not replaced
+    with open(os.path.join(folder, "notes.txt"), "w") as file:
+        file.write("no export")
+    with pytest.raises(ValueError):
+        export_net(net, folder)
+    assert sorted(os.listdir(folder)) == ["net.json", "notes.txt"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
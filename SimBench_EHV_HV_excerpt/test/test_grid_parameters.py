@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+import SimBench_EHV_HV_excerpt as sbe
+
+
+@pytest.fixture(scope="module")
+def net():
+    return sbe.SimBench_for_phd()
+
+
+def test_grid_parameters(net):
+    params, params_rel = sbe.grid_parameters(net)
+
+    # line lengths and energy consumption of the HV zones as in the dissertation
+    assert np.allclose(params.line_length_km, [3515.6, 4010.3, 1082.1 + 1.4, 632.8 + 118.8],
+                       atol=0.1)
+    assert np.allclose(params.load_p_gwh, [13911.192222, 50020.810181, 812.065481, 764.235654],
+                       rtol=1e-6)
+    assert np.isclose(params_rel.weights.sum(), len(params))
+
+    # objective weights as predefined by SimBench_for_phd_obj_weights()
+    assert np.allclose(params_rel.weights, sbe.SimBench_for_phd_obj_weights(), rtol=1e-4)
+
+    # streamed profiles with time step weights equal the profiles in net.profiles
+    net_ts = sbe.SimBench_for_phd(time_steps=range(2*96))
+    params_ts = sbe.grid_parameters(net_ts)[0]
+    params_weighted = sbe.grid_parameters(net, time_step_weights=pd.Series(
+        1., index=range(2*96)), batch_size=100)[0]
+    assert np.allclose(params_weighted, params_ts)
+
+    # other zone definitions
+    params_merged = sbe.grid_parameters(net, bus_zones=net.bus.zone.clip(upper=2))[0]
+    assert np.isclose(params_merged.at[2, "load_p_gwh"], params.load_p_gwh.loc[2:].sum())
+    assert np.isclose(params_merged.line_length_km.sum(), params.line_length_km.sum())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
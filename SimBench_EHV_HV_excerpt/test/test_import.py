@@ -0,0 +1,63 @@
+import importlib
+import inspect
+import os
+import subprocess
+import sys
+import types
+import pytest
+
+import SimBench_EHV_HV_excerpt as sbe
+
+
+def run_python(code:str) -> str:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          check=True, cwd=os.path.dirname(sbe.sb_excerpt_dir)).stdout
+
+
+def test_lazy_package_import():
+    heavy = ["pandas", "pandapower", "simbench"]
+    imported = run_python(
+        "import sys\nimport SimBench_EHV_HV_excerpt\n"
+        f"print([module for module in {heavy} if module in sys.modules])")
+    assert imported.strip() == "[]"
+
+    # processes which only read profiles do not import pandapower or simbench
+    imported = run_python(
+        "import sys\nfrom SimBench_EHV_HV_excerpt.toolbox import read_profile_parquet, TimeSteps\n"
+        f"print([module for module in {heavy[1:]} if module in sys.modules])")
+    assert imported.strip() == "[]"
+
+
+def test_public_api():
+    # functions named as their modules are not hidden by the modules when other modules import
+    # them, e.g. overlays and scenarios import from SimBench_for_phd and chunked_timeseries from
+    # run_custom_timeseries
+    out = run_python(
+        "import SimBench_EHV_HV_excerpt.overlays, SimBench_EHV_HV_excerpt.scenarios\n"
+        "import SimBench_EHV_HV_excerpt.toolbox.profile_statistics\n"
+        "from SimBench_EHV_HV_excerpt.toolbox import run_chunked_timeseries, run_custom_timeseries\n"
+        "import SimBench_EHV_HV_excerpt as sbe\n"
+        "print(callable(sbe.SimBench_for_phd), callable(sbe.toolbox.profile_statistics), "
+        "callable(run_custom_timeseries))")
+    assert out.split() == ["True", "True", "True"]
+    assert isinstance(sbe.toolbox, types.ModuleType)
+    assert isinstance(sbe.data_overview, types.ModuleType)
+    assert set(sbe.__all__) <= set(dir(sbe))
+    with pytest.raises(AttributeError):
+        sbe.toolbox.not_existing_function
+
+    # all public functions and classes of the toolbox modules are available lazily
+    toolbox_dir = os.path.dirname(sbe.toolbox.__file__)
+    for filename in sorted(os.listdir(toolbox_dir)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        module = importlib.import_module(f"SimBench_EHV_HV_excerpt.toolbox.{filename[:-3]}")
+        for name, obj in vars(module).items():
+            if not name.startswith("_") and (inspect.isfunction(obj) or inspect.isclass(obj)) \
+                    and obj.__module__ == module.__name__:
+                assert name in sbe.toolbox.__all__, f"{name} of {module.__name__} is not exported"
+                assert getattr(sbe.toolbox, name) is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,73 @@
+import pytest
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt.toolbox import merge_same_bus_gens, merge_plan
+
+
+def _net():
+    net = pp.create_empty_network()
+    buses = pp.create_buses(net, 4, 110)
+    for bus, p in zip([0, 1, 1, 2, 2, 2], [10., 20., 30., 40., 50., 60.]):
+        pp.create_gen(net, buses[bus], p_mw=p, vm_pu=1.02, max_p_mw=2*p)
+    for bus, p in zip([1, 3, 3, 0], [1., 2., 3., 4.]):
+        pp.create_sgen(net, buses[bus], p_mw=p, q_mvar=p/10)
+    rng = np.random.default_rng(0)
+    index = pd.RangeIndex(5)
+    net.profiles = {
+        "gen.p_mw": pd.DataFrame(rng.random((5, 6)), index=index, columns=net.gen.index),
+        "gen.vm_pu": pd.DataFrame(1.02, index=index, columns=net.gen.index),
+        "sgen.p_mw": pd.DataFrame(rng.random((5, 4)), index=index, columns=net.sgen.index
+                                  ).astype(np.float32),
+    }
+    return net
+
+
+def test_merge_same_bus_gens():
+    net = _net()
+    expected = deepcopy(net)
+    pp.merge_same_bus_generation_plants(expected, gen_elms=["gen"])
+    pp.merge_same_bus_generation_plants(expected, gen_elms=["sgen"])
+    profiles = net.profiles
+    assert merge_same_bus_gens(net, gen_elms=["gen"])
+    assert merge_same_bus_gens(net, gen_elms=["sgen"])
+
+    for et in ["gen", "sgen"]:
+        pd.testing.assert_frame_equal(net[et], expected[et])
+    for key in ["gen.p_mw", "gen.vm_pu"]:
+        pd.testing.assert_frame_equal(net.profiles[key], expected.profiles[key],
+                                      check_column_type=False)
+    assert net.profiles["sgen.p_mw"].dtypes.eq(np.float32).all()
+    assert np.allclose(net.profiles["sgen.p_mw"].values,
+                       expected.profiles["sgen.p_mw"].values)
+    assert net.profiles is profiles and profiles["gen.p_mw"].shape == (5, 3)
+    assert not merge_same_bus_gens(net, gen_elms=["gen"])
+
+
+def test_merge_plan():
+    net = _net()
+    plan = merge_plan(net, ["gen", "sgen"])
+    assert plan is merge_plan(deepcopy(net), ["gen", "sgen"])  # cached
+    assert list(plan.kept("gen")) == [0, 1, 3] and list(plan.kept("sgen")) == [1]
+    assert list(plan.dropped("sgen")) == [0, 2, 3] and list(plan.merging("gen")) == [0, 1, 3]
+
+    # gen and sgen at the same buses are merged into the gens
+    merged = plan.aggregate({"gen": net.profiles["gen.p_mw"], "sgen": net.profiles["sgen.p_mw"]})
+    assert np.allclose(merged["gen"][1].values, net.profiles["gen.p_mw"][[1, 2]].sum(
+        axis=1).values + net.profiles["sgen.p_mw"][0].values)
+    assert list(merged["sgen"].columns) == [1]
+
+    # deviating voltages
+    vm = net.profiles["gen.vm_pu"].copy()
+    vm.loc[3, 5] = 1.05
+    deviation = plan.max_deviation({"gen": vm})["gen"]
+    assert np.isclose(deviation.at[3], 0.03) and deviation.drop(3).eq(0.).all()
+    net.gen.at[4, "vm_pu"] = 1.
+    with pytest.raises(ValueError):
+        merge_same_bus_gens(net, gen_elms=["gen"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt.toolbox import run_opf_timeseries
+
+
+def _net() -> pp.pandapowerNet:
+    net = pp.create_empty_network()
+    buses = pp.create_buses(net, 4, 110, min_vm_pu=0.9, max_vm_pu=1.1)
+    for fb, tb in [(0, 1), (1, 2), (2, 3), (3, 0)]:
+        pp.create_line(net, buses[fb], buses[tb], 10., "149-AL1/24-ST1A 110.0",
+                       max_loading_percent=100.)
+    pp.create_gen(net, buses[0], 0., slack=True, controllable=True, min_p_mw=-100,
+                  max_p_mw=100, min_q_mvar=-50, max_q_mvar=50)
+    pp.create_poly_cost(net, 0, "gen", cp1_eur_per_mw=1.)
+    pp.create_load(net, buses[2], 30., 5.)
+    pp.create_sgens(net, buses[[1, 3]], 10., sn_mva=20., controllable=True)
+    net.sgen["qcurve1"] = "4120_v2"
+    index = pd.RangeIndex(6)
+    net.profiles = {
+        "load.p_mw": pd.DataFrame({0: np.linspace(20, 40, 6)}, index=index, dtype=np.float32),
+        "sgen.p_mw": pd.DataFrame({0: np.linspace(0, 15, 6), 1: 10.}, index=index),
+        "sgen.max_q_mvar": pd.DataFrame({0: 5., 1: [5., 5, 5, 5, 0, 0]}, index=index),
+    }
+    return net
+
+
+def test_run_opf_timeseries():
+    net = _net()
+    res = run_opf_timeseries(net, window_size=3)
+    opf = res["opf"]
+    assert opf.converged.all()
+    assert list(opf.window) == [0, 0, 0, 1, 1, 1]
+    assert list(opf.warm_start) == [False, True, True, False, True, True]
+    assert "min_p_mw" not in net.sgen.columns  # the net is not changed
+
+    # the active power of the sgens is fixed, the slack covers the rest at least costs
+    assert np.allclose(res["res_sgen.p_mw"].values, net.profiles["sgen.p_mw"].values)
+    assert np.allclose(opf.objective, res["res_gen.p_mw"][0])
+    # time-resolved limits from profiles override the VDE limits
+    assert (res["res_sgen.q_mvar"][1].iloc[4:] <= 1e-4).all()
+    assert (res["res_sgen.q_mvar"].values <= 5. + 1e-4).all()
+
+    # cold starts and parallel windows give the same results
+    res_cold = run_opf_timeseries(net, window_size=3, warm_start=False, n_jobs=2)
+    assert not res_cold["opf"].warm_start.any()
+    assert np.allclose(res_cold["opf"].objective, opf.objective, atol=1e-4)
+
+    # with curtailment, the sgens' infeed can be reduced (here in favour of the slack)
+    net.poly_cost.at[0, "cp1_eur_per_mw"] = -1.
+    res = run_opf_timeseries(net, curtailment=True)
+    assert res["opf"].converged.all()
+    assert np.allclose(res["res_sgen.p_mw"].values, 0., atol=1e-3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
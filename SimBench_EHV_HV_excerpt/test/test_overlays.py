@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+
+
+def test_zone_variants():
+    base_net = sbe.SimBench_for_phd(time_steps=[0, 1], wbb=True)
+    base_zones = base_net.bus.zone.copy()
+    nets = sbe.zone_variants(base_net)
+    assert len(nets) == 4
+
+    for name, net in nets.items():
+        options = dict(kv.split("=") for kv in name.split("|"))
+        expected = sbe.SimBench_for_phd(
+            time_steps=[0, 1], wbb=options["wbb"] == "True", ehv_grids=int(options["ehv_grids"]))
+        pd.testing.assert_series_equal(net.bus.zone, expected.bus.zone)
+        assert sbe.data_overview.element_number(net, "load", 1) == \
+            sbe.data_overview.element_number(expected, "load", 1)
+
+        # everything except of the bus table and the results is shared with the base net
+        assert net.profiles is base_net.profiles
+        assert np.shares_memory(net.line.length_km.values, base_net.line.length_km.values)
+        assert not np.shares_memory(net.bus.vn_kv.values, base_net.bus.vn_kv.values)
+        pd.testing.assert_frame_equal(net.line, base_net.line)
+
+    # the base net is not changed, neither by the variants nor by power flows of the variants
+    pd.testing.assert_series_equal(base_net.bus.zone, base_zones)
+    pp.runpp(base_net)
+    base_res = {key: base_net[key].copy() for key in ["res_bus", "res_line", "res_trafo"]}
+    base_tables = {key: base_net[key].copy() for key in ["bus", "line", "sgen", "load"]}
+    variant = nets["wbb=False|ehv_grids=2"]
+    variant.sgen.p_mw = 0.
+    variant.load.p_mw = base_net.load.p_mw * 2
+    pp.runpp(variant)
+    assert not np.allclose(variant.res_bus.vm_pu, base_res["res_bus"].vm_pu)
+    with pytest.raises(ValueError):
+        variant.line.loc[variant.line.index[0], "length_km"] = 1.
+    for key, df in (base_res | base_tables).items():
+        pd.testing.assert_frame_equal(base_net[key], df)
+
+    with pytest.raises(ValueError):
+        sbe.zone_variant(nets["wbb=False|ehv_grids=2"], wbb=True)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -1,6 +1,8 @@
+import os
 import pytest
 import tempfile
 import shutil
+import numpy as np
 import pandas as pd
 import pandapower as pp
 
@@ -28,12 +30,75 @@ def test_combined_profile_fcts():
     # load data with time_steps
     net3 = pp.create_empty_network()
     sbe.toolbox.add_profiles_from_parquet_to_net(net3, [2, 1], False, profiles_folder=temp_dir)
-    pd.testing.assert_frame_equal(net3.profiles["load.p_mw"], profiles["load.p_mw"].loc[[1, 2]])
-    pd.testing.assert_frame_equal(net3.profiles["sgen.q_mvar"], profiles["sgen.q_mvar"].loc[[1, 2]])
+    pd.testing.assert_frame_equal(net3.profiles["load.p_mw"], profiles["load.p_mw"].loc[[2, 1]])
+    pd.testing.assert_frame_equal(net3.profiles["sgen.q_mvar"], profiles["sgen.q_mvar"].loc[[2, 1]])
 
     shutil.rmtree(temp_dir)
 
 
+def test_store_profiles_upsert(tmp_path):
+    folder = str(tmp_path)
+    profiles = {
+        "load.p_mw": pd.DataFrame([[1., 2.], [3., 4.], [5., 6.]]),
+        "sgen.q_mvar": pd.DataFrame([[1., 2.], [3., 4.], [5., 6.]]),
+    }
+    sbe.toolbox.store_profiles_to_parquet_files(profiles, folder)
+    sgen_file = os.path.join(folder, "two_days", "sgen.q_mvar.parquet")
+    sgen_inode = os.stat(sgen_file).st_ino
+
+    # replace time step 2 and append time step 3 of load.p_mw only
+    update = pd.DataFrame([[7., 8.], [9., 10.]], index=[2, 3])
+    sbe.toolbox.store_profiles_to_parquet_files({"load.p_mw": update}, folder, upsert=True)
+    net = pp.create_empty_network()
+    sbe.toolbox.add_profiles_from_parquet_to_net(net, True, False, profiles_folder=folder)
+    pd.testing.assert_frame_equal(net.profiles["load.p_mw"], pd.concat([
+        profiles["load.p_mw"].loc[[0, 1]], update]))
+    pd.testing.assert_frame_equal(net.profiles["sgen.q_mvar"], profiles["sgen.q_mvar"])
+    assert os.stat(sgen_file).st_ino == sgen_inode  # not rewritten
+
+    # a failing upsert leaves the files unchanged and no staging folders behind
+    with pytest.raises(ValueError):
+        sbe.toolbox.store_profiles_to_parquet_files(
+            {"load.p_mw": pd.DataFrame([[1.]], index=[0])}, folder, upsert=True)
+    assert sorted(os.listdir(folder)) == ["rest_of_the_year", "two_days"]
+    pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(
+        folder, "two_days", "load.p_mw.parquet")), net.profiles["load.p_mw"])
+
+    # without upsert, keys which are not given are removed
+    sbe.toolbox.store_profiles_to_parquet_files({"load.p_mw": update}, folder)
+    assert os.listdir(os.path.join(folder, "two_days")) == ["load.p_mw.parquet"]
+
+
+def test_run_length_encoded_profiles(tmp_path):
+    # the bundled files are plain parquet files, readable without this package
+    for subfolder in ["two_days", "rest_of_the_year"]:
+        for file in os.listdir(os.path.join(sbe.data_path, subfolder)):
+            file = os.path.join(sbe.data_path, subfolder, file)
+            assert sbe.toolbox.read_profile_parquet(file).equals(pd.read_parquet(file)), file
+
+    folder = str(tmp_path)
+    vm = pd.DataFrame(np.repeat([[1.02, 1.], [1.03, 1.], [1.03, np.nan]], 64, axis=0).astype(
+        np.float32), columns=[28, 30])
+    profiles = {"gen.vm_pu": vm, "load.p_mw": vm.astype(np.float64)}
+    sbe.toolbox.store_profiles_to_parquet_files(profiles, folder, encoded_keys=["gen.vm_pu"])
+    files = {key: os.path.join(folder, "two_days", f"{key}.parquet") for key in profiles}
+    assert os.path.getsize(files["gen.vm_pu"]) < os.path.getsize(files["load.p_mw"])
+
+    net = pp.create_empty_network()
+    sbe.toolbox.add_profiles_from_parquet_to_net(net, True, False, profiles_folder=folder)
+    pd.testing.assert_frame_equal(net.profiles["gen.vm_pu"], vm)
+    pd.testing.assert_frame_equal(sbe.toolbox.read_profile_parquet(
+        files["gen.vm_pu"], columns=[30]), vm[[30]])
+
+    # upsert into an encoded file
+    update = pd.DataFrame([[1.01, 0.99]], index=[5], columns=[28, 30], dtype=np.float32)
+    sbe.toolbox.store_profiles_to_parquet_files({"gen.vm_pu": update}, folder, upsert=True,
+                                                encoded_keys=["gen.vm_pu"])
+    expected = vm.copy()
+    expected.loc[5] = update.loc[5]
+    pd.testing.assert_frame_equal(sbe.toolbox.read_profile_parquet(files["gen.vm_pu"]), expected)
+
+
 if __name__ == "__main__":
     # pytest.main([__file__])  # run all tests
 
@@ -0,0 +1,67 @@
+import pickle
+from copy import deepcopy
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import profile_statistics, active_columns, Profiles, \
+    CriticalTimeStepIndex
+
+
+def test_profile_statistics():
+    df = pd.DataFrame({3: [0., 0., 0., 0.], 5: [2., 2., 2., 2.], 7: [0., 1., 0., 0.]},
+                      dtype=np.float32)
+    stats = profile_statistics(df)
+    assert list(stats.index) == [3, 5, 7]
+    assert list(stats.constant) == [True, True, False]
+    assert list(stats.active) == [False, True, True]
+    assert np.allclose(stats.value, [0., 2., 0.])
+    assert np.allclose(stats.nonzero_share, [0., 1., 0.25])
+
+
+def test_active_columns():
+    df = pd.DataFrame({3: [0., 0.], 5: [2., 2.], 7: [0., 1e-5]})
+    assert list(active_columns(df)) == [5]
+    assert list(active_columns(df, tol=1e-6)) == [5, 7]
+
+
+def test_profiles(tmp_path):
+    df = pd.DataFrame({3: [0., 0.], 5: [2., 2.], 7: [0., 1e-5]})
+    sbe.toolbox.store_profiles_to_parquet_files({"sgen.p_mw": df}, str(tmp_path))
+    net = pp.create_empty_network()
+    pp.create_sgens(net, [pp.create_bus(net, 110, zone=1)]*3, 0., index=[3, 5, 7])
+    sbe.toolbox.add_profiles_from_parquet_to_net(net, True, False, profiles_folder=str(tmp_path),
+                                                 generate_missing=False)
+
+    # the statistics are computed by the loader and reused
+    assert isinstance(net.profiles, Profiles)
+    stats = net.profiles.statistics("sgen.p_mw")
+    pd.testing.assert_frame_equal(stats, profile_statistics(net.profiles["sgen.p_mw"]))
+    assert net.profiles.statistics("sgen.p_mw") is stats
+    assert list(net.profiles.active_columns("sgen.p_mw")) == [5]
+    assert list(net.profiles.active_columns("sgen.p_mw", tol=1e-6)) == [5, 7]
+
+    # copies keep the statistics of unchanged DataFrames and the critical time step index
+    net.profiles.critical_time_steps = CriticalTimeStepIndex(net)
+    for profiles in [net.profiles.copy(), deepcopy(net.profiles), deepcopy(net).profiles,
+                     pickle.loads(pickle.dumps(net.profiles))]:
+        assert isinstance(profiles, Profiles)
+        stats_copy = profiles.statistics("sgen.p_mw")
+        assert stats_copy is stats if profiles["sgen.p_mw"] is net.profiles["sgen.p_mw"] else \
+            stats_copy.equals(stats)
+        assert profiles._statistics[("sgen.p_mw", 1e-4)][0] is profiles["sgen.p_mw"]
+        assert isinstance(profiles.critical_time_steps, CriticalTimeStepIndex)
+        pd.testing.assert_frame_equal(profiles.critical_time_steps.values,
+                                      net.profiles.critical_time_steps.values)
+
+    # replacing a profile invalidates its statistics
+    net.profiles["sgen.p_mw"] = df * 0
+    assert not len(net.profiles.active_columns("sgen.p_mw"))
+    net.profiles.update({"sgen.p_mw": df})
+    assert list(net.profiles.active_columns("sgen.p_mw")) == [5]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
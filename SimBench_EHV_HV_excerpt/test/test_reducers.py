@@ -0,0 +1,113 @@
+import inspect
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+import pandapower.networks as pn
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox.reducers import get_reducer, split_output_vals
+
+
+def test_reducers():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(2000, 5))
+    values[3, 2] = np.nan
+    expected = {
+        "max": np.nanmax(values, axis=0),
+        "min": np.nanmin(values, axis=0),
+        "sum": np.nansum(values, axis=0),
+        "mean": np.nanmean(values, axis=0),
+        ">1": (values > 1).sum(axis=0),
+        "<-1": (values < -1).sum(axis=0),
+    }
+    for name, expected_result in expected.items():
+        stepwise = get_reducer(name)
+        stepwise.reset(values.shape[1])
+        for row in values:
+            stepwise.update(row)
+        blockwise = get_reducer(name)
+        blockwise.reset(values.shape[1])
+        blockwise.update_block(values)
+        assert np.allclose(stepwise.result(), expected_result)
+        assert np.allclose(blockwise.result(), expected_result)
+
+    # quantile sketch
+    for q in [0.05, 0.5, 0.95]:
+        reducer = get_reducer(f"q{q}")
+        reducer.reset(values.shape[1])
+        for row in values:
+            reducer.update(row)
+        assert np.allclose(reducer.result(), np.nanquantile(values, q, axis=0), atol=0.05)
+
+    # split_output_vals
+    full, reduced = split_output_vals([("res_bus", "vm_pu", ["min", "max"]),
+                                       ("res_line", "loading_percent")])
+    assert full == [("res_line", "loading_percent")]
+    assert [reducer.name for reducer in reduced[("res_bus", "vm_pu")]] == ["min", "max"]
+
+
+def test_reduced_timeseries():
+    time_steps = range(4)
+    output_vals = [("res_line", "loading_percent"), ("res_bus", "vm_pu", ["min", "max"]),
+                   ("res_line", "loading_percent", ["max", ">50"])]
+    net = sbe.SimBench_for_phd(time_steps=time_steps)
+    res = sbe.toolbox.run_custom_timeseries(net, time_steps, "pp", None, output_vals=output_vals,
+                                            verbose=False)
+
+    # complete results are only available if requested without reducers
+    assert "res_bus.vm_pu" not in res.keys()
+    loading = res["res_line.loading_percent"]
+    assert loading.shape == (len(time_steps), len(net.line))
+    assert (loading.dtypes == np.float32).all()
+
+    assert isinstance(res["res_line.loading_percent.max"], pd.Series)
+    assert np.allclose(res["res_line.loading_percent.max"], loading.max())
+    assert np.array_equal(res["res_line.loading_percent.gt50"], (loading > 50).sum())
+    assert (res["res_bus.vm_pu.min"] <= res["res_bus.vm_pu.max"]).all()
+    assert res["res_bus.vm_pu.min"].index.equals(net.bus.index)
+
+
+def test_output_writer_overrides():
+    # CustomOutputWriter overrides private methods of pandapower's OutputWriter (written against
+    # pandapower 3.1) -> fail loudly if their signatures or the logged partial functions change
+    expected = {
+        "_init_np_array": ["self", "partial_func"],
+        "_log": ["self", "table", "variable", "net", "index", "eval_function", "eval_name"],
+        "_np_to_pd": ["self"],
+        "_save_separate": ["self", "append"],
+        "_get_np_name": ["self", "partial_args"],
+        "_get_output_name": ["self", "table", "variable"],
+        "log_variable": ["self", "table", "variable", "index", "eval_function", "eval_name"],
+    }
+    for method, parameters in expected.items():
+        assert list(inspect.signature(getattr(pp.timeseries.OutputWriter, method)).parameters) \
+            == parameters, f"signature of OutputWriter.{method}() changed"
+
+    net = pn.example_simple()
+    ow = pp.timeseries.OutputWriter(net, range(2), log_variables=list())
+    ow.log_variable("res_bus", "vm_pu", index=[0, 1])
+    ow.init_all(net)
+    partial_func = ow.output_list[0]
+    assert partial_func.func.__name__ == "_log"
+    assert len(partial_func.args) == 6
+    assert partial_func.args[:2] == ("res_bus", "vm_pu") and partial_func.args[3] == [0, 1]
+    assert ow._get_np_name(partial_func.args) in ow.np_results.keys()
+    assert hasattr(ow, "time_step_lookup")
+
+
+def test_output_writer_subsets():
+    # subsets of the same table with the same length are logged at their own positions
+    net = pn.example_simple()
+    ow = sbe.toolbox.CustomOutputWriter(net, range(2), log_variables=list())
+    ow.log_variable("res_bus", "vm_pu", index=[0, 1])
+    ow.log_variable("res_bus", "va_degree", index=[3, 2])
+    pp.timeseries.run_timeseries(net, time_steps=range(2), verbose=False)
+    for variable, index in [("vm_pu", [0, 1]), ("va_degree", [3, 2])]:
+        result = ow.output[f"res_bus.{variable}"]
+        assert list(result.columns) == index
+        assert np.allclose(result.values, net.res_bus[variable].loc[index].values, atol=1e-5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,59 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from SimBench_EHV_HV_excerpt.toolbox import representative_periods, k_medoids
+
+
+def _profiles(n_days:int=30, period_length:int=8) -> dict[str, pd.DataFrame]:
+    """profiles of three day types with little noise"""
+    rng = np.random.default_rng(1)
+    day_types = rng.random((3, period_length, 2)) * 10
+    types = np.arange(n_days) % 3
+    load = day_types[types].reshape(n_days * period_length, 2)
+    load += rng.normal(0, 0.01, load.shape)
+    index = pd.RangeIndex(n_days * period_length)
+    return {"load.p_mw": pd.DataFrame(load, index=index),
+            "sgen.p_mw": pd.DataFrame(load[:, ::-1] * 0.5, index=index)}
+
+
+def test_representative_periods(tmp_path):
+    profiles = _profiles()
+    rep = representative_periods(profiles, 3, period_length=8, cache_folder=str(tmp_path))
+    assert len(rep.time_steps) == 3 * 8
+    assert np.isclose(rep.weights.sum(), 30 * 8)
+    assert sorted(rep.period_weights.values) == [10., 10., 10.]
+    assert (rep.assignment.values % 3 == rep.assignment.index % 3).all()  # day types found
+    assert (rep.error.sum_rel_error.abs() < 1e-3).all()
+    assert len(os.listdir(tmp_path))
+
+    # deterministic and loaded from the cache
+    rep2 = representative_periods(profiles, 3, period_length=8, cache_folder=str(tmp_path))
+    assert np.array_equal(rep.medoids, rep2.medoids)
+
+    # mapping results of the representative time steps back to the horizon
+    results = profiles["load.p_mw"].loc[rep.time_steps]
+    assert np.allclose(rep.weighted_sum(results).values, profiles["load.p_mw"].sum().values,
+                       rtol=1e-3)
+    assert np.isclose(rep.energy(results[0]), profiles["load.p_mw"][0].sum() / 4, rtol=1e-3)
+    expanded = rep.expand(results)
+    assert expanded.shape == profiles["load.p_mw"].shape
+    assert np.allclose(expanded.values, profiles["load.p_mw"].values, atol=0.1)
+
+    with pytest.raises(ValueError):
+        representative_periods(profiles, 31, period_length=8)
+
+
+def test_k_medoids():
+    features = np.array([[0.], [0.1], [0.2], [10.], [10.1], [10.2], [20.]])
+    medoids, labels = k_medoids(features, 3)
+    assert list(medoids) == [1, 4, 6]
+    assert list(labels) == [0, 0, 0, 1, 1, 1, 2]
+    # a heavy weight pulls the medoid
+    medoids, _ = k_medoids(features, 3, weights=[1., 1., 10., 1., 1., 1., 1.])
+    assert list(medoids) == [2, 4, 6]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+import SimBench_EHV_HV_excerpt as sbe
+
+
+def test_scenario_net():
+    time_steps = [0, 1]
+    base_net = sbe.SimBench_for_phd_base_net(time_steps=time_steps)
+    p_sgen = base_net.profiles["sgen.p_mw"].copy()
+
+    for options in [{"wbb": True, "merged_same_bus_gens": True}, {"ehv_grids": 1}]:
+        net = sbe.scenario_net(base_net, **options)
+        expected = sbe.SimBench_for_phd(time_steps=time_steps, **options)
+        pd.testing.assert_series_equal(net.bus.zone, expected.bus.zone)
+        assert net.sgen.index.equals(expected.sgen.index)
+        pd.testing.assert_frame_equal(net.profiles["sgen.p_mw"], expected.profiles["sgen.p_mw"])
+
+    # the profiles of the base net are not changed by the scenarios
+    pd.testing.assert_frame_equal(base_net.profiles["sgen.p_mw"], p_sgen)
+    assert (base_net.bus.zone == 0).any()
+
+
+def test_run_scenarios():
+    time_steps = [0, 1]
+    scenarios = sbe.scenario_grid(wbb=[False, True], ehv_grids=[2])
+    res, timings = sbe.run_scenarios(
+        scenarios, time_steps, verbose=False,
+        output_vals=[("res_line", "loading_percent", "max"), ("res_bus", "vm_pu")])
+    assert list(res.keys()) == list(scenarios.keys())
+    assert isinstance(timings.at["base net", "build_s"], float)
+    assert timings.at["base net", "build_s"] > 0
+    assert (timings.loc[list(scenarios.keys()), "total_s"] > 0).all()
+
+    net = sbe.SimBench_for_phd(time_steps=time_steps)
+    expected = sbe.toolbox.run_custom_timeseries(net, time_steps, "pp", None, verbose=False,
+                                                 output_vals=[("res_bus", "vm_pu")])
+    assert np.allclose(res["wbb=False|ehv_grids=2"]["res_bus.vm_pu"], expected["res_bus.vm_pu"])
+
+    # parallel processes give the same results
+    res_parallel, timings_parallel = sbe.run_scenarios(
+        scenarios, time_steps, n_jobs=2, verbose=False,
+        output_vals=[("res_line", "loading_percent", "max"), ("res_bus", "vm_pu")])
+    assert list(res_parallel.keys()) == list(scenarios.keys())
+    assert "error" not in timings_parallel.columns
+    for name, scenario_res in res.items():
+        assert scenario_res.keys() == res_parallel[name].keys()
+        for key, values in scenario_res.items():
+            if isinstance(values, pd.Series):
+                pd.testing.assert_series_equal(values, res_parallel[name][key])
+            else:
+                pd.testing.assert_frame_equal(values, res_parallel[name][key])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
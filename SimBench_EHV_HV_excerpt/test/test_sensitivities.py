@@ -0,0 +1,82 @@
+import os
+import pytest
+import numpy as np
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import LineFlowSensitivities, linearized_line_flows, \
+    compare_to_ac, VoltageSensitivities, grid_sensitivities, screen_time_steps, \
+    run_custom_timeseries
+
+
+def test_line_flow_sensitivities():
+    net = sbe.SimBench_for_phd(time_steps=[0])
+    pp.runpp(net)
+    lines = net.line.index[:20]
+    sens = LineFlowSensitivities(net, lines=lines)
+    p_ref = net.res_line.p_from_mw.loc[lines].values
+
+    # increase a load and compare to the AC power flow
+    load = net.load.index[5]
+    dp_mw = np.zeros((1, net.bus.shape[0]))
+    dp_mw[0, net.bus.index.get_loc(net.load.bus.at[load])] = -10.
+    net.load.loc[load, "p_mw"] += 10.
+    pp.runpp(net)
+    flows = sens.flows(dp_mw, np.zeros_like(dp_mw))
+    assert np.allclose(flows["p_from_mw"][0], net.res_line.p_from_mw.loc[lines], atol=1e-3)
+    assert not np.allclose(p_ref, net.res_line.p_from_mw.loc[lines], atol=1e-3)
+
+
+def test_linearized_line_flows():
+    time_steps = list(range(0, 192, 4))
+    net = sbe.SimBench_for_phd(time_steps=time_steps)
+    lin = linearized_line_flows(net, time_steps, lines=net.line.index[:40])
+    assert lin["res_line.p_from_mw"].shape == (len(time_steps), 40)
+    report = compare_to_ac(net, lin, n_steps=4)
+    assert report.shape == (4, 3)
+    assert (report.mean_abs_dev < 0.02 * report.max_abs_ac).all()
+    p_rows = ["p_from_mw", "p_to_mw"]
+    assert (report.max_abs_dev[p_rows] < 0.05 * report.max_abs_ac[p_rows]).all()
+
+
+def test_voltage_sensitivities():
+    net = sbe.SimBench_for_phd(time_steps=[0])
+    pp.runpp(net)
+    sens = VoltageSensitivities(net)
+
+    # increase a load and a voltage setpoint and compare to the AC power flow
+    load = net.load.index[5]
+    bus = net.gen.bus.iloc[3]
+    dp_mw, dq_mvar, dvm_pu = [np.zeros((1, net.bus.shape[0])) for _ in range(3)]
+    dp_mw[0, net.bus.index.get_loc(net.load.bus.at[load])] = -10.
+    dq_mvar[0, net.bus.index.get_loc(net.load.bus.at[load])] = -5.
+    dvm_pu[0, net.bus.index.get_loc(bus)] = 0.01
+    net.load.loc[load, ["p_mw", "q_mvar"]] += [10., 5.]
+    net.gen.loc[net.gen.bus == bus, "vm_pu"] += 0.01
+    pp.runpp(net)
+    vm_pu = sens.voltages(dp_mw, dq_mvar, dvm_pu)
+    assert np.allclose(vm_pu[0], net.res_bus.vm_pu.values, atol=1e-4)
+
+
+def test_screen_time_steps(tmp_path):
+    net = sbe.SimBench_for_phd(time_steps=range(0, 192, 4))
+    sens = grid_sensitivities(net, cache_folder=str(tmp_path))
+    assert len(os.listdir(tmp_path))
+    assert "res_bus" not in net.keys() or not net.res_bus.shape[0]  # net is not changed
+    screening = screen_time_steps(net, sens=sens, max_loading_percent=70., chunk_size=10)
+    assert screening.shape[0] == 48
+
+    time_steps = list(screening.index[::8])
+    res = run_custom_timeseries(net, time_steps, "pp", None, verbose=False, output_vals=[
+        ("res_line", "loading_percent"), ("res_bus", "vm_pu")])
+    assert np.allclose(screening.max_loading_percent.loc[time_steps],
+                       res["res_line.loading_percent"].max(axis=1), atol=1.)
+    assert np.allclose(screening.max_vm_pu.loc[time_steps], res["res_bus.vm_pu"].max(axis=1),
+                       atol=0.01)
+    assert (screening.shortlisted == (screening.max_loading_percent > 60.) | (
+        screening.min_vm_pu < 0.91) | (screening.max_vm_pu > 1.09)).all()
+    assert 0 < screening.shortlisted.sum() < 48
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,115 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import pandapower as pp
+import simbench as sb
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import SIMBENCH_PROFILE_KEYS, SimBenchProfiles, \
+    simbench_profile_files, read_profile_parquet, element_groups
+
+
+def _nets():
+    sb_net = pp.create_empty_network()
+    b = pp.create_bus(sb_net, 110)
+    for i, profile in enumerate(["H0-A", "G1-B", "H0-A"]):
+        pp.create_load(sb_net, b, p_mw=10. * (i+1), q_mvar=i+1., index=i+10, profile=profile)
+    pp.create_sgen(sb_net, b, p_mw=5., profile="WP1")
+    pp.create_sgen(sb_net, b, p_mw=7., profile="hard coal")
+    n = 96 * 3
+    rng = np.random.default_rng(0)
+    sb_net.profiles = {
+        "load": pd.DataFrame({"time": np.arange(n), **{f"{p}_{s}": rng.random(n) for p in [
+            "H0-A", "G1-B"] for s in ["pload", "qload"]}}),
+        "renewables": pd.DataFrame({"time": np.arange(n), "WP1": rng.random(n)}),
+        "powerplants": pd.DataFrame({"time": np.arange(n), "hard coal": rng.random(n)}),
+    }
+
+    # excerpt: subset of the elements plus one element which is not part of SimBench
+    net = pp.create_empty_network()
+    b = pp.create_bus(net, 110)
+    for idx in [10, 12]:
+        pp.create_load(net, b, p_mw=1., index=idx, profile=sb_net.load.profile.at[idx])
+    pp.create_load(net, b, p_mw=42., q_mvar=4.2, index=99, name="ExtL_1")
+    pp.create_sgen(net, b, p_mw=1., index=0, profile="WP1")
+    pp.create_sgen(net, b, p_mw=1., index=1, profile="hard coal")
+    boundary_flows = {key: pd.DataFrame({99: rng.random(n) * 42.}) for key in [
+        "load.p_mw", "load.q_mvar"]}
+    return net, sb_net, boundary_flows
+
+
+def test_simbench_profiles():
+    net, sb_net, boundary_flows = _nets()
+    generator = SimBenchProfiles(net, sb_net=sb_net, boundary_flows=boundary_flows)
+    expected = sb.get_absolute_profiles_from_relative_profiles(sb_net, "load", "p_mw")
+    df = generator.window("load.p_mw", 96, 120)
+    assert df.dtypes.eq(np.float32).all()
+    assert list(df.index) == list(range(96, 120))
+    assert np.allclose(df[[10, 12]].values, expected.loc[96:119, [10, 12]].values, atol=1e-5)
+    # the ExtL load without SimBench profile gets the boundary flow profile
+    assert np.allclose(df[99].values, boundary_flows["load.p_mw"][99].values[96:120])
+    df = generator.window("load.q_mvar", 0, 5)
+    assert np.allclose(df[12].values, 3. * sb_net.profiles["load"]["H0-A_qload"].values[:5],
+                       atol=1e-6)
+    df = generator.window("sgen.p_mw", 10, 12)
+    assert np.allclose(df.values, [[5., 7.]] * sb_net.profiles["renewables"][["WP1"]].join(
+        sb_net.profiles["powerplants"][["hard coal"]]).values[10:12], atol=1e-5)
+
+    # elements without any source profile are not accepted
+    with pytest.raises(ValueError):
+        SimBenchProfiles(net, sb_net=sb_net, boundary_flows=dict())
+    # without given boundary flows, the flows are derived for ExtL_* loads only
+    SimBenchProfiles(net, sb_net=sb_net)
+    net.load.at[99, "name"] = "no_profile"
+    with pytest.raises(ValueError):
+        SimBenchProfiles(net, sb_net=sb_net)
+
+
+def test_bundled_time_steps(tmp_path):
+    # the generated profiles of the first two days equal the bundled profiles of all elements
+    net = sbe.SimBench_for_phd()
+    generator = SimBenchProfiles(net, cache_folder=str(tmp_path))
+    ext = net.load.index[element_groups(net, "load") == "ExtL"]
+    for key in SIMBENCH_PROFILE_KEYS:
+        bundled = pd.read_parquet(os.path.join(sbe.data_path, "two_days", f"{key}.parquet"))
+        df = generator.window(key, 0, 2*96)
+        columns = bundled.columns.difference(ext) if key.startswith("load") else bundled.columns
+        pd.testing.assert_frame_equal(df[columns], bundled[columns], check_index_type=False)
+        if key.startswith("load"):
+            # the derived boundary flows rerun the time series of the complete grid whose power
+            # flow results slightly deviate from the bundled ones
+            atol = {"load.p_mw": 0.1, "load.q_mvar": 5.}[key]
+            assert np.allclose(df[ext].values, bundled[ext].values, atol=atol)
+            assert len([file for file in os.listdir(tmp_path) if file.startswith(
+                f"boundary_flows-{key}-0-")]) == 1
+
+
+def test_simbench_profile_files(tmp_path):
+    net, sb_net, boundary_flows = _nets()
+    time_steps = range(96, 3*96)
+    files = simbench_profile_files(net, ["load.p_mw", "sgen.p_mw"], time_steps,
+                                   cache_folder=str(tmp_path), sb_net=sb_net,
+                                   boundary_flows=boundary_flows)
+    df = read_profile_parquet(files["load.p_mw"])
+    assert list(df.index) == list(time_steps)
+    assert np.allclose(df.values, SimBenchProfiles(net, sb_net, boundary_flows).window(
+        "load.p_mw", 96, 3*96).values)
+
+    # cached files are reused, changed elements or boundary flows result in new files
+    mtime = os.path.getmtime(files["load.p_mw"])
+    assert simbench_profile_files(net, ["load.p_mw"], time_steps, cache_folder=str(tmp_path),
+                                  boundary_flows=boundary_flows)["load.p_mw"] == files["load.p_mw"]
+    assert os.path.getmtime(files["load.p_mw"]) == mtime
+    boundary_flows["load.p_mw"] *= 2
+    assert simbench_profile_files(net, ["load.p_mw"], time_steps, cache_folder=str(tmp_path),
+                                  sb_net=sb_net, boundary_flows=boundary_flows)["load.p_mw"] != \
+        files["load.p_mw"]
+    net.load.at[12, "profile"] = "G1-B"
+    assert simbench_profile_files(net, ["load.p_mw"], time_steps, cache_folder=str(tmp_path),
+                                  sb_net=sb_net, boundary_flows=boundary_flows)["load.p_mw"] != \
+        files["load.p_mw"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
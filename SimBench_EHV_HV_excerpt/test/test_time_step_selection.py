@@ -0,0 +1,53 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import TimeSteps, run_custom_timeseries
+
+
+def test_time_steps():
+    df = pd.DataFrame(np.arange(20.).reshape(10, 2), index=range(100, 110))
+
+    # contiguous selections are views
+    for selection in [True, range(102, 106), slice(None, None, 4), TimeSteps.every(3, start=98),
+                      [101, 103, 105], np.arange(10) % 2 == 0]:
+        selected = TimeSteps(selection).select(df)
+        assert np.shares_memory(selected.values, df.values)
+    assert list(TimeSteps(range(102, 106)).resolve(df.index)) == [102, 103, 104, 105]
+    assert list(TimeSteps.every(4).resolve(df.index)) == [100, 104, 108]
+    assert list(TimeSteps.every(3, start=98).resolve(df.index)) == [101, 104, 107]
+    assert list(TimeSteps(range(108, 120)).resolve(df.index)) == [108, 109]
+
+    # explicit time steps keep their order, unknown time steps are neglected
+    assert list(TimeSteps([105, 101, 130]).resolve(df.index)) == [105, 101]
+    assert list(TimeSteps(103).resolve(df.index)) == [103]
+    assert not len(TimeSteps(False).resolve(df.index))
+
+    # masks
+    mask = pd.Series(False, index=df.index)
+    mask.loc[[102, 107]] = True
+    assert list(TimeSteps(mask).resolve(df.index)) == [102, 107]
+    assert list(TimeSteps(mask.values).resolve(df.index)) == [102, 107]
+    with pytest.raises(ValueError):
+        TimeSteps(mask.values[:5]).resolve(df.index)
+
+    # not contiguous index
+    index = pd.Index([0, 4, 8, 9, 12])
+    assert list(TimeSteps(slice(4, None, 4)).resolve(index)) == [4, 8, 12]
+    assert list(TimeSteps([9, 0]).resolve(index)) == [9, 0]
+
+
+def test_time_steps_in_profile_functions():
+    net = sbe.SimBench_for_phd(time_steps=TimeSteps.every(48, stop=192))
+    assert list(net.profiles["load.p_mw"].index) == [0, 48, 96, 144]
+    res = run_custom_timeseries(net, TimeSteps(slice(48, None)), "pp", None,
+                                output_vals=[("res_bus", "vm_pu")])
+    assert list(res["res_bus.vm_pu"].index) == [48, 96, 144]
+
+    sbe.toolbox.set_time_step(net, TimeSteps([96]))
+    assert np.allclose(net.load.p_mw.values, net.profiles["load.p_mw"].loc[96].values)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
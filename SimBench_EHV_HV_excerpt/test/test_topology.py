@@ -0,0 +1,32 @@
+import pytest
+import numpy as np
+import pandapower.networks as pn
+import pandapower.topology as top
+
+from SimBench_EHV_HV_excerpt.toolbox import TopologyIndex
+
+
+def test_topology_index():
+    net = pn.example_multivoltage()
+    net.line.loc[net.line.index[3], "in_service"] = False
+    mg = top.create_nxgraph(net)
+    topology = TopologyIndex(net)
+
+    rng = np.random.default_rng(0)
+    for i in range(50):
+        notravbuses = set(rng.choice(net.bus.index, 5).tolist())
+        bus = next(iter(notravbuses)) if i % 5 == 0 else int(rng.choice(net.bus.index))
+        assert topology.component(bus, notravbuses) == set(top.connected_component(
+            mg, bus, notravbuses=notravbuses))
+
+    buses = [net.bus.index[0], net.bus.index[-1]]
+    notravbuses = set(net.bus.index[10:15])
+    expected = set()
+    for bus in buses:
+        expected |= set(top.connected_component(mg, bus, notravbuses=notravbuses))
+    assert topology.connected_buses(buses, notravbuses) == expected
+    assert topology.labels().nunique() == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,73 @@
+import pytest
+import numpy as np
+import pandapower as pp
+
+import SimBench_EHV_HV_excerpt as sbe
+from SimBench_EHV_HV_excerpt.toolbox import ZoneDecomposition
+
+
+def zone_load_p_mw(net, zone):
+    return net.profiles["load.p_mw"].sum(axis=1).values
+
+
+def zone_power_flow(net, zone):
+    pp.runpp(net)
+    return net.res_ext_grid.p_mw.sum()
+
+
+@pytest.fixture(scope="module")
+def net():
+    net = sbe.SimBench_for_phd(time_steps=range(4))
+    pp.runpp(net)
+    return net
+
+
+def test_zone_subnets(net):
+    zd = ZoneDecomposition(net)
+    assert list(zd.zones) == [1, 2, 3, 4]
+    for et in ["bus", "load", "gen", "sgen"]:
+        own = [subnet[et].index[subnet.bus.zone.loc[subnet[et].bus if et != "bus" else
+                                                    subnet.bus.index].values == zone]
+               for zone, subnet in zd.subnets.items()]
+        assert sorted(np.concatenate(own)) == sorted(net[et].index)
+    for zone, subnet in zd.subnets.items():
+        foreign = subnet.bus.index[subnet.bus.zone != zone]
+        assert sorted(subnet.ext_grid.bus) == sorted(foreign)
+        assert set(foreign) <= set(zd.boundary_buses)
+        assert not subnet.load.bus.isin(foreign).any()
+        assert sorted(subnet.profiles["load.p_mw"].columns) == sorted(subnet.load.index)
+
+    # per-zone computations in worker processes
+    sums = zd.run(zone_load_p_mw, n_jobs=2)
+    assert np.allclose(sum(sums.values()), net.profiles["load.p_mw"].sum(axis=1).values)
+    zd.close()
+
+
+def test_distributed_power_flow(net):
+    with ZoneDecomposition(net) as zd:
+        # exact boundary values reproduce the power flow results of the complete net
+        exact = zd.boundary_values(net)
+        ext_grid_p = zd.run(zone_power_flow, boundary_values=exact, n_jobs=2)
+        assert np.allclose(zd.results, exact)
+        # the equivalent grids supply the tie branches which are part of both adjacent subnets
+        tie_losses = sum(net[f"res_{et}"].pl_mw.loc[(net.bus.zone.loc[net[et][fb]].values !=
+                                                     net.bus.zone.loc[net[et][tb]].values)].sum()
+                         for et, fb, tb in [("line", "from_bus", "to_bus"),
+                                            ("trafo", "hv_bus", "lv_bus")])
+        assert np.isclose(sum(ext_grid_p.values()), tie_losses, atol=1e-6)
+        res = zd.distributed_power_flow(exact, max_iter=1)
+        assert np.allclose(res.vm_pu, net.res_bus.vm_pu.loc[res.index])
+
+        # from flat boundary voltages
+        res = zd.distributed_power_flow(np.column_stack([np.ones(len(zd.boundary_buses)), np.zeros(
+            len(zd.boundary_buses))]))
+        assert np.allclose(res.vm_pu, net.res_bus.vm_pu.loc[res.index], atol=1e-5)
+        assert np.allclose(res.va_degree, net.res_bus.va_degree.loc[res.index], atol=1e-3)
+        with pytest.raises(pp.LoadflowNotConverged):
+            zd.distributed_power_flow(np.column_stack([np.ones(len(zd.boundary_buses)),
+                                                       np.zeros(len(zd.boundary_buses))]),
+                                      max_iter=3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
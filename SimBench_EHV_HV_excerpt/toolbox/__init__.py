@@ -1,7 +1,83 @@
-from .controller_functions import *
-from .downcasting import *
-from .json_io import *
-from .set_values_to_net import *
-from .parquet_profiles import *
-from .run_custom_timeseries import *
-from .grid_manipulation import *
+"""Toolbox of SimBench_EHV_HV_excerpt. The public names of the modules are imported lazily at
+first access (PEP 562), so that e.g. a process which only reads profiles does not import
+pandapower.
+"""
+import importlib
+import sys
+
+# the function is bound before any other import of its equally named module could bind the module
+from .profile_statistics import profile_statistics
+
+# public names per module; names of later modules take precedence as with star imports
+_MODULE_ATTRIBUTES = {
+    "profile_statistics": ["profile_statistics", "active_columns", "Profiles"],
+    "controller_functions": ["distr_slack_available", "controller_type_index",
+        "consider_distr_slack", "add_control_strategy"],
+    "downcasting": ["DOWNCAST_TOLERANCES", "downcast_profiles", "downcast_numerics"],
+    "time_step_selection": ["TimeSteps", "profiles_index"],
+    "representative_periods": ["REPRESENTATIVE_KEYS", "RepresentativePeriods",
+        "representative_periods", "period_features", "k_medoids", "approximation_error"],
+    "element_groups": ["ELEMENT_GROUPS", "element_groups", "regular_elements"],
+    "critical_time_steps": ["CRITICAL_METRICS", "CriticalTimeStepIndex",
+        "critical_time_step_index", "zone_metrics"],
+    "json_io": ["write_ts_results_to_json", "read_ts_results_from_json", "loc_None"],
+    "set_values_to_net": ["set_time_step", "set_sgen_limits", "get_et_col", "VDE_Q_minmax"],
+    "parquet_profiles": ["check_file_existence", "add_profiles_from_parquet_to_net",
+        "store_profiles_to_parquet_files", "write_profile_parquet", "read_profile_parquet",
+        "iter_profile_parquet", "reduce_profiles_by_time_steps", "CRITICAL_TIME_STEPS_FILE"],
+    "artifact_cache": ["Artifact", "ArtifactCache", "stage_key", "fingerprint", "write_atomic",
+        "replace_folder"],
+    "merge_generation": ["SUM_COLUMNS", "MergePlan", "merge_plan", "merge_same_bus_gens"],
+    "simbench_profiles": ["SIMBENCH_CODE", "SIMBENCH_PROFILE_KEYS", "simbench_profiles_cache",
+        "SimBenchProfiles", "simbench_profile_files", "boundary_flow_profiles",
+        "simbench_grid"],
+    "export": ["export_net"],
+    "topology": ["TopologyIndex"],
+    "reducers": ["Reducer", "Max", "Min", "Sum", "Mean", "Exceedance", "Quantile", "get_reducer",
+        "split_output_vals", "reduce_results"],
+    "output_writer": ["CustomOutputWriter", "result_dtype"],
+    "run_custom_timeseries": ["run_custom_timeseries", "default_outputs_from_kernel",
+        "default_outputs", "bra2w_cols"],
+    "chunked_timeseries": ["run_chunked_timeseries", "read_chunked_results"],
+    "sensitivities": ["LineFlowSensitivities", "VoltageSensitivities", "GridSensitivities",
+        "grid_sensitivities", "screen_time_steps", "bus_injections", "linearized_line_flows",
+        "compare_to_ac"],
+    "contingencies": ["CONTINGENCY_ELEMENTS", "contingency_list", "LODFScreening",
+        "run_contingency_analysis"],
+    "opf_timeseries": ["OPF_LIMIT_COLUMNS", "DEFAULT_OPF_OUTPUTS", "run_opf_timeseries",
+        "set_opf_time_step"],
+    "zone_decomposition": ["ZoneDecomposition"],
+    "grid_manipulation": ["paco_imported", "set_bus_zones", "reduce_ehv", "boundary_lines",
+        "boundary_line_flows", "pre_manipulation_simbench_data",
+        "repl_ext_grid_by_gen_slack_weight_consideration"],
+}
+_ATTRIBUTE_MODULES = {name: module for module, names in _MODULE_ATTRIBUTES.items() for name in
+                      names}
+__all__ = list(_ATTRIBUTE_MODULES.keys())
+
+
+def _bind_imported_modules():
+    """Binds the public names of all imported modules. Importing a module binds it to the
+    package which must not hide equally named functions, e.g. run_custom_timeseries()."""
+    for module_name, names in _MODULE_ATTRIBUTES.items():
+        module = sys.modules.get(f"{__name__}.{module_name}")
+        for name in names if module is not None else []:
+            if _ATTRIBUTE_MODULES[name] == module_name and hasattr(module, name):
+                globals()[name] = getattr(module, name)
+
+
+def __getattr__(name:str):
+    if name in _ATTRIBUTE_MODULES.keys():
+        importlib.import_module(f".{_ATTRIBUTE_MODULES[name]}", __name__)
+    elif name in _MODULE_ATTRIBUTES.keys():
+        module = importlib.import_module(f".{name}", __name__)
+        _bind_imported_modules()
+        return module
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    _bind_imported_modules()
+    return globals()[name]
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals().keys()) | set(__all__))
@@ -0,0 +1,233 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from time import perf_counter
+import typing
+import numpy as np
+import pandas as pd
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Artifact(typing.NamedTuple):
+    """Output of a stage together with the fingerprint of its content."""
+    value: typing.Any
+    fingerprint: str
+
+
+class ArtifactCache:
+    """Local cache of stage outputs of a build pipeline. Each stage output is stored with a key
+    which is the hash of the fingerprints of its input artifacts, of its parameters and of the
+    source code of the stage functions. Thus, a rebuild only reruns the stages whose inputs,
+    parameters or code changed. The fingerprint of a stage output is a hash of its content, so
+    that stages downstream of a rerun stage are still loaded from the cache if the output of the
+    rerun stage did not change.
+
+    Parameters
+    ----------
+    folder : str | None
+        folder of the cache. If None, nothing is cached and all stages are run.
+
+    Example
+    -------
+    >>> cache = ArtifactCache(os.path.join(home, ".SimBench_EHV_HV_excerpt_cache"))
+    >>> net = cache.run("simbench_net", sb.get_simbench_net, params={"sb_code_str": code})
+    >>> zones = cache.run("zones", set_bus_zones, net, code=[set_bus_zones])
+    >>> zones.value
+    """
+
+    def __init__(self, folder:str|None):
+        self.folder = folder
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+
+    def run(self, stage:str, fct:typing.Callable, *inputs:Artifact,
+            params:dict|None = None, code:list[typing.Callable]|None = None,
+            salt:str = "", store:bool = True, unkeyed_params:dict|None = None) -> Artifact:
+        """Returns the output of the stage from the cache or, if not available, runs fct(
+        *input values, **params) and stores its output.
+
+        Parameters
+        ----------
+        stage : str
+            name of the stage
+        fct : typing.Callable
+            function of the stage
+        inputs : Artifact
+            outputs of upstream stages which are passed to fct
+        params : dict | None, optional
+            keyword arguments of fct, by default None
+        code : list[typing.Callable] | None, optional
+            functions whose source code is part of the key in addition to fct, e.g. functions
+            which are called by fct, by default None
+        salt : str, optional
+            additional part of the key, e.g. versions of dependencies, by default ""
+        store : bool, optional
+            If False, the output is not stored, e.g. for stages which run faster than loading
+            their output. Then the fingerprint of the output is the key of the stage,
+            by default True
+        unkeyed_params : dict | None, optional
+            keyword arguments of fct which do not influence its output and thus are not part of
+            the key, e.g. the number of processes, by default None
+
+        Returns
+        -------
+        Artifact
+            output of the stage and its fingerprint
+        """
+        params = dict() if params is None else params
+        unkeyed_params = dict() if unkeyed_params is None else unkeyed_params
+        if self.folder is None:
+            return Artifact(fct(*[inp.value for inp in inputs], **params, **unkeyed_params), "")
+        key = stage_key(stage, [inp.fingerprint for inp in inputs], params, [fct] + (
+            list() if code is None else code), salt)
+
+        file = self._file(stage, key)
+        if store and os.path.exists(file + ".pkl") and os.path.exists(file + ".json"):
+            with open(file + ".json") as f:
+                meta = json.load(f)
+            with open(file + ".pkl", "rb") as f:
+                value = pickle.load(f)
+            logger.info(f"Stage '{stage}' is loaded from the cache ({key[:12]}).")
+            return Artifact(value, meta["fingerprint"])
+
+        t0 = perf_counter()
+        value = fct(*[inp.value for inp in inputs], **params, **unkeyed_params)
+        logger.info(f"Stage '{stage}' was run in {perf_counter()-t0:.1f} s ({key[:12]}).")
+        if not store:
+            return Artifact(value, key)
+        artifact = Artifact(value, fingerprint(value))
+        write_atomic(file + ".pkl", lambda f: pickle.dump(value, f, pickle.HIGHEST_PROTOCOL),
+                     "wb")
+        write_atomic(file + ".json", lambda f: json.dump({
+            "stage": stage, "key": key, "fingerprint": artifact.fingerprint,
+            "inputs": [inp.fingerprint for inp in inputs],
+            "params": {k: _short_repr(v) for k, v in params.items()}}, f, indent=2), "w")
+        return artifact
+
+    def clear(self, stage:str|None = None) -> None:
+        """Removes the cached outputs of the given stage or, if None, of all stages."""
+        if self.folder is None:
+            return
+        for file in os.listdir(self.folder):
+            if stage is None or file.rsplit("-", 1)[0] == stage:
+                os.remove(os.path.join(self.folder, file))
+
+    def _file(self, stage:str, key:str) -> str:
+        return os.path.join(self.folder, f"{stage}-{key[:16]}")
+
+
+def stage_key(stage:str, input_fingerprints:list[str], params:dict,
+              code:list[typing.Callable], salt:str = "") -> str:
+    """Returns the cache key of a stage."""
+    h = hashlib.sha256((stage + salt).encode())
+    for fp in input_fingerprints:
+        h.update(fp.encode())
+    h.update(fingerprint(params).encode())
+    for fct in code:
+        try:
+            h.update(inspect.getsource(fct).encode())
+        except (OSError, TypeError):
+            h.update(getattr(fct, "__qualname__", repr(fct)).encode())
+    return h.hexdigest()
+
+
+def fingerprint(obj:typing.Any) -> str:
+    """Returns a hash of the content of obj. DataFrames (including the tables of pandapower nets),
+    Series and numpy arrays are hashed by their values, index, columns and dtypes. dicts (such as
+    pandapower nets and profiles) and sequences are hashed recursively. Keys of dicts starting
+    with "_", such as the internal power flow data of pandapower nets, are neglected.
+    """
+    h = hashlib.sha256()
+    _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _update_hash(h, obj) -> None:
+    h.update(type(obj).__name__.encode())
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(repr(list(obj.dtypes.astype(str))).encode())
+        _update_hash(h, obj.index)
+        for col in range(obj.shape[1]):
+            _update_hash(h, obj.iloc[:, col].values)
+    elif isinstance(obj, pd.Series):
+        _update_hash(h, obj.index)
+        _update_hash(h, obj.values)
+    elif isinstance(obj, pd.Index):
+        _update_hash(h, obj.values)
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        h.update(str(obj.dtype).encode())
+        h.update(repr(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (np.ndarray, pd.api.extensions.ExtensionArray)):
+        if pd.api.types.infer_dtype(obj, skipna=False) in ["floating", "integer",
+                                                             "mixed-integer-float"]:
+            _update_hash(h, np.asarray(obj, dtype=float))
+        else:
+            # object and extension arrays, e.g. of strings, are hashed vectorized via their str
+            _update_hash(h, pd.util.hash_array(np.asarray(obj, dtype=object), categorize=False))
+    elif isinstance(obj, dict):
+        for key in sorted(obj.keys(), key=repr):
+            if isinstance(key, str) and key.startswith("_"):
+                continue
+            h.update(repr(key).encode())
+            _update_hash(h, obj[key])
+    elif isinstance(obj, range):
+        h.update(repr(obj).encode())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = sorted(obj, key=repr) if isinstance(obj, (set, frozenset)) else obj
+        for item in items:
+            _update_hash(h, item)
+    elif obj is None or isinstance(obj, (str, bytes, bool, int, float, complex, np.generic)):
+        h.update(repr(obj).encode())
+    else:
+        try:
+            h.update(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            h.update(repr(obj).encode())
+
+
+def _short_repr(value, max_len:int=200) -> str:
+    text = repr(value)
+    return text if len(text) <= max_len else text[:max_len] + "..."
+
+
+def write_atomic(file:str, write:typing.Callable, mode:str) -> None:
+    """Writes a file via write(file object) to a temporary file which then replaces the file, so
+    that the file is either completely written or unchanged, even if the process is interrupted.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(file), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp, file)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def replace_folder(src:str, dst:str) -> None:
+    """Moves the folder src to dst. An existing dst is moved aside before and removed afterwards,
+    so that dst is never a partially written folder. src and dst should be on the same file
+    system, e.g. in the same parent folder.
+    """
+    trash = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(dst)), prefix=".replaced_")
+    try:
+        if os.path.isdir(dst):
+            os.replace(dst, os.path.join(trash, "old"))
+        elif os.path.exists(dst):
+            os.remove(dst)
+        os.replace(src, dst)
+    finally:
+        shutil.rmtree(trash, ignore_errors=True)
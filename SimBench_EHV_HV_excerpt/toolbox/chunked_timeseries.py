@@ -0,0 +1,163 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt.toolbox.run_custom_timeseries import run_custom_timeseries
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import fingerprint, write_atomic
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+_net = None  # net shared by all chunks of a worker process
+
+
+def run_chunked_timeseries(
+        net:pp.pandapowerNet,
+        time_steps:list[int],
+        folder:str,
+        chunk_size:int = 96*7,
+        n_jobs:int = 1,
+        kernel:str = "pp",
+        **kwargs
+    ) -> dict[str, pd.DataFrame]:
+    """Runs a time series in chunks of time steps via run_custom_timeseries(). The results of
+    each chunk are written to parquet files (one folder per result key) before the next chunk is
+    run, so that the memory is bounded by the results of one chunk. Chunks which are already
+    available in the folder are not run again, i.e. an interrupted run can be resumed by calling
+    the function again with the same arguments.
+
+    Note
+    ----
+    The state of the net after a chunk, e.g. tap positions or attributes of controllers such as
+    DistributedSlack or DERController, is only carried over to the next chunk if the chunks run
+    one after another in the same process (n_jobs=1), since all of them use the same net. Chunks
+    run in parallel processes and chunks which are run again to resume a run start with the state
+    of the given net. Thus, their results of controlled time series can differ from the results
+    of one run over all time steps.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles. The net is not copied but used by all chunks (or, if n_jobs > 1, once
+        per worker process)
+    time_steps : list[int]
+        time steps to run
+    folder : str
+        folder to write the chunk results to
+    chunk_size : int, optional
+        number of time steps per chunk, by default 96*7 (one week)
+    n_jobs : int, optional
+        number of parallel processes to run chunks, by default 1
+    kernel : str, optional
+        kernel of run_custom_timeseries(), by default "pp"
+
+    Other Parameters
+    ----------------
+    kwargs
+        further key word arguments of run_custom_timeseries(), e.g. output_vals, and thus of
+        pandapower's runpp()
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        time series results of all time steps, cf. read_chunked_results()
+    """
+    time_steps = list(time_steps)
+    _check_run_folder(folder, time_steps, chunk_size, kernel, kwargs)
+    chunks = [time_steps[i:i+chunk_size] for i in range(0, len(time_steps), chunk_size)]
+    missing = [chunk for chunk in chunks if not os.path.exists(_chunk_marker(folder, chunk))]
+    logger.info(f"{len(chunks)-len(missing)} of {len(chunks)} chunks are available in {folder}. "
+                f"{len(missing)} chunks are run.")
+
+    if n_jobs == 1 or len(missing) <= 1:
+        for chunk in missing:
+            _run_chunk(net, chunk, folder, kernel, kwargs)
+    else:
+        if "controller" in net.keys() and len(net.controller):
+            logger.warning("The chunks of the parallel processes start with the controller state "
+                           "of the given net, not with the state after the preceding chunk.")
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(net,)) as executor:
+            list(executor.map(_run_chunk_in_worker, missing, [folder]*len(missing),
+                              [kernel]*len(missing), [kwargs]*len(missing)))
+    return read_chunked_results(folder)
+
+
+def read_chunked_results(folder:str, keys:list[str]|None=None) -> dict[str, pd.DataFrame]:
+    """Reads the results written by run_chunked_timeseries().
+
+    Parameters
+    ----------
+    folder : str
+        folder of the chunk results
+    keys : list[str] | None, optional
+        result keys to read, e.g. ["res_gen.p_mw"]. If None, all results are read,
+        by default None
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        time series results (time steps x elements) sorted by the time steps
+    """
+    keys = [key for key in sorted(os.listdir(folder)) if os.path.isdir(os.path.join(
+        folder, key))] if keys is None else keys
+    res = dict()
+    for key in keys:
+        key_folder = os.path.join(folder, key)
+        res[key] = pd.concat([pd.read_parquet(os.path.join(key_folder, file)) for file in sorted(
+            os.listdir(key_folder)) if file.endswith(".parquet")]).sort_index()
+    return res
+
+
+def _check_run_folder(folder:str, time_steps:list[int], chunk_size:int, kernel:str,
+                      kwargs:dict) -> None:
+    """Ensures that the chunks in the folder stem from a run with the same arguments."""
+    os.makedirs(folder, exist_ok=True)
+    meta = {"time_steps": fingerprint(time_steps), "chunk_size": chunk_size, "kernel": kernel,
+            "kwargs": fingerprint(kwargs)}
+    meta_file = os.path.join(folder, "run.json")
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            if json.load(f) != meta:
+                raise ValueError(f"The folder {folder} includes results of a time series with "
+                                 "other arguments. Please remove it or use another folder.")
+    else:
+        write_atomic(meta_file, lambda f: json.dump(meta, f, indent=2), "w")
+
+
+def _chunk_name(chunk:list[int]) -> str:
+    return f"{chunk[0]:06d}_{chunk[-1]:06d}"
+
+
+def _chunk_marker(folder:str, chunk:list[int]) -> str:
+    return os.path.join(folder, f"{_chunk_name(chunk)}.done")
+
+
+def _run_chunk(net:pp.pandapowerNet, chunk:list[int], folder:str, kernel:str,
+               kwargs:dict) -> None:
+    res = run_custom_timeseries(net, chunk, kernel, None, **kwargs)
+    for key, df in res.items():
+        if not isinstance(df, pd.DataFrame):
+            continue
+        key_folder = os.path.join(folder, key)
+        os.makedirs(key_folder, exist_ok=True)
+        write_atomic(os.path.join(key_folder, f"{_chunk_name(chunk)}.parquet"),
+                     lambda f: df.to_parquet(f), "wb")
+    # the marker is written at last so that incomplete chunks are run again
+    write_atomic(_chunk_marker(folder, chunk), lambda f: f.write(str(len(chunk))), "w")
+    logger.info(f"Time steps {chunk[0]} to {chunk[-1]} are written to {folder}.")
+
+
+def _init_worker(net:pp.pandapowerNet|None) -> None:
+    global _net
+    _net = net
+
+
+def _run_chunk_in_worker(chunk:list[int], folder:str, kernel:str, kwargs:dict) -> None:
+    _run_chunk(_net, chunk, folder, kernel, kwargs)
@@ -0,0 +1,289 @@
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from pandapower.pypower.makeLODF import makeLODF
+from pandapower.pypower.makePTDF import makePTDF
+from scipy.sparse import coo_matrix
+
+from SimBench_EHV_HV_excerpt.toolbox.sensitivities import bus_injections
+from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import set_time_step
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# branch tables which can fail, with their bus column defining the zone of the contingency
+CONTINGENCY_ELEMENTS = {"line": "from_bus", "trafo": "hv_bus"}
+_net = None  # net shared by all contingency runs of a worker process
+
+
+def contingency_list(net:pp.pandapowerNet, ets:list[str]|None=None,
+                     zones:list|None=None) -> pd.DataFrame:
+    """Returns the N-1 contingencies, i.e. the in service branches, with their zone (the zone of
+    their from or high voltage bus).
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with zones in net.bus.zone, e.g. from SimBench_for_phd()
+    ets : list[str] | None, optional
+        element types of CONTINGENCY_ELEMENTS, by default all
+    zones : list | None, optional
+        zones to consider, by default all
+
+    Returns
+    -------
+    pd.DataFrame
+        contingencies with the columns "et", "element", "zone" and "name"
+    """
+    ets = list(CONTINGENCY_ELEMENTS.keys()) if ets is None else ets
+    contingencies = list()
+    for et in ets:
+        elms = net[et].loc[net[et].in_service.astype(bool)]
+        contingencies.append(pd.DataFrame({
+            "et": et, "element": elms.index,
+            "zone": net.bus.zone.loc[elms[CONTINGENCY_ELEMENTS[et]]].values,
+            "name": elms.name.values}))
+    contingencies = pd.concat(contingencies, ignore_index=True)
+    if zones is not None:
+        contingencies = contingencies.loc[contingencies.zone.isin(zones)].reset_index(drop=True)
+    return contingencies
+
+
+class LODFScreening:
+    """DC model of the net's branch flows (PTDF) and of the flow changes by branch outages (LODF)
+    to estimate the post-contingency loadings of all branches for many time steps at once. The
+    loadings are estimated by the active power flows relative to the branch ratings in MVA, so
+    that the screening needs a margin to cover reactive power flows and voltage deviations.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net whose topology is modelled
+
+    Example
+    -------
+    >>> screening = LODFScreening(net)
+    >>> loading = screening.post_contingency_loading(p_mw, contingencies)  # time steps x cont.
+    """
+
+    def __init__(self, net:pp.pandapowerNet):
+        net = deepcopy(net)
+        pp.rundcpp(net)
+        ppci = net._ppc["internal"]
+        if len(ppci["bus"]) != len(net._ppc["bus"]) or len(ppci["branch"]) != len(
+                net._ppc["branch"]):
+            raise NotImplementedError("LODFScreening does not consider out of service buses or "
+                                      "branches.")
+        self.base_mva = ppci["baseMVA"]
+        self.ptdf = makePTDF(self.base_mva, ppci["bus"], ppci["branch"], int(ppci["ref"][0]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.lodf = makeLODF(ppci["branch"], self.ptdf)
+
+        # branches in order of the ppc
+        lookups = net._pd2ppc_lookups["branch"]
+        self.branches = pd.MultiIndex.from_tuples([
+            (et, elm) for et in CONTINGENCY_ELEMENTS.keys() if et in lookups.keys() for elm in
+            net[et].index], names=["et", "element"])
+        ratings = list()
+        for et in CONTINGENCY_ELEMENTS.keys():
+            if et not in lookups.keys():
+                continue
+            if et == "line":
+                vn_kv = net.bus.vn_kv.loc[net.line.from_bus].values
+                ratings.append(np.sqrt(3) * vn_kv * (
+                    net.line.max_i_ka * net.line.df * net.line.parallel).values)
+            else:
+                ratings.append((net.trafo.sn_mva * net.trafo.parallel * net.trafo.get(
+                    "df", pd.Series(1., index=net.trafo.index))).values)
+        self.ratings_mva = np.concatenate(ratings)
+        self._bus_incidence = coo_matrix((np.ones(net.bus.shape[0]), (
+            np.arange(net.bus.shape[0]), net._pd2ppc_lookups["bus"][net.bus.index.values])),
+            shape=(net.bus.shape[0], len(ppci["bus"]))).tocsr()
+
+        # outages which split the grid cannot be described by LODFs
+        lodf = self.lodf.copy()
+        np.fill_diagonal(lodf, 0.)
+        self.islanding = pd.Series(~np.isfinite(lodf).all(axis=0), index=self.branches)
+
+    def positions(self, contingencies:pd.DataFrame) -> np.ndarray:
+        """Returns the positions of the contingencies (with columns "et" and "element") in the
+        branches."""
+        return self.branches.get_indexer(pd.MultiIndex.from_arrays([
+            contingencies.et.values, contingencies.element.values]))
+
+    def flows(self, p_mw:np.ndarray) -> np.ndarray:
+        """Returns the DC branch flows in MW (time steps x branches) for the active power
+        injections (time steps x buses of net.bus)."""
+        return (p_mw @ self._bus_incidence) @ self.ptdf.T
+
+    def post_contingency_loading(self, p_mw:np.ndarray, contingencies:pd.DataFrame,
+                                 chunk_size:int=24) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the estimated maximum branch loading in percent and the position of the most
+        loaded branch (time steps x contingencies) after each contingency."""
+        flows = self.flows(p_mw)
+        positions = self.positions(contingencies)
+        lodf = np.nan_to_num(self.lodf[:, positions].T, nan=0., posinf=0., neginf=0.)
+        max_loading = np.zeros((flows.shape[0], len(positions)))
+        critical = np.zeros((flows.shape[0], len(positions)), dtype=np.int64)
+        for start in range(0, flows.shape[0], chunk_size):
+            f = flows[start:start+chunk_size]
+            post = f[:, None, :] + f[:, positions, None] * lodf[None, :, :]
+            post[:, np.arange(len(positions)), positions] = 0.  # the failed branch
+            loading = np.abs(post) / self.ratings_mva * 100
+            critical[start:start+chunk_size] = loading.argmax(axis=2)
+            max_loading[start:start+chunk_size] = np.take_along_axis(
+                loading, critical[start:start+chunk_size, :, None], axis=2)[:, :, 0]
+        return max_loading, critical
+
+
+def run_contingency_analysis(
+        net:pp.pandapowerNet,
+        contingencies:pd.DataFrame|None=None,
+        time_steps:list[int]|TimeSteps|None=None,
+        max_loading_percent:float=100.,
+        vm_limits:tuple[float, float]=(0.9, 1.1),
+        screening_margin:float=20.,
+        n_jobs:int=1,
+        profiles:dict[str, pd.DataFrame]|None=None,
+        **kwargs
+    ) -> dict[str, pd.DataFrame]:
+    """N-1 contingency analysis over time steps. All contingency/time step pairs are screened
+    by LODFScreening, and exact AC power flows are run only for the pairs whose estimated
+    loading exceeds max_loading_percent - screening_margin. The AC power flows are distributed
+    to n_jobs processes, grouped by time steps.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles and zones, e.g. from SimBench_for_phd()
+    contingencies : pd.DataFrame | None, optional
+        contingencies, cf. contingency_list(). If None, all lines and trafos fail,
+        by default None
+    time_steps : list[int] | TimeSteps | None, optional
+        time steps to analyse, by default all time steps of the profiles
+    max_loading_percent : float, optional
+        maximum loading of lines and trafos, by default 100.
+    vm_limits : tuple[float, float], optional
+        minimum and maximum bus voltages, by default (0.9, 1.1)
+    screening_margin : float, optional
+        margin of the screening in percent points, which covers the error of the DC estimation,
+        by default 20.
+    n_jobs : int, optional
+        number of processes for the AC power flows, by default 1
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles, by default net.profiles
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments of pp.runpp()
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        "screening": estimated maximum loading per time step (rows) and contingency (columns);
+        "ac": AC results of the flagged pairs;
+        "summary": per zone of the contingencies, the numbers of contingencies, islanding
+        contingencies (not analysed), pairs, flagged pairs, AC violations and non-converged
+        power flows as well as the worst loading with its contingency and time step
+    """
+    profiles = net.profiles if profiles is None else profiles
+    contingencies = contingency_list(net) if contingencies is None else \
+        contingencies.reset_index(drop=True)
+    time_steps = TimeSteps(True if time_steps is None else time_steps).resolve(profiles)
+
+    # --- screening
+    screening = LODFScreening(net)
+    islanding = screening.islanding.loc[pd.MultiIndex.from_arrays([
+        contingencies.et.values, contingencies.element.values])].values
+    if islanding.any():
+        logger.info(f"{islanding.sum()} contingencies split the grid and are not analysed.")
+    analysed = contingencies.loc[~islanding]
+    p_mw = bus_injections(net, profiles, list(time_steps))[0]
+    est, _ = screening.post_contingency_loading(p_mw, analysed)
+    cont_names = [f"{et} {elm}" for et, elm in zip(analysed.et, analysed.element)]
+    estimated = pd.DataFrame(est, index=time_steps, columns=cont_names)
+    flagged = np.argwhere(est > max_loading_percent - screening_margin)
+    logger.info(f"{len(flagged)} of {est.size} contingency/time step pairs are flagged for AC "
+                "power flows.")
+
+    # --- AC power flows of the flagged pairs, grouped by time steps
+    tasks = list()
+    for t_pos in np.unique(flagged[:, 0]):
+        time_step = time_steps[t_pos]
+        conts = analysed.iloc[flagged[flagged[:, 0] == t_pos, 1]]
+        values = {key: df.loc[[time_step]] for key, df in profiles.items()}
+        tasks.append((time_step, values, list(zip(conts.et, conts.element)), kwargs))
+    worker_net = deepcopy({key: value for key, value in net.items() if key != "profiles"})
+    if n_jobs == 1 or len(tasks) <= 1:
+        _init_worker(pp.pandapowerNet(worker_net))
+        outputs = [_run_contingencies(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(pp.pandapowerNet(worker_net),)) as executor:
+            outputs = list(executor.map(_run_contingencies, *zip(*tasks)))
+    _init_worker(None)
+
+    ac = pd.DataFrame([row for rows in outputs for row in rows], columns=[
+        "time_step", "et", "element", "converged", "max_loading_percent", "critical_et",
+        "critical_element", "min_vm_pu", "max_vm_pu"])
+    ac = ac.merge(contingencies[["et", "element", "zone"]], on=["et", "element"], how="left")
+    ac["violation"] = ~ac.converged.astype(bool) | (
+        ac.max_loading_percent > max_loading_percent) | (ac.min_vm_pu < vm_limits[0]) | (
+        ac.max_vm_pu > vm_limits[1])
+
+    summary = _summary(contingencies, islanding, len(time_steps), flagged, analysed, ac)
+    return {"screening": estimated, "ac": ac, "summary": summary}
+
+
+def _summary(contingencies:pd.DataFrame, islanding:np.ndarray, n_time_steps:int,
+             flagged:np.ndarray, analysed:pd.DataFrame, ac:pd.DataFrame) -> pd.DataFrame:
+    flagged_zones = analysed.zone.values[flagged[:, 1]] if len(flagged) else np.array([])
+    summary = pd.DataFrame({
+        "n_contingencies": contingencies.groupby("zone").size(),
+        "n_islanding": pd.Series(islanding, index=contingencies.index).groupby(
+            contingencies.zone).sum(),
+        "n_pairs": analysed.groupby("zone").size() * n_time_steps,
+        "n_flagged": pd.Series(flagged_zones).value_counts(),
+        "n_violations": ac.groupby("zone").violation.sum(),
+        "n_not_converged": (~ac.converged.astype(bool)).groupby(ac.zone).sum(),
+    }).fillna(0).astype(np.int64)
+    summary.index.name = "zone"
+    worst = ac.loc[ac.max_loading_percent.notnull()].sort_values(
+        "max_loading_percent", ascending=False).drop_duplicates("zone").set_index("zone")
+    summary["max_loading_percent"] = worst.max_loading_percent
+    summary["worst_contingency"] = worst.et + " " + worst.element.astype(str)
+    summary["worst_time_step"] = worst.time_step
+    return summary
+
+
+def _init_worker(net:pp.pandapowerNet|None) -> None:
+    global _net
+    _net = net
+
+
+def _run_contingencies(time_step:int, values:dict[str, pd.DataFrame],
+                       contingencies:list[tuple[str, int]], runpp_kwargs:dict) -> list[list]:
+    set_time_step(_net, time_step, values)
+    rows = list()
+    for et, element in contingencies:
+        _net[et].at[element, "in_service"] = False
+        try:
+            pp.runpp(_net, **runpp_kwargs)
+            loading = pd.concat([_net[f"res_{branch}"].loading_percent for branch in
+                                 CONTINGENCY_ELEMENTS.keys()], keys=CONTINGENCY_ELEMENTS.keys())
+            critical = loading.idxmax()
+            rows.append([time_step, et, element, True, loading.max(), critical[0], critical[1],
+                         _net.res_bus.vm_pu.min(), _net.res_bus.vm_pu.max()])
+        except pp.LoadflowNotConverged:
+            rows.append([time_step, et, element, False, np.nan, None, None, np.nan, np.nan])
+        finally:
+            _net[et].at[element, "in_service"] = True
+    return rows
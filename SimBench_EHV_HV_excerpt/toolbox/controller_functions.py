@@ -1,24 +1,51 @@
+from functools import cache
 import numpy as np
 import pandas as pd
 import pandapower as pp
 from pandapower.control import DiscreteTapControl
 
-try:
-    from pandapower.control.controller.DERController import DERController, QModelQVCurve, \
-        PQVArea4120V2, CosphiPCurve
-    controllers_imported = True
-except ImportError:
+from SimBench_EHV_HV_excerpt.toolbox.profile_statistics import Profiles, active_columns
+
+
+@cache
+def _der_controllers() -> tuple|None:
+    """Returns the classes DERController, QModelQVCurve, PQVArea4120V2 and CosphiPCurve of
+    pandapower or pandaplan-core or None if not available. The import is deferred to the first
+    use since the optional controller backends are not needed by most processes."""
+    try:
+        from pandapower.control.controller.DERController import DERController, QModelQVCurve, \
+            PQVArea4120V2, CosphiPCurve
+    except ImportError:
+        try:
+            from pandaplan.core.control import DERController, PQVArea4120V2, CosphiPCurve
+            from pandaplan.core.control import QModelQV as QModelQVCurve
+        except ImportError:
+            return None
+    return DERController, QModelQVCurve, PQVArea4120V2, CosphiPCurve
+
+
+@cache
+def _distributed_slack() -> type|None:
     try:
-        from pandaplan.core.control import DERController, PQVArea4120V2, CosphiPCurve
-        from pandaplan.core.control import QModelQV as QModelQVCurve
-        controllers_imported = True
+        from pandaplan.core.control import DistributedSlack
     except ImportError:
-        controllers_imported = False
-try:
-    from pandaplan.core.control import DistributedSlack
-    distrSl_imported = True
-except:
-    distrSl_imported = False
+        return None
+    return DistributedSlack
+
+
+def distr_slack_available() -> bool:
+    """Returns whether the DistributedSlack controller of pandaplan-core is available."""
+    return _distributed_slack() is not None
+
+
+def __getattr__(name:str):
+    """Provides the deferred controller classes as module attributes, e.g. DERController."""
+    controllers = ["DERController", "QModelQVCurve", "PQVArea4120V2", "CosphiPCurve"]
+    if name in controllers and _der_controllers() is not None:
+        return _der_controllers()[controllers.index(name)]
+    elif name == "DistributedSlack" and distr_slack_available():
+        return _distributed_slack()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def controller_type_index(net, controller_type):
@@ -28,9 +55,10 @@ def controller_type_index(net, controller_type):
 
 def consider_distr_slack(net, **kwargs):
     """ kwargs for DistributedSlack controller """
-    if not distrSl_imported:
+    if not distr_slack_available():
         raise ModuleNotFoundError(
             "consider_distr_slack() uses not open-source control functionality pandaplan-core.")
+    DistributedSlack = _distributed_slack()
     if "controller" in net.keys() and isinstance(net.controller, pd.DataFrame):
         ds_idx = controller_type_index(net, DistributedSlack)
     else:
@@ -47,12 +75,17 @@ def add_control_strategy(net:pp.pandapowerNet, control:str|None) -> dict[str,pd.
     if control in ["NoControl", None]:
         return
 
-    if not controllers_imported:
+    if _der_controllers() is None:
         raise ImportError("Controllers are needed to add control strategy to net but have not "
                           "been imported.")
+    DERController, QModelQVCurve, PQVArea4120V2, CosphiPCurve = _der_controllers()
 
     if "profiles" in net:
-        have_p_sgens = net.sgen.index[(net.profiles["sgen.p_mw"].abs() > 1e-4).any()]
+        if isinstance(net.profiles, Profiles):  # statistics computed when loading the profiles
+            p_sgens = net.profiles.active_columns("sgen.p_mw", tol=1e-4)
+        else:
+            p_sgens = active_columns(net.profiles["sgen.p_mw"], tol=1e-4)
+        have_p_sgens = net.sgen.index[net.sgen.index.isin(p_sgens)]
         data_source = pp.timeseries.DFData(net.profiles["sgen.p_mw"][have_p_sgens])
     else:
         have_p_sgens = net.sgen.index
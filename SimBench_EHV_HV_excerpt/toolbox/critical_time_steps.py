@@ -0,0 +1,228 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pandapower as pp
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy.sparse import csr_matrix
+
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import fingerprint, write_atomic
+from SimBench_EHV_HV_excerpt.toolbox.element_groups import ELEMENT_GROUPS, element_groups
+from SimBench_EHV_HV_excerpt.toolbox.parquet_profiles import CRITICAL_TIME_STEPS_FILE
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import profiles_index
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# metrics per zone, all in MW:
+#   load -> consumption of the loads (without equivalent and ExtL_* loads);
+#   generation -> infeed of gens and sgens (without equivalent elements);
+#   residual -> load minus sgen infeed;
+#   boundary -> power flowing out of the zone via the boundary lines (ExtL_* loads);
+#   import -> consumption minus infeed of all elements, i.e. the power imported from other zones
+CRITICAL_METRICS = ["load", "generation", "residual", "boundary", "import"]
+_ELEMENTS_KEY = b"SimBench_EHV_HV_excerpt.critical_time_steps.elements"
+
+
+class CriticalTimeStepIndex:
+    """Index of the time steps ranked per zone and metric, cf. CRITICAL_METRICS, to select stress
+    cases such as the maximum residual load of a zone without scanning the profiles again. The
+    zone sums of all time steps are computed by one sparse matrix multiplication per profile key
+    and the rankings are precomputed, so that queries only slice the rankings.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet | None
+        net with zones in net.bus.zone
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles of the net's elements. If None, net.profiles is used, by default None
+    values : pd.DataFrame | None, optional
+        precomputed metric values (time steps x (metric, zone)), e.g. from from_parquet(). If
+        given, net and profiles are not needed, by default None
+    elements_key : str | None, optional
+        fingerprint of the zones and groups of the elements the values refer to. If None, it is
+        derived from net, by default None
+
+    Example
+    -------
+    >>> index = critical_time_step_index(net)
+    >>> index.top_k(3, "residual", k=5)  # time steps with the highest residual load in zone 3
+    >>> run_custom_timeseries(net, index.critical_time_steps(k=2), "pp", None)
+    """
+
+    def __init__(self, net:pp.pandapowerNet|None, profiles:dict[str, pd.DataFrame]|None=None,
+                 values:pd.DataFrame|None=None, elements_key:str|None=None):
+        if values is None:
+            values = zone_metrics(net, profiles)
+        if elements_key is None and net is not None:
+            elements_key = _elements_key(net)
+        self.values = values
+        self.elements_key = elements_key
+        self.zones = values.columns.get_level_values(1).unique()
+        self._ranking = np.argsort(-values.to_numpy(dtype=np.float64), axis=0,
+                                   kind="stable").astype(np.int32)
+
+    def __repr__(self) -> str:
+        return f"CriticalTimeStepIndex({self.values.shape[0]} time steps, zones " + \
+            f"{list(self.zones)})"
+
+    def metric(self, metric:str) -> pd.DataFrame:
+        """Returns the values of the metric (time steps x zones)."""
+        return self.values[metric]
+
+    def top_k(self, zone, metric:str="residual", k:int=10, largest:bool=True) -> pd.Index:
+        """Returns the k time steps with the largest (or smallest) values of the metric in the
+        zone, sorted from the most critical time step."""
+        ranking = self._ranking[:, self.values.columns.get_loc((metric, zone))]
+        positions = ranking[:k] if largest else ranking[::-1][:k]
+        return self.values.index[positions]
+
+    def critical_time_steps(self, k:int=1, metrics:list[str]|None=None, zones:list|None=None,
+                            largest:bool=True) -> pd.Index:
+        """Returns the sorted union of the top k time steps of all given metrics and zones, e.g.
+        to run time series for the stress cases only."""
+        metrics = CRITICAL_METRICS if metrics is None else metrics
+        zones = self.zones if zones is None else zones
+        cols = [self.values.columns.get_loc((metric, zone)) for metric in metrics for zone in
+                zones]
+        ranking = self._ranking[:, cols]
+        positions = ranking[:k] if largest else ranking[::-1][:k]
+        return self.values.index[np.unique(positions)]
+
+    def extremes(self) -> pd.DataFrame:
+        """Returns the minimum and maximum values and their time steps per metric and zone."""
+        first, last = self._ranking[0], self._ranking[-1]
+        values = self.values.to_numpy()
+        cols = np.arange(values.shape[1])
+        return pd.DataFrame({
+            "max": values[first, cols], "max_time_step": self.values.index[first],
+            "min": values[last, cols], "min_time_step": self.values.index[last]},
+            index=self.values.columns)
+
+    def select(self, time_steps:pd.Index):
+        """Returns the index of the given time steps, e.g. of profiles which include only a part
+        of the stored time steps."""
+        return CriticalTimeStepIndex(None, values=self.values.loc[time_steps],
+                                     elements_key=self.elements_key)
+
+    def to_parquet(self, file:str) -> None:
+        """Stores the metric values and the elements key, e.g. next to the profile folders as
+        CRITICAL_TIME_STEPS_FILE, cf. export_net()."""
+        df = self.values.astype(np.float32)
+        df.columns = [f"{metric}|{zone}" for metric, zone in df.columns]
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        table = table.replace_schema_metadata({**table.schema.metadata, _ELEMENTS_KEY: json.dumps(
+            self.elements_key).encode()})
+        pq.write_table(table, file)
+
+    @classmethod
+    def from_parquet(cls, file:str):
+        """Loads an index stored by to_parquet()."""
+        table = pq.read_table(file)
+        meta = table.schema.metadata or dict()
+        df = table.to_pandas().astype(np.float64)
+        metrics_zones = [col.split("|", 1) for col in df.columns]
+        df.columns = pd.MultiIndex.from_tuples([(metric, _zone(zone)) for metric, zone in
+                                                metrics_zones], names=["metric", "zone"])
+        return cls(None, values=df, elements_key=json.loads(meta[_ELEMENTS_KEY]) if
+                   _ELEMENTS_KEY in meta.keys() else None)
+
+
+def critical_time_step_index(net:pp.pandapowerNet,
+                             profiles:dict[str, pd.DataFrame]|None=None
+                             ) -> CriticalTimeStepIndex:
+    """Returns the CriticalTimeStepIndex of the net's profiles. If the profiles were loaded by
+    add_profiles_from_parquet_to_net() from a folder with a stored index (cf. export_net()), the
+    stored index is used as long as the zones and groups of the elements equal those of the
+    stored index and no profile was replaced since loading, cf. Profiles. Otherwise, the index is
+    computed from the profiles. The index of profiles loaded without a stored index, e.g. the
+    bundled and generated profiles of SimBench_for_phd(), is cached per zones and groups of the
+    elements at its first computation (Profiles.critical_time_steps_cache) and attached to the
+    profiles.
+    """
+    profiles = net.profiles if profiles is None else profiles
+    stored = getattr(profiles, "critical_time_steps", None)
+    elements_key = _elements_key(net)
+    time_steps = profiles_index({key: df for key, df in profiles.items() if key in
+                                 _PROFILE_SIGNS.keys()})
+    if stored is not None and stored.elements_key == elements_key:
+        if stored.values.index.equals(time_steps):
+            return stored
+        elif time_steps.isin(stored.values.index).all():
+            return stored.select(time_steps)
+    cache = getattr(profiles, "critical_time_steps_cache", None)
+    if cache is None:
+        return CriticalTimeStepIndex(net, profiles)
+    file = f"{cache}-{elements_key[:16]}.parquet"
+    index = CriticalTimeStepIndex.from_parquet(file) if os.path.isfile(file) else None
+    if index is None or not index.values.index.equals(time_steps):
+        index = CriticalTimeStepIndex(net, profiles, elements_key=elements_key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        write_atomic(file, index.to_parquet, "wb")
+    profiles.critical_time_steps = index
+    return index
+
+
+# signs of the profiles' contributions to the consumption minus infeed of a zone
+_PROFILE_SIGNS = {"load.p_mw": 1., "gen.p_mw": -1., "sgen.p_mw": -1.}
+
+
+def zone_metrics(net:pp.pandapowerNet,
+                 profiles:dict[str, pd.DataFrame]|None=None) -> pd.DataFrame:
+    """Returns the values of CRITICAL_METRICS (time steps x (metric, zone)) of the profiles."""
+    profiles = net.profiles if profiles is None else profiles
+    index = profiles_index({key: df for key, df in profiles.items() if key in
+                            _PROFILE_SIGNS.keys()})
+    zones = pd.Index(sorted(net.bus.zone.dropna().unique()), name="zone")
+
+    # zone sums per element group, each by one sparse matrix multiplication
+    sums = dict()
+    for key in _PROFILE_SIGNS.keys():
+        et = key.split(".")[0]
+        groups = element_groups(net, et)
+        for group in ELEMENT_GROUPS:
+            sums[(key, group)] = np.zeros((len(index), len(zones)))
+        if key not in profiles.keys() or not profiles[key].shape[1]:
+            continue
+        df = profiles[key]
+        if not df.index.equals(index):
+            raise ValueError(f"The index of profiles[{key!r}] differs from the other profiles.")
+        elm_zones = zones.get_indexer(net.bus.zone.loc[net[et].bus.loc[df.columns]].values)
+        elm_groups = groups.loc[df.columns].values
+        values = df.to_numpy(dtype=np.float64)
+        for group in ELEMENT_GROUPS:
+            selected = (elm_groups == group) & (elm_zones >= 0)
+            matrix = csr_matrix((np.ones(selected.sum()), (np.flatnonzero(selected), elm_zones[
+                selected])), shape=(df.shape[1], len(zones)))
+            sums[(key, group)] = values @ matrix
+
+    metrics = {
+        "load": sums[("load.p_mw", "regular")],
+        "generation": sums[("gen.p_mw", "regular")] + sums[("sgen.p_mw", "regular")],
+        "residual": sums[("load.p_mw", "regular")] - sums[("sgen.p_mw", "regular")],
+        "boundary": sums[("load.p_mw", "ExtL")],
+        "import": sum(sign * sums[(key, group)] for key, sign in _PROFILE_SIGNS.items() for
+                      group in ELEMENT_GROUPS),
+    }
+    return pd.DataFrame(np.concatenate([metrics[metric] for metric in CRITICAL_METRICS],
+                                       axis=1), index=index,
+                        columns=pd.MultiIndex.from_product([CRITICAL_METRICS, zones],
+                                                           names=["metric", "zone"]))
+
+
+def _elements_key(net:pp.pandapowerNet) -> str:
+    """Returns a fingerprint of the zones and groups of the elements the metrics depend on."""
+    return fingerprint([(net.bus.zone.reindex(net[et].bus.values).values, element_groups(
+        net, et)) for et in ["load", "gen", "sgen"]])
+
+
+def _zone(zone:str):
+    try:
+        return int(zone)
+    except ValueError:
+        return zone
@@ -1,28 +1,90 @@
 from copy import deepcopy
+import numpy as np
 import pandas as pd
 
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
 
-def downcast_profiles(profiles:dict[str, pd.DataFrame]|pd.io.pytables.HDFStore, **kwargs) -> None:
-    for key in profiles.keys():
+logger = logging.getLogger(__name__)
+
+# maximum errors (absolute, relative) accepted by downcasting floats. A value x passes if
+# |downcasted(x) - x| <= max_abs_error + max_rel_error * |x|. The keys are profile keys, such as
+# "gen.vm_pu", or their column names, such as "vm_pu". "default" applies to all other keys.
+DOWNCAST_TOLERANCES = {
+    "vm_pu": (1e-6, 0.),
+    "va_degree": (1e-5, 0.),
+    "default": (1e-4, 1e-6),
+}
+
+_REPORT_COLUMNS = ["n_columns", "n_downcasted", "bytes_before", "bytes_after", "bytes_saved",
+                   "max_abs_error", "max_rel_error"]
+
+
+def downcast_profiles(
+        profiles:dict[str, pd.DataFrame]|pd.io.pytables.HDFStore,
+        tolerances:dict[str, tuple[float, float]]|None = None,
+        chunksize:int = 96*28,
+        **kwargs
+    ) -> pd.DataFrame:
+    """Downcasts the numeric profile data to save storage. Float columns are downcasted to float32
+    only if the resulting errors are within the tolerances of their key. Integer columns are
+    downcasted to the smallest integer type which holds their values.
+
+    Parameters
+    ----------
+    profiles : dict[str, pd.DataFrame] | pd.io.pytables.HDFStore
+        profile data. DataFrames of dicts are replaced by their downcasted versions (instead of
+        being copied). Keys of HDFStores are processed in chunks of time steps if they are stored
+        in table format, so that only one chunk is in memory at once.
+    tolerances : dict[str, tuple[float, float]] | None, optional
+        maximum (absolute, relative) errors per key or column name, updating
+        DOWNCAST_TOLERANCES, e.g. {"gen.vm_pu": (1e-7, 0.)}, by default None
+    chunksize : int, optional
+        number of time steps per chunk of HDFStore keys, by default 96*28
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments for the HDFStore's put() or append() function
+
+    Returns
+    -------
+    pd.DataFrame
+        report per key with the columns "n_columns", "n_downcasted", "bytes_before",
+        "bytes_after", "bytes_saved", "max_abs_error" and "max_rel_error"
+    """
+    tolerances = {**DOWNCAST_TOLERANCES, **(dict() if tolerances is None else tolerances)}
+    report = dict()
+    for key in list(profiles.keys()):
+        tol = _tolerance(key, tolerances)
         if isinstance(profiles, dict):
-            downcast_numerics(profiles[key])
+            profiles[key], report[key] = _downcast_frame(profiles[key], tol)
         elif isinstance(profiles, pd.io.pytables.HDFStore):
-            kwargs = deepcopy(kwargs)
-            kwargs["format"] = kwargs.get("format", "table")
-            df = profiles.get(key)
-            downcast_numerics(df)
-            profiles.put(key, df, **kwargs)
+            report[key] = _downcast_hdf_key(profiles, key, tol, chunksize, **kwargs)
         else:
             raise NotImplementedError(f"{type(profiles)=}")
+    report = pd.DataFrame(report, index=_REPORT_COLUMNS).T.astype({
+        col: np.int64 for col in _REPORT_COLUMNS[:5]})
+    if report.shape[0]:
+        logger.info(f"Downcasting saved {report.bytes_saved.sum() / 1e6:.1f} MB with a maximum "
+                    f"absolute error of {report.max_abs_error.max():.3g}.")
+    return report
 
 
-def downcast_numerics(df:pd.DataFrame) -> pd.DataFrame:
+def downcast_numerics(df:pd.DataFrame,
+                      tolerance:tuple[float, float] = DOWNCAST_TOLERANCES["default"]
+                      ) -> pd.DataFrame:
     """This function downcasts given numeric data to save storage.
 
     Parameters
     ----------
     df : pd.DataFrame
         data to downcast
+    tolerance : tuple[float, float], optional
+        maximum (absolute, relative) error of float columns which are downcasted, cf.
+        DOWNCAST_TOLERANCES, by default DOWNCAST_TOLERANCES["default"]
 
     Returns
     -------
@@ -33,8 +95,131 @@ def downcast_numerics(df:pd.DataFrame) -> pd.DataFrame:
     --------
     For converting, for example from object dtype, and downcasting data, use
     simbench.to_numeric_ignored_errors(data). Here, only numerics are downcasted to save storage.
+    To avoid the inplace assignment to df, use downcast_profiles() which replaces the DataFrames.
     """
-    for typ in ["float", "integer"]:
-        cols = df.select_dtypes(typ).columns
-        df[cols] = df[cols].apply(pd.to_numeric, downcast=typ)
+    dtypes = _downcast_dtypes(_column_stats(df, tolerance))
+    for col, dtype in dtypes.items():
+        df[col] = df[col].astype(dtype)
     return df
+
+
+def _tolerance(key:str, tolerances:dict[str, tuple[float, float]]) -> tuple[float, float]:
+    col = key.replace("/", ".").rsplit(".", 1)[-1]
+    for candidate in [key, key.lstrip("/").replace("/", "."), col]:
+        if candidate in tolerances.keys():
+            return tolerances[candidate]
+    return tolerances["default"]
+
+
+def _column_stats(df:pd.DataFrame, tolerance:tuple[float, float]) -> pd.DataFrame:
+    """Returns per numeric column that is not of minimal dtype: its dtype, whether float32 is
+    within the tolerance, the errors of float32 and the value range (for integers)."""
+    stats = list()
+    floats = df.select_dtypes("float").columns
+    floats = floats[(df.dtypes[floats] != np.float32).values]
+    if len(floats):
+        values = df[floats].to_numpy(dtype=np.float64)
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            err = np.abs(values.astype(np.float32).astype(np.float64) - values)
+            rel_err = np.where(values != 0, err / np.abs(values), 0.)
+            ok = ~(err > tolerance[0] + tolerance[1] * np.abs(values)).any(axis=0)
+        stats.append(pd.DataFrame({
+            "dtype": df.dtypes[floats].values, "ok": ok,
+            "max_abs_error": np.nanmax(err, axis=0, initial=0.),
+            "max_rel_error": np.nanmax(rel_err, axis=0, initial=0.),
+            "min": np.nan, "max": np.nan}, index=floats))
+    integers = df.select_dtypes("integer").columns
+    integers = integers[(df.dtypes[integers] != np.int8).values]
+    if len(integers):
+        values = df[integers].to_numpy()
+        stats.append(pd.DataFrame({
+            "dtype": df.dtypes[integers].values, "ok": True, "max_abs_error": 0.,
+            "max_rel_error": 0., "min": values.min(axis=0, initial=0),
+            "max": values.max(axis=0, initial=0)}, index=integers))
+    if not len(stats):
+        return pd.DataFrame(columns=["dtype", "ok", "max_abs_error", "max_rel_error", "min",
+                                     "max"])
+    return pd.concat(stats)
+
+
+def _merge_column_stats(stats:pd.DataFrame|None, chunk_stats:pd.DataFrame) -> pd.DataFrame:
+    if stats is None:
+        return chunk_stats
+    return pd.DataFrame({
+        "dtype": stats["dtype"], "ok": stats["ok"] & chunk_stats["ok"],
+        "max_abs_error": np.maximum(stats.max_abs_error, chunk_stats.max_abs_error),
+        "max_rel_error": np.maximum(stats.max_rel_error, chunk_stats.max_rel_error),
+        "min": np.fmin(stats["min"], chunk_stats["min"]),
+        "max": np.fmax(stats["max"], chunk_stats["max"])})
+
+
+def _downcast_dtypes(stats:pd.DataFrame) -> dict:
+    """Returns the target dtype per column which can be downcasted."""
+    dtypes = dict()
+    for col, row in stats.iterrows():
+        if pd.api.types.is_float_dtype(row["dtype"]):
+            if row["ok"]:
+                dtypes[col] = np.float32
+        else:
+            for dtype in [np.int8, np.int16, np.int32]:
+                if np.iinfo(dtype).min <= row["min"] and row["max"] <= np.iinfo(dtype).max:
+                    if np.dtype(dtype).itemsize < np.dtype(row["dtype"]).itemsize:
+                        dtypes[col] = dtype
+                    break
+    return dtypes
+
+
+def _report(stats:pd.DataFrame, dtypes:dict, n_rows:int, n_columns:int,
+            bytes_before:int) -> list:
+    bytes_saved = int(n_rows * sum(np.dtype(stats.at[col, "dtype"]).itemsize - np.dtype(
+        dtype).itemsize for col, dtype in dtypes.items()))
+    downcasted = list(dtypes.keys())
+    return [n_columns, len(downcasted), bytes_before, bytes_before - bytes_saved, bytes_saved,
+            float(stats.max_abs_error.loc[downcasted].max()) if len(downcasted) else 0.,
+            float(stats.max_rel_error.loc[downcasted].max()) if len(downcasted) else 0.]
+
+
+def _downcast_frame(df:pd.DataFrame, tolerance:tuple[float, float]) -> tuple[pd.DataFrame, list]:
+    stats = _column_stats(df, tolerance)
+    dtypes = _downcast_dtypes(stats)
+    bytes_before = int(df.memory_usage(index=False).sum())
+    report = _report(stats, dtypes, df.shape[0], df.shape[1], bytes_before)
+    if not len(dtypes):
+        return df, report
+    if len(dtypes) == df.shape[1] and len(set(dtypes.values())) == 1:
+        return df.astype(next(iter(dtypes.values()))), report  # one cast of the whole block
+    return df.astype(dtypes), report
+
+
+def _downcast_hdf_key(store:pd.io.pytables.HDFStore, key:str, tolerance:tuple[float, float],
+                      chunksize:int, **kwargs) -> list:
+    if not store.get_storer(key).is_table:  # fixed format cannot be read in chunks
+        df, report = _downcast_frame(store.get(key), tolerance)
+        kwargs = deepcopy(kwargs)
+        kwargs["format"] = kwargs.get("format", "table")
+        store.put(key, df, **kwargs)
+        return report
+
+    # first pass: determine the dtypes
+    stats, n_rows, n_columns, bytes_before = None, 0, 0, 0
+    for chunk in store.select(key, chunksize=chunksize):
+        stats = _merge_column_stats(stats, _column_stats(chunk, tolerance))
+        n_rows += chunk.shape[0]
+        n_columns = chunk.shape[1]
+        bytes_before += int(chunk.memory_usage(index=False).sum())
+    if stats is None:
+        return [0, 0, 0, 0, 0, 0., 0.]
+    dtypes = _downcast_dtypes(stats)
+    report = _report(stats, dtypes, n_rows, n_columns, bytes_before)
+    if not len(dtypes):
+        return report
+
+    # second pass: write the downcasted chunks to a temporary key which then replaces key
+    tmp_key = key + "_downcasted"
+    if tmp_key in store:
+        store.remove(tmp_key)
+    for chunk in store.select(key, chunksize=chunksize):
+        store.append(tmp_key, chunk.astype(dtypes), **kwargs)
+    store.remove(key)
+    store.get_node(tmp_key)._f_rename(key.rstrip("/").rsplit("/", 1)[-1])
+    return report
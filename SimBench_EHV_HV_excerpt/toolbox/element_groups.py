@@ -0,0 +1,35 @@
+from typing import TYPE_CHECKING
+import pandas as pd
+
+if TYPE_CHECKING:
+    import pandapower as pp
+
+# groups of elements:
+#   regular -> elements of the grid excerpt;
+#   ExtL -> loads which replace the boundary lines to the rest of SimBench' grid, cf. reduce_ehv();
+#   eq -> equivalent elements
+ELEMENT_GROUPS = ["regular", "ExtL", "eq"]
+
+
+def element_groups(net:"pp.pandapowerNet", et:str) -> pd.Series:
+    """Returns the group of each element of net[et], cf. ELEMENT_GROUPS. The groups are derived
+    from the element names: names starting with "Ext" are "ExtL", other names containing "eq" are
+    "eq". Element numbers and power sums of the grid excerpt, e.g. of data_overview, consider
+    only "regular" elements.
+
+    Example
+    -------
+    >>> element_groups(net, "load").value_counts()
+    """
+    name = net[et].name.fillna("").astype(str)
+    group = pd.Series("regular", index=net[et].index, name="group")
+    group.loc[name.str.contains("eq").values] = "eq"
+    group.loc[name.str.startswith("Ext").values] = "ExtL"
+    return group
+
+
+def regular_elements(net:"pp.pandapowerNet", et:str) -> pd.Index:
+    """Returns the index of the elements of net[et] which are neither ExtL nor equivalent
+    elements, cf. element_groups()."""
+    groups = element_groups(net, et)
+    return groups.index[groups.values == "regular"]
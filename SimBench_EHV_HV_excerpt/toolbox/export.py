@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt.toolbox.parquet_profiles import CRITICAL_TIME_STEPS_FILE, \
+    store_profiles_to_parquet_files
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import replace_folder
+from SimBench_EHV_HV_excerpt.toolbox.critical_time_steps import critical_time_step_index
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+
+def export_net(
+        net:pp.pandapowerNet,
+        folder:str,
+        net_file:str = "net.json",
+        profiles_subfolder:str = "profiles",
+        **kwargs
+    ) -> None:
+    """Exports the net to a json file and its profiles to parquet files in the partitioned format
+    of this repository, cf. store_profiles_to_parquet_files(). Neither the net nor the profiles
+    are copied: net.profiles is detached from the net while the json file is written and the
+    profiles are written key by key.
+
+    The export is atomic: the json file and the profiles are written to one temporary folder
+    next to the given folder first. Only if all files were written successfully, the folder of a
+    former export is replaced by the temporary folder at once. Thus, a failing export leaves a
+    former export unchanged and the json file always matches the profiles. Since the folder is
+    replaced as a whole, it must not contain other files than those of a former export.
+    If the buses have zones, the critical_time_step_index() of the profiles is stored next to
+    them, so that add_profiles_from_parquet_to_net() loads it instead of computing it again.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net to export. If the net has no profiles, only the json file is written
+    folder : str
+        target folder, e.g. os.path.join(home, "Desktop", "SimBench_EHV_HV_excerpt")
+    net_file : str, optional
+        name of the json file, by default "net.json"
+    profiles_subfolder : str, optional
+        name of the subfolder of the parquet files, by default "profiles"
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments for pandas' to_parquet() function
+    """
+    folder = os.path.abspath(folder)
+    if os.path.isdir(folder):
+        other_files = set(os.listdir(folder)) - {net_file, profiles_subfolder}
+        if len(other_files):
+            raise ValueError(
+                f"The export replaces the folder {folder} as a whole but it contains other files "
+                f"than a former export: {sorted(other_files)}")
+    os.makedirs(os.path.dirname(folder), exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(folder),
+                               prefix=f".{os.path.basename(folder)}_export_")
+    try:
+        profiles = net.pop("profiles", None)
+        try:
+            pp.to_json(net, os.path.join(staging, net_file))
+        finally:
+            if profiles is not None:
+                net["profiles"] = profiles
+        if profiles is not None:
+            store_profiles_to_parquet_files(
+                profiles, os.path.join(staging, profiles_subfolder), **kwargs)
+            if net.bus.zone.notna().any() and any(key.endswith(".p_mw") for key in
+                                                  profiles.keys()):
+                critical_time_step_index(net, profiles).to_parquet(os.path.join(
+                    staging, profiles_subfolder, CRITICAL_TIME_STEPS_FILE))
+
+        # --- replace the folder of a former export
+        replace_folder(staging, folder)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"net is exported to {folder}" + (
+        "." if profiles is None else f" with profiles in the subfolder '{profiles_subfolder}'."))
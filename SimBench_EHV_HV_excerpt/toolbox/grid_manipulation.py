@@ -1,10 +1,11 @@
 import numpy as np
 import pandas as pd
 import pandapower as pp
-import pandapower.topology as top
 import simbench as sb
 
 from SimBench_EHV_HV_excerpt.toolbox.run_custom_timeseries import run_custom_timeseries
+from SimBench_EHV_HV_excerpt.toolbox.topology import TopologyIndex
+from SimBench_EHV_HV_excerpt.toolbox.sensitivities import linearized_line_flows, compare_to_ac
 
 try:
     import pandaplan.core.pplog as logging
@@ -16,7 +17,7 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
-def set_bus_zones(net):
+def set_bus_zones(net, topology:TopologyIndex|None=None):
     boundary_buses = {68}  # Borken
     boundary_buses |= {106}  # North-West of Borken
     boundary_buses |= {38}  # between Hamburg - Bremen
@@ -35,13 +36,11 @@ def set_bus_zones(net):
     # inner_buses = list(net.trafo.hv_bus.loc[net.trafo.vn_lv_kv == 110]) + [
     #     104, 320, 1902, 1894, 36, 1472, 3079]
 
-    inner_buses = set(top.connected_component(top.create_nxgraph(net), net.trafo.hv_bus.loc[
-        net.trafo.vn_lv_kv == 110].iat[0], notravbuses=boundary_buses)) | set(
-        top.connected_component(top.create_nxgraph(net), 104, notravbuses=boundary_buses)) | \
-        set(top.connected_component(top.create_nxgraph(net), 1902, notravbuses=boundary_buses)) | \
-        set(top.connected_component(top.create_nxgraph(net), 1442, notravbuses=boundary_buses)) | \
-        set(top.connected_component(top.create_nxgraph(net), 1492, notravbuses=boundary_buses)) | \
-        set(top.connected_component(top.create_nxgraph(net), 254, notravbuses=boundary_buses)) | \
+    if topology is None:
+        topology = TopologyIndex(net)
+    start_buses = [net.trafo.hv_bus.loc[net.trafo.vn_lv_kv == 110].iat[0], 104, 1902, 1442, 1492,
+                   254]
+    inner_buses = topology.connected_buses(start_buses, notravbuses=boundary_buses) | \
         boundary_buses
     net.bus["zone"] = 20
     net.bus.loc[list(inner_buses), "zone"] = 18
@@ -49,45 +48,36 @@ def set_bus_zones(net):
     return boundary_buses, zone_boundary_buses, inner_buses
 
 
-def reduce_ehv(net, time_steps, boundary_buses, zone_boundary_buses, inner_buses):
+def reduce_ehv(net, time_steps, boundary_buses, zone_boundary_buses, inner_buses, fast=False,
+               n_check_steps=10):
+    """Reduces the net to the inner_buses and replaces the boundary lines by loads (ExtL_*) with
+    the boundary flows of a time series as profiles.
 
-    # --- determine boundary_branches
-    boundary_branches = dict()
-    # determine boundary_branches["f_lines"] (lines which are connected to boundary_buses via
-    # from_bus)
-    boundary_branches["f_lines"] = net.line.index[net.line.from_bus.isin(
-        boundary_buses) & ~net.line.to_bus.isin(boundary_buses | inner_buses)]
+    If fast is True, the boundary flows of all time steps are calculated at once by linearized AC
+    sensitivities (cf. linearized_line_flows()) instead of an AC time series. The deviation to AC
+    results is checked and logged for n_check_steps time steps.
+    """
 
-    # determine boundary_branches["t_lines"]
-    boundary_branches["t_lines"] = net.line.index[net.line.to_bus.isin(
-        boundary_buses) & ~net.line.from_bus.isin(boundary_buses | inner_buses)]
-
-    # determine boundary_branches["hv_trafos"] (trafos which are connected to boundary_buses via
-    # hv_bus)
-    boundary_branches["hv_trafos"] = net.trafo.index[net.trafo.hv_bus.isin(
-        boundary_buses) & ~net.trafo.lv_bus.isin(boundary_buses | inner_buses)]
-
-    # determine boundary_branches["t_trafos"]
-    boundary_branches["lv_trafos"] = net.trafo.index[net.trafo.lv_bus.isin(
-        boundary_buses) & ~net.trafo.hv_bus.isin(boundary_buses | inner_buses)]
-
-    assert not len(boundary_branches["hv_trafos"])
-    assert not len(boundary_branches["lv_trafos"])
-    del boundary_branches["hv_trafos"]
-    del boundary_branches["lv_trafos"]
+    # --- determine boundary_branches
+    boundary_branches = boundary_lines(net, boundary_buses, inner_buses)
     f_line_buses = net.line.from_bus.loc[boundary_branches["f_lines"]]
     t_line_buses = net.line.to_bus.loc[boundary_branches["t_lines"]]
 
     # --- run ts
-    output_vals = [("line", "p_from_mw"), ("line", "q_from_mvar"),
-                   ("line", "p_to_mw"), ("line", "q_to_mvar")]
-    logger.info("reduce_ehv timeseries started.")
-    if paco_imported:
-        res = run_custom_timeseries(net, time_steps, "numba", None, output_vals=output_vals,
-                                    include_bus_pq_results=False)
+    if fast:
+        if paco_imported:
+            kernel, kwargs = "numba", {"include_bus_pq_results": False}
+        else:
+            kernel, kwargs = "pp", dict()
+        logger.info("reduce_ehv linearized boundary flows started.")
+        res = linearized_line_flows(net, time_steps, boundary_branches["f_lines"].union(
+            boundary_branches["t_lines"]))
+        deviation = compare_to_ac(net, res, n_check_steps, kernel, **kwargs)
+        logger.info(f"Deviation of the linearized boundary flows from AC results:\n{deviation}")
     else:
-        res = run_custom_timeseries(net, time_steps, "pp", None, output_vals=output_vals)
-    logger.info("reduce_ehv timeseries finished.")
+        logger.info("reduce_ehv timeseries started.")
+        res = boundary_line_flows(net, time_steps, boundary_branches)
+        logger.info("reduce_ehv timeseries finished.")
 
     # remove unused res data:
     for power in [("p", "mw"), ("q", "mvar")]:
@@ -133,17 +123,62 @@ def reduce_ehv(net, time_steps, boundary_buses, zone_boundary_buses, inner_buses
     net.bus.loc[net.bus.subnet.str.contains("HV1"), "zone"] = 3
     net.bus.loc[net.bus.subnet.str.contains("HV2"), "zone"] = 4
     ehv_buses = set(net.bus.index[net.bus.vn_kv > 110])
-    tennet_buses = set(top.connected_component(top.create_nxgraph(net), net.trafo.hv_bus.loc[
-        net.trafo.vn_lv_kv == 110].iat[0], notravbuses=zone_boundary_buses)) & ehv_buses
+    tennet_buses = TopologyIndex(net).component(net.trafo.hv_bus.loc[
+        net.trafo.vn_lv_kv == 110].iat[0], notravbuses=zone_boundary_buses) & ehv_buses
     net.bus.loc[list(tennet_buses), "zone"] = 1
     # ext_grids == 2:
     net.bus.loc[list(ehv_buses - tennet_buses), "zone"] = 2
     # wbb == True:
-    net.bus.zone.loc[net.bus.subnet.isin(["EHV1_HV1", "EHV1_HV2"])] = 0
+    net.bus.loc[net.bus.subnet.isin(["EHV1_HV1", "EHV1_HV2"]), "zone"] = 0
     net.bus.loc[list(zone_boundary_buses), "zone"] = 0
     return net
 
 
+def boundary_lines(net, boundary_buses, inner_buses) -> dict[str, pd.Index]:
+    """Returns the lines which connect the boundary_buses to the rest of SimBench's grid, i.e.
+    the lines which reduce_ehv() replaces by ExtL_* loads: "f_lines" are connected to the
+    boundary_buses via from_bus, "t_lines" via to_bus."""
+    boundary_branches = dict()
+    # determine boundary_branches["f_lines"] (lines which are connected to boundary_buses via
+    # from_bus)
+    boundary_branches["f_lines"] = net.line.index[net.line.from_bus.isin(
+        boundary_buses) & ~net.line.to_bus.isin(boundary_buses | inner_buses)]
+
+    # determine boundary_branches["t_lines"]
+    boundary_branches["t_lines"] = net.line.index[net.line.to_bus.isin(
+        boundary_buses) & ~net.line.from_bus.isin(boundary_buses | inner_buses)]
+
+    # no trafos may connect the boundary_buses to the rest of the grid
+    assert not (net.trafo.hv_bus.isin(boundary_buses) & ~net.trafo.lv_bus.isin(
+        boundary_buses | inner_buses)).any()
+    assert not (net.trafo.lv_bus.isin(boundary_buses) & ~net.trafo.hv_bus.isin(
+        boundary_buses | inner_buses)).any()
+    return boundary_branches
+
+
+def boundary_line_flows(net, time_steps, boundary_branches:dict[str, pd.Index],
+                        **kwargs) -> dict[str, pd.DataFrame]:
+    """Runs the AC time series of reduce_ehv() and returns the flows over the boundary lines
+    (time steps x lines), i.e. p_from_mw and q_from_mvar of the "f_lines" and p_to_mw and
+    q_to_mvar of the "t_lines" of boundary_lines(). kwargs are passed to
+    run_custom_timeseries()."""
+    if paco_imported:
+        kernel, kwargs = "numba", {"include_bus_pq_results": False, **kwargs}
+    else:
+        kernel = "pp"
+    prefix = "res_" if kernel == "pp" else ""
+    output_vals = [(f"{prefix}line", "p_from_mw"), (f"{prefix}line", "q_from_mvar"),
+                   (f"{prefix}line", "p_to_mw"), (f"{prefix}line", "q_to_mvar")]
+    res = run_custom_timeseries(net, time_steps, kernel, None, output_vals=output_vals,
+                                **kwargs)
+    flows = dict()
+    for power in [("p", "mw"), ("q", "mvar")]:
+        for direction in ["from", "to"]:
+            key = "res_line." + power[0] + "_" + direction + "_" + power[1]
+            flows[key] = res[key][boundary_branches[direction[0] + "_lines"]]
+    return flows
+
+
 def pre_manipulation_simbench_data(net):
     net.measurement = net.measurement.drop(net.measurement.index)
     del net["loadcases"]
@@ -171,15 +206,15 @@ def pre_manipulation_simbench_data(net):
     pp.change_std_type(net, 834, "LineType_8")  # -> Vereineinhalbfachung
 
     # external line change (to ensure convergence):
-    net.line.parallel.loc[[824]] += 1
-    net.line.parallel.loc[[11, 14, 32, 79, 100, 169, 190, 191, 192, 260, 315, 362, 363,
-                           400, 450, 508, 593, 614, 665, 714, 754, 768, 808, 824]] += 1
-    net.line.parallel.loc[[841]] += 1
-    net.line.parallel.loc[[192, 227, 343, 768]] += 1
-    net.line.parallel.loc[[39, 273, 838, 840]] += 1
+    net.line.loc[[824], "parallel"] += 1
+    net.line.loc[[11, 14, 32, 79, 100, 169, 190, 191, 192, 260, 315, 362, 363, 400, 450, 508,
+                  593, 614, 665, 714, 754, 768, 808, 824], "parallel"] += 1
+    net.line.loc[[841], "parallel"] += 1
+    net.line.loc[[192, 227, 343, 768], "parallel"] += 1
+    net.line.loc[[39, 273, 838, 840], "parallel"] += 1
 
     repl_ext_grid_by_gen_slack_weight_consideration(net)
-    net.gen.slack.loc[[338, 344]] = np.array([False, True])
+    net.gen.loc[[338, 344], "slack"] = np.array([False, True])
     net.gen.loc[338:339, "slack_weight"] = 0  # don't change p_mw of inner_buses gens.
     net.gen.controllable = net.gen.controllable.fillna(True)
     net.profiles = sb.get_absolute_values(net, profiles_instead_of_study_cases=True)
@@ -276,5 +311,5 @@ def repl_ext_grid_by_gen_slack_weight_consideration(net):
         ext_grid_to_replace = net.ext_grid.index
         new_gens = pp.replace_ext_grid_by_gen(net, ext_grid_to_replace, add_cols_to_keep=[
             "profile", "phys_type", "type", "slack_weight", "sn_mva", "voltLvl", "subnet"])
-        net.gen.loc[new_gens, "p_mw"] = net.gen.loc[new_gens, "max_p_mw"]
-        net.gen.slack.loc[new_gens[0]] = True
+        net.gen.loc[new_gens, "p_mw"] = net.gen.loc[new_gens, "max_p_mw"].astype(float)
+        net.gen.loc[new_gens[0], "slack"] = True
@@ -35,7 +35,7 @@ def write_ts_results_to_json(results_dict, path, time_steps=None, ignore_keys=No
     if len(keys_without_dot):
         logger.warning("In results_dict exist keys without '.' in between res_elm and variable: " +
                        str(keys_without_dot) + " These are ignored when writing to json files.")
-    res_elm_cols = [tuple(key.split(".")) for key in keys if "." in key]
+    res_elm_cols = [tuple(key.split(".", 1)) for key in keys if "." in key]
     if not len(res_elm_cols):
         logger.info("There are no res_elm_cols in results_dict.")
         return
@@ -56,8 +56,11 @@ def write_ts_results_to_json(results_dict, path, time_steps=None, ignore_keys=No
         folder = os.path.join(path, res_elm)
         if not os.path.exists(folder):
             os.makedirs(folder)
-        loc_None(results_dict["%s.%s" % (res_elm, col)], time_steps).to_json(
-            os.path.join(folder, col + ".json"))
+        data = results_dict["%s.%s" % (res_elm, col)]
+        if isinstance(data, pd.Series):  # results reduced over the time steps
+            data.to_json(os.path.join(folder, col + ".json"))
+        else:
+            loc_None(data, time_steps).to_json(os.path.join(folder, col + ".json"))
 
 
 def read_ts_results_from_json(path, ignore=None, include_only=None, time_steps=None,
@@ -75,6 +78,10 @@ def read_ts_results_from_json(path, ignore=None, include_only=None, time_steps=N
             if file[-5:] == ".json" and "param" not in file and "net" not in file:
                 key = "%s.%s" % (os.path.basename(subdir), file[:-5])
                 if (include_only is None or key in include_only) and key not in ignore:
+                    if "." in file[:-5]:  # results reduced over the time steps, e.g. "vm_pu.max"
+                        results_dict[key] = pd.read_json(os.path.join(subdir, file),
+                                                         typ="series")
+                        continue
                     df = pd.read_json(os.path.join(subdir, file))
                     if df.shape[1]:
                         results_dict[key] = loc_None(df, time_steps)
@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from scipy.sparse import csc_matrix, csr_matrix
+
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import fingerprint
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# columns which are summed up by merging, as in pandapower.merge_same_bus_generation_plants().
+# Profiles of all other columns, e.g. vm_pu, get the values of the first merged element.
+SUM_COLUMNS = ["p_mw", "q_mvar", "min_p_mw", "max_p_mw", "min_q_mvar", "max_q_mvar"]
+_LIMIT_COLUMNS = SUM_COLUMNS[2:]
+_merge_plans = dict()
+_max_cached_plans = 16
+
+
+class MergePlan:
+    """Plan to merge the generation plants connected to the same buses so that one element per bus
+    remains, as done by pandapower.merge_same_bus_generation_plants(). The first element per bus
+    (in the order of gen_elms and the element indices) is kept. The plan is a sparse matrix which
+    maps all elements to the kept elements, so that element data and profiles of all time steps
+    are aggregated by one sparse matrix multiplication per key instead of loops over the buses.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net to merge the elements of
+    gen_elms : typing.Iterable[str], optional
+        element types to merge. Should be in order of slack, PV and PQ elements, by default
+        ("ext_grid", "gen", "sgen")
+
+    Example
+    -------
+    >>> plan = merge_plan(net, ["ext_grid", "gen"])
+    >>> plan.aggregate({"gen": net.profiles["gen.p_mw"]})  # {"gen": merged gen.p_mw profiles}
+    """
+
+    def __init__(self, net:pp.pandapowerNet, gen_elms=("ext_grid", "gen", "sgen")):
+        self.gen_elms = list(gen_elms)
+        self.indices = {et: net[et].index for et in self.gen_elms}
+        lengths = [len(self.indices[et]) for et in self.gen_elms]
+        self._offsets = dict(zip(self.gen_elms, np.cumsum([0] + lengths)[:-1]))
+        ets = np.repeat(self.gen_elms, lengths)
+        buses = np.concatenate([net[et].bus.values for et in self.gen_elms]).astype(np.int64)
+        indices = np.concatenate([self.indices[et].values for et in self.gen_elms]).astype(
+            np.int64)
+
+        self._is_kept = ~pd.Series(buses).duplicated().values
+        kept_positions = np.flatnonzero(self._is_kept)
+        self._columns = pd.Index(buses[kept_positions]).get_indexer(buses)
+        n = len(buses)
+        self.matrix = csr_matrix((np.ones(n), (np.arange(n), self._columns)),
+                                 shape=(n, len(kept_positions)))
+        self.n_merged = np.bincount(self._columns, minlength=len(kept_positions))
+        self._kept_ets = ets[kept_positions]
+        self._kept_indices = indices[kept_positions]
+
+    @property
+    def something_merged(self) -> bool:
+        return bool((self.n_merged > 1).any())
+
+    def kept(self, et:str) -> pd.Index:
+        """Returns the indices of the elements of type et which remain after merging."""
+        return self.indices[et][self._is_kept[self._rows(et)]]
+
+    def dropped(self, et:str) -> pd.Index:
+        """Returns the indices of the elements of type et which are merged into other elements."""
+        return self.indices[et][~self._is_kept[self._rows(et)]]
+
+    def merging(self, et:str) -> pd.Index:
+        """Returns the indices of the kept elements of type et which include other elements."""
+        return pd.Index(self._kept_indices[(self._kept_ets == et) & (self.n_merged > 1)])
+
+    def _rows(self, et:str) -> slice:
+        return slice(self._offsets[et], self._offsets[et] + len(self.indices[et]))
+
+    def _source_rows(self, et:str, columns:pd.Index) -> np.ndarray:
+        positions = self.indices[et].get_indexer(columns)
+        if (positions < 0).any():
+            raise KeyError(f"The {et} data include elements which are not in net[{et!r}]: "
+                           f"{list(columns[positions < 0])}")
+        return self._offsets[et] + positions
+
+    def aggregate(self, data:dict[str, pd.DataFrame], how:str="sum",
+                  tol:float=1e-6) -> dict[str, pd.DataFrame]:
+        """Aggregates data of the element types (one column per element, e.g. the profiles of one
+        column like "p_mw") to the kept elements.
+
+        Parameters
+        ----------
+        data : dict[str, pd.DataFrame]
+            data per element type of gen_elms, e.g. {"gen": net.profiles["gen.p_mw"],
+            "sgen": net.profiles["sgen.p_mw"]}. All DataFrames need the same index.
+        how : str, optional
+            "sum" to sum the values of merged elements or "first" to take the values of the first
+            merged element which has data. With "first", a warning is logged if the values of
+            merged elements differ by more than tol, by default "sum"
+        tol : float, optional
+            tolerance of the consistency check of "first", by default 1e-6
+
+        Returns
+        -------
+        dict[str, pd.DataFrame]
+            aggregated data per element type with columns of the kept elements which got data
+        """
+        if not len(data):
+            return dict()
+        index = next(iter(data.values())).index
+        if any(not df.index.equals(index) for df in data.values()):
+            raise ValueError("The data to aggregate need the same index.")
+        values = self._aggregate(data, how)
+
+        has_data = np.zeros(self.matrix.shape[1], dtype=bool)
+        for et, df in data.items():
+            has_data[self._columns[self._source_rows(et, df.columns)]] = True
+        aggregated = dict()
+        for et in self.gen_elms:
+            cols = np.flatnonzero(has_data & (self._kept_ets == et))
+            if et in data.keys() or len(cols):
+                aggregated[et] = pd.DataFrame(values[:, cols], index=index,
+                                              columns=pd.Index(self._kept_indices[cols]))
+
+        if how == "first" and np.isfinite(tol):
+            deviation = self._max_deviation(data, values)
+            if (deviation > tol).any():
+                logger.warning(f"The values of the elements merged into "
+                               f"{list(self._kept_indices[deviation > tol])} differ. Only the "
+                               "values of the first merged elements are considered.")
+        return aggregated
+
+    def max_deviation(self, data:dict[str, pd.DataFrame]) -> dict[str, pd.Series]:
+        """Returns the maximum absolute deviation of the data of merged elements from the data of
+        the first merged element per kept element, cf. aggregate(how="first")."""
+        deviation = self._max_deviation(data, self._aggregate(data, "first"))
+        return {et: pd.Series(deviation[self._kept_ets == et], index=pd.Index(
+            self._kept_indices[self._kept_ets == et])) for et in self.gen_elms}
+
+    def _aggregate(self, data:dict[str, pd.DataFrame], how:str) -> np.ndarray:
+        """Returns the aggregated values in the order of the matrix columns."""
+        dtype = np.result_type(*[dtype for df in data.values() for dtype in df.dtypes] or [
+            np.float64])
+        n_rows = next(iter(data.values())).shape[0]
+        values = np.zeros((n_rows, self.matrix.shape[1]), dtype=dtype)
+        covered = np.zeros(self.matrix.shape[1], dtype=bool)
+        for et in self.gen_elms:  # in order of gen_elms, relevant for "first"
+            if et not in data.keys() or not data[et].shape[1]:
+                continue
+            mat = self.matrix[self._source_rows(et, data[et].columns)].astype(dtype)
+            vals = data[et].to_numpy(dtype=dtype)
+            if how == "sum":
+                values += vals @ mat
+            elif how == "first":
+                mat = csc_matrix(mat)
+                mat.sort_indices()
+                cols = np.flatnonzero((np.diff(mat.indptr) > 0) & ~covered)
+                values[:, cols] = vals[:, mat.indices[mat.indptr[cols]]]
+                covered[cols] = True
+            else:
+                raise NotImplementedError(f"{how=}")
+        return values
+
+    def _max_deviation(self, data:dict[str, pd.DataFrame], first:np.ndarray) -> np.ndarray:
+        deviation = np.zeros(self.matrix.shape[1])
+        for et, df in data.items():
+            if not df.shape[1] or not df.shape[0]:
+                continue
+            cols = self._columns[self._source_rows(et, df.columns)]
+            np.fmax.at(deviation, cols, np.nanmax(np.abs(df.to_numpy(
+                np.float64) - first[:, cols]), axis=0))
+        return deviation
+
+
+def merge_plan(net:pp.pandapowerNet, gen_elms=("ext_grid", "gen", "sgen")) -> MergePlan:
+    """Returns the MergePlan of the net's elements. Plans are cached per gen_elms and element
+    buses, so that net variants with the same generation plants share one plan."""
+    key = fingerprint([list(gen_elms)] + [net[et].bus for et in gen_elms])
+    if key not in _merge_plans.keys():
+        if len(_merge_plans) >= _max_cached_plans:
+            del _merge_plans[next(iter(_merge_plans))]
+        _merge_plans[key] = MergePlan(net, gen_elms)
+    return _merge_plans[key]
+
+
+def merge_same_bus_gens(
+        net:pp.pandapowerNet,
+        gen_elms=("ext_grid", "gen", "sgen"),
+        add_info:bool=True,
+        error:bool=True,
+        plan:MergePlan|None=None,
+    ) -> bool:
+    """Merges generation plants connected to the same buses so that one element per bus remains.
+    The element data are merged as by pandapower.merge_same_bus_generation_plants(). In addition,
+    all profiles of the element types (e.g. gen.p_mw, gen.vm_pu, sgen.p_mw) are merged: summed for
+    SUM_COLUMNS, otherwise taken from the first merged element. The profiles are replaced instead
+    of changed in place, so that profiles shared with other nets remain unchanged.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net to merge the elements of
+    gen_elms : typing.Iterable[str], optional
+        element types to merge. Should be in order of slack, PV and PQ elements, by default
+        ("ext_grid", "gen", "sgen")
+    add_info : bool, optional
+        If True, the column "includes_other_plants" is added to the element tables, by default
+        True
+    error : bool, optional
+        If True, an error is raised if merged elements have different vm_pu values. Otherwise, an
+        error is logged, by default True
+    plan : MergePlan | None, optional
+        plan to apply. If None, merge_plan() is used, by default None
+
+    Returns
+    -------
+    bool
+        whether something was merged
+    """
+    gen_elms = list(gen_elms)
+    plan = merge_plan(net, gen_elms) if plan is None else plan
+
+    if add_info:
+        for et in gen_elms:
+            if "includes_other_plants" not in net[et].columns or net[et][
+                    "includes_other_plants"].dtype != bool:
+                net[et]["includes_other_plants"] = False
+    if not plan.something_merged:
+        return False
+
+    # --- element data
+    vm_pu = {et: net[et][["vm_pu"]].T.astype(float) for et in gen_elms if "vm_pu" in net[et].columns}
+    if len(vm_pu):
+        deviation = pd.concat(plan.max_deviation(vm_pu).values())
+        if (deviation > 1e-9).any():
+            message = "Generation plants merged into the elements " + \
+                f"{list(deviation.index[deviation > 1e-9])} have different vm_pu."
+            if error:
+                raise ValueError(message)
+            logger.error(message + " Only the first value is considered.")
+
+    for col in SUM_COLUMNS:
+        data = {et: net[et][[col]].T.astype(float) for et in gen_elms if col in
+                net[et].columns}
+        if not len(data):
+            continue
+        summed = plan.aggregate({et: df.fillna(0.) for et, df in data.items()})
+        n_valid = plan.aggregate({et: df.notnull().astype(float) for et, df in data.items()})
+        for et, df in summed.items():
+            merged = plan.merging(et).intersection(df.columns)
+            if col in _LIMIT_COLUMNS:  # limits are only summed if any of them is given
+                merged = merged[n_valid[et].iloc[0].loc[merged].values > 0]
+            elif col == "q_mvar" and col not in net[et].columns:
+                continue
+            if not len(merged):
+                continue
+            et_col = "p_disp_mw" if et == "ext_grid" and col == "p_mw" else col
+            if et_col not in net[et].columns:
+                net[et][et_col] = np.nan
+            net[et].loc[merged, et_col] = df.iloc[0].loc[merged].values
+
+    for et in gen_elms:
+        if add_info:
+            net[et].loc[plan.merging(et), "includes_other_plants"] = True
+        dropped = plan.dropped(et)
+        if len(dropped):
+            net[et] = net[et].drop(dropped)
+
+    # --- profiles
+    if "profiles" in net.keys():
+        profile_cols = {key.split(".", 1)[1] for key in net.profiles.keys() if key.split(".", 1)[
+            0] in gen_elms}
+        for col in sorted(profile_cols):
+            merged = plan.aggregate({et: net.profiles[f"{et}.{col}"] for et in gen_elms if
+                                     f"{et}.{col}" in net.profiles.keys()},
+                                    how="sum" if col in SUM_COLUMNS else "first")
+            for et, df in merged.items():
+                et_col = "p_disp_mw" if et == "ext_grid" and col == "p_mw" else col
+                net.profiles[f"{et}.{et_col}"] = df
+    return True
@@ -0,0 +1,197 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+from SimBench_EHV_HV_excerpt.toolbox.output_writer import result_dtype
+from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import get_et_col, set_sgen_limits, \
+    set_time_step
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# columns of profiles which are applied as OPF limits after the limits derived from the time step
+OPF_LIMIT_COLUMNS = ["min_p_mw", "max_p_mw", "min_q_mvar", "max_q_mvar", "min_vm_pu",
+                     "max_vm_pu", "max_loading_percent"]
+DEFAULT_OPF_OUTPUTS = [("res_bus", "vm_pu"), ("res_line", "loading_percent"),
+                       ("res_trafo", "loading_percent"), ("res_gen", "p_mw"),
+                       ("res_gen", "q_mvar"), ("res_sgen", "p_mw"), ("res_sgen", "q_mvar")]
+_net = None  # net shared by all windows of a worker process
+
+
+def run_opf_timeseries(
+        net:pp.pandapowerNet,
+        time_steps:list[int]|TimeSteps|None=None,
+        window_size:int=96,
+        n_jobs:int=1,
+        warm_start:bool=True,
+        curtailment:bool=False,
+        vde_q_limits:bool=True,
+        output_vals:list[tuple[str, str]]|None=None,
+        profiles:dict[str, pd.DataFrame]|None=None,
+        **kwargs
+    ) -> dict[str, pd.DataFrame]:
+    """Runs pandapower's OPF for each time step. The time steps are split into windows of
+    consecutive time steps. Within a window, each OPF is initialized by the results of the
+    previous time step (init="results"), i.e. by a nearby operating point. Since pandapower's
+    interior point solver restarts its barrier parameter, the gain of the warm start is small
+    compared to the parallel windows, which are independent from each other and thus run by n_jobs
+    processes.
+    The objective is defined by the cost tables of the net (net.poly_cost, net.pwl_cost) and the
+    controllable elements by the column "controllable".
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles, e.g. from SimBench_for_phd(). The net is not changed
+    time_steps : list[int] | TimeSteps | None, optional
+        time steps to run, by default all time steps of the profiles
+    window_size : int, optional
+        number of consecutive time steps per window, by default 96 (one day)
+    n_jobs : int, optional
+        number of parallel processes to run windows, by default 1
+    warm_start : bool, optional
+        whether to initialize the OPF by the results of the previous time step. If such an OPF
+        does not converge, it is repeated with the initialization given by kwargs,
+        by default True
+    curtailment : bool, optional
+        If False, the active power of controllable sgens is fixed to the profile value, otherwise
+        it can be reduced down to zero, by default False
+    vde_q_limits : bool, optional
+        whether to set the reactive power limits of the sgens according to the Q(P) dependency of
+        VDE AR-N 4120/4130 for the active power of each time step, cf. set_sgen_limits(). Needs
+        the column net.sgen.qcurve1, by default True
+    output_vals : list[tuple[str, str]] | None, optional
+        results to log, by default DEFAULT_OPF_OUTPUTS
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles, by default net.profiles. Profiles of OPF_LIMIT_COLUMNS, e.g. "sgen.max_q_mvar",
+        are applied as time-resolved limits and override the limits derived from the time step
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments of pp.runopp(), e.g. init="pf" (used for the first time step of each
+        window)
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        "opf": per time step the window, the convergence, the objective value (net.res_cost),
+        whether the converged OPF was warm started and the run time in seconds;
+        further keys such as "res_bus.vm_pu": results (time steps x elements), which are NaN for
+        not converged time steps
+
+    Example
+    -------
+    >>> net = SimBench_for_phd(time_steps=range(96*7))
+    >>> pp.create_poly_cost(net, net.gen.index[net.gen.slack][0], "gen", cp1_eur_per_mw=1.)
+    >>> res = run_opf_timeseries(net, window_size=96, n_jobs=7)
+    >>> res["opf"].converged.all(), res["opf"].time_s.sum()
+    """
+    profiles = net.profiles if profiles is None else profiles
+    time_steps = list(TimeSteps(True if time_steps is None else time_steps).resolve(profiles))
+    output_vals = DEFAULT_OPF_OUTPUTS if output_vals is None else output_vals
+    if vde_q_limits and "qcurve1" not in net.sgen.columns:
+        raise ValueError("vde_q_limits=True needs the column net.sgen.qcurve1.")
+    options = {"warm_start": warm_start, "curtailment": curtailment,
+               "vde_q_limits": vde_q_limits, "output_vals": output_vals, "runopp_kwargs": kwargs}
+
+    windows = [time_steps[i:i+window_size] for i in range(0, len(time_steps), window_size)]
+    tasks = [({key: df.loc[window] for key, df in profiles.items()}, window) for window in
+             windows]
+    worker_net = pp.pandapowerNet(deepcopy({
+        key: value for key, value in net.items() if key != "profiles"}))
+    if n_jobs == 1 or len(windows) <= 1:
+        _init_worker(worker_net)
+        outputs = [_run_window(*task, options) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(worker_net,)) as executor:
+            outputs = list(executor.map(_run_window, *zip(*tasks), [options]*len(tasks)))
+    _init_worker(None)
+
+    res = {key: pd.concat([output[key] for output in outputs]) for key in outputs[0].keys()}
+    res["opf"].insert(0, "window", np.repeat(np.arange(len(windows)), [len(window) for window in
+                                                                         windows]))
+    n_failed = (~res["opf"].converged).sum()
+    if n_failed:
+        logger.warning(f"The OPF did not converge for {n_failed} of {len(time_steps)} time steps.")
+    return res
+
+
+def set_opf_time_step(net:pp.pandapowerNet, time_step:int, profiles:dict[str, pd.DataFrame],
+                      curtailment:bool=False, vde_q_limits:bool=True) -> None:
+    """Sets the profile values of the time step and the OPF limits which depend on it: the
+    active power of controllable sgens is limited by the profile value (and fixed, if not
+    curtailment), their reactive power limits follow the VDE Q(P) dependency, and limits given
+    as profiles (cf. OPF_LIMIT_COLUMNS) are set last.
+    """
+    et_cols = {key: tuple(get_et_col(key)) for key in profiles.keys()}
+    limit_keys = [key for key, (et, col) in et_cols.items() if col in OPF_LIMIT_COLUMNS]
+    set_time_step(net, time_step, {key: df for key, df in profiles.items() if key not in
+                                   limit_keys})
+    # downcasted profiles (cf. downcast_profiles()) let the interior point solver fail
+    for et, col in et_cols.values():
+        if col in net[et].columns:
+            net[et][col] = net[et][col].astype(np.float64)
+    if vde_q_limits:
+        set_sgen_limits(net, fixed_p=False)
+    else:
+        net.sgen["min_p_mw"] = 0.
+        net.sgen["max_p_mw"] = net.sgen.p_mw
+    net.sgen["min_p_mw"] = (net.sgen.p_mw if not curtailment else net.sgen.min_p_mw).astype(
+        float)
+    set_time_step(net, time_step, {key: profiles[key] for key in limit_keys})
+    for key in limit_keys:
+        et, col = et_cols[key]
+        net[et][col] = net[et][col].astype(np.float64)
+
+
+def _init_worker(net:pp.pandapowerNet|None) -> None:
+    global _net
+    _net = net
+
+
+def _run_window(profiles:dict[str, pd.DataFrame], window:list[int],
+                options:dict) -> dict[str, pd.DataFrame]:
+    runopp_kwargs = options["runopp_kwargs"]
+    status = pd.DataFrame({
+        "converged": np.zeros(len(window), dtype=bool), "objective": np.nan,
+        "warm_start": np.zeros(len(window), dtype=bool), "time_s": np.nan},
+        index=pd.Index(window, name="time_step"))
+    results = {(et, col): np.full((len(window), _net[et.replace("res_", "")].shape[0]), np.nan,
+                                  dtype=result_dtype(et, col)) for et, col in options[
+                                      "output_vals"]}
+    previous_converged = False
+    for i, time_step in enumerate(window):
+        start = time.perf_counter()
+        set_opf_time_step(_net, time_step, profiles, options["curtailment"],
+                          options["vde_q_limits"])
+        inits = ["results", None] if options["warm_start"] and previous_converged else [None]
+        for init in inits:
+            try:
+                pp.runopp(_net, **(runopp_kwargs if init is None else runopp_kwargs | {
+                    "init": init}))
+            except pp.OPFNotConverged:
+                continue
+            status.iat[i, 0] = True
+            status.iat[i, 1] = _net.res_cost
+            status.iat[i, 2] = init is not None
+            for (et, col), values in results.items():
+                values[i] = _net[et][col].values
+            break
+        status.iat[i, 3] = time.perf_counter() - start
+        previous_converged = status.iat[i, 0]
+
+    output = {"opf": status}
+    for (et, col), values in results.items():
+        output[f"{et}.{col}"] = pd.DataFrame(values, index=status.index,
+                                             columns=_net[et.replace("res_", "")].index)
+    return output
@@ -0,0 +1,233 @@
+import os
+from types import FunctionType
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from pandapower.io_utils import mkdirs_if_not_existent
+
+from SimBench_EHV_HV_excerpt.toolbox.reducers import Reducer, get_reducer
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CustomOutputWriter(pp.timeseries.OutputWriter):
+    """OutputWriter which can additionally reduce logged variables online over the time steps,
+    e.g. to the maximum line loading or to the number of time steps with voltage violations.
+    Variables which are only logged reduced do not allocate time steps x elements arrays. The
+    reduced results are provided as pandas Series with keys like "res_line.loading_percent.max".
+
+    Complete results are written into contiguous numpy arrays which are preallocated for all time
+    steps with the dtype given by result_dtype(), i.e. float32 for loadings, voltage magnitudes and
+    angles by default. At the end, the arrays are wrapped as DataFrames without copying.
+
+    Example
+    -------
+    >>> ow = CustomOutputWriter(net, time_steps)
+    >>> ow.log_reduced_variable("res_line", "loading_percent", ["max", ">100"])
+    >>> ow.log_reduced_variable("res_bus", "vm_pu", ["min", "max", "q0.05"])
+    >>> ow = CustomOutputWriter(net, time_steps, dtypes={"p_from_mw": np.float32})
+    """
+
+    def __init__(self, net, time_steps=None, output_path=None, output_file_type=".p",
+                 write_time=None, log_variables=None, csv_separator=";",
+                 dtypes:np.dtype|dict|None=None):
+        self.dtypes = dtypes
+        self._positions = dict()
+        self.reducers = dict()
+        self.keep_full = set()
+        self.requested_full = set()
+        super().__init__(net, time_steps=time_steps, output_path=output_path,
+                         output_file_type=output_file_type, write_time=write_time,
+                         log_variables=log_variables, csv_separator=csv_separator)
+
+    def log_variable(self, table, variable, index=None, eval_function=None, eval_name=None):
+        if eval_function is None:
+            self.requested_full.add((table, variable))
+            if (table, variable) in self.reducers:
+                self.keep_full.add((table, variable))
+        super().log_variable(table, variable, index=index, eval_function=eval_function,
+                             eval_name=eval_name)
+
+    def log_reduced_variable(self, table:str, variable:str,
+                             reducers:str|Reducer|list[str|Reducer]) -> None:
+        """Adds a variable which is reduced over the time steps during the simulation.
+
+        Parameters
+        ----------
+        table : str
+            result table, e.g. "res_line"
+        variable : str
+            column of the table, e.g. "loading_percent"
+        reducers : str | Reducer | list[str | Reducer]
+            reducers or short names of reducers, cf. get_reducer()
+
+        Note
+        ----
+        If the variable is additionally logged via log_variable(), the complete time series
+        results are kept as well. Default log variables, such as ("res_bus", "vm_pu"), are
+        replaced by the reduced logging.
+        """
+        if isinstance(reducers, (str, Reducer)):
+            reducers = [reducers]
+        if (table, variable) in self.requested_full:
+            self.keep_full.add((table, variable))
+        else:
+            self.log_variables = [log_args for log_args in self.log_variables if not (
+                log_args[0] == table and log_args[1] == variable)]
+            super().log_variable(table, variable)
+        self.reducers.setdefault((table, variable), list()).extend(
+            [get_reducer(reducer) for reducer in reducers])
+
+    def _is_reduced_only(self, partial_args) -> bool:
+        table, variable, _, _, eval_function, eval_name = partial_args
+        return eval_function is None and eval_name is None and \
+            (table, variable) in self.reducers and (table, variable) not in self.keep_full
+
+    def _init_np_array(self, partial_func):
+        table, variable, _, index, eval_function, eval_name = partial_func.args
+        if eval_function is not None or eval_name is not None:
+            return super()._init_np_array(partial_func)
+        hash_name = self._get_np_name(partial_func.args)
+        self._positions.pop((table, variable), None)
+        if self._is_reduced_only(partial_func.args):
+            self.np_results.pop(hash_name, None)
+        else:
+            # contiguous buffer for all time steps; filled row by row and wrapped without copy
+            self.np_results[hash_name] = np.zeros((len(self.time_steps), len(index)),
+                                                  dtype=self._result_dtype(table, variable))
+        for reducer in self.reducers.get((table, variable), list()):
+            reducer.reset(len(index))
+
+    def _result_dtype(self, table:str, variable:str) -> np.dtype:
+        return result_dtype(table, variable, self.dtypes)
+
+    def _values(self, net, table, variable, index) -> np.ndarray:
+        # positions of the logged elements are determined once per variable and length of the table
+        # instead of comparing the indices in every time step
+        n_rows = net[table].shape[0]
+        key = (table, variable)
+        if key not in self._positions or self._positions[key][0] != n_rows or \
+                self._positions[key][1] is not index:
+            if net[table].index.equals(pd.Index(index)):
+                positions = None
+            else:
+                positions = net[table].index.get_indexer(index)
+                if np.any(positions < 0):
+                    raise KeyError(f"{table} has no rows for all of the logged index.")
+            self._positions[key] = (n_rows, index, positions)
+        positions = self._positions[key][2]
+        values = net[table][variable].values
+        return values if positions is None else values[positions]
+
+    def _log(self, table, variable, net, index, eval_function=None, eval_name=None):
+        if eval_function is not None or eval_name is not None:
+            return super()._log(table, variable, net, index, eval_function, eval_name)
+        try:
+            result = self._values(net, table, variable, index)
+            for reducer in self.reducers.get((table, variable), list()):
+                reducer.update(result)
+            buffer = self.np_results.get(self._get_output_name(table, variable), None)
+            if buffer is not None:
+                buffer[self.time_step_lookup[self.time_step]] = result
+        except Exception as e:
+            logger.error("Error at index %s for %s[%s]: %s" % (index, table, variable, e))
+
+    def _full_output_list(self) -> list:
+        return [partial_func for partial_func in self.output_list if not isinstance(
+            partial_func, tuple) and not self._is_reduced_only(partial_func.args)]
+
+    def _get_reduced_name(self, table, variable, reducer):
+        return f"{self._get_output_name(table, variable)}.{reducer.name}"
+
+    def _np_to_pd(self):
+        # wraps the numpy arrays into DataFrames without copying them
+        for partial_func in self.output_list:
+            if isinstance(partial_func, tuple):
+                continue
+            table, variable, _, index, eval_function, eval_name = partial_func.args
+            res_name = self._get_output_name(table, variable)
+            np_name = self._get_np_name(partial_func.args)
+            if np_name in self.np_results.keys():
+                columns = index
+                if eval_name is not None and eval_function is not None:
+                    if not isinstance(eval_function, FunctionType) or \
+                            "n_columns" not in eval_function.__code__.co_varnames:
+                        columns = [eval_name]
+                res_df = pd.DataFrame(self.np_results[np_name], index=self.time_steps,
+                                      columns=columns, copy=False)
+                if res_name in self.output and eval_name is not None:
+                    self.output[res_name] = pd.concat([self.output[res_name], res_df], axis=1,
+                                                      sort=False)
+                else:
+                    self.output[res_name] = res_df
+            if eval_function is not None or eval_name is not None:
+                continue
+            for reducer in self.reducers.get((table, variable), list()):
+                self.output[self._get_reduced_name(table, variable, reducer)] = pd.Series(
+                    reducer.result(), index=index, name=res_name)
+
+    def _save_separate(self, append):
+        output_list = self.output_list
+        self.output_list = self._full_output_list()
+        try:
+            super()._save_separate(append)
+        finally:
+            self.output_list = output_list
+
+        for (table, variable), reducers in self.reducers.items():
+            folder = os.path.join(self.output_path, table)
+            mkdirs_if_not_existent(folder)
+            for reducer in reducers:
+                data = self.output[self._get_reduced_name(table, variable, reducer)]
+                file_path = os.path.join(folder, f"{variable}.{reducer.name}" +
+                                         self.output_file_type)
+                if self.output_file_type == ".json":
+                    data.to_json(file_path)
+                elif self.output_file_type == ".p":
+                    data.to_pickle(file_path)
+                elif self.output_file_type in [".xls", ".xlsx"]:
+                    data.to_excel(file_path)
+                elif "csv" in self.output_file_type.split("."):
+                    data.to_csv(file_path, sep=self.csv_separator)
+
+
+def result_dtype(table:str, variable:str, dtypes:np.dtype|dict|None=None) -> np.dtype:
+    """Returns the dtype of the arrays in which time series results are stored.
+
+    Parameters
+    ----------
+    table : str
+        result table, e.g. "res_line"
+    variable : str
+        column of the table, e.g. "loading_percent"
+    dtypes : np.dtype | dict | None, optional
+        dtype for all variables or dict of dtypes for variables (e.g. "vm_pu") or for specific
+        tables and variables (e.g. "res_bus.vm_pu") which overrules the defaults, by default None
+
+    Returns
+    -------
+    np.dtype
+        dtype to be applied
+
+    Example
+    -------
+    >>> result_dtype("res_line", "loading_percent")
+    dtype('float32')
+    >>> result_dtype("res_line", "p_from_mw")
+    dtype('float64')
+    >>> result_dtype("res_bus", "vm_pu", {"res_bus.vm_pu": np.float64})
+    dtype('float64')
+    """
+    if dtypes is not None and not isinstance(dtypes, dict):
+        return np.dtype(dtypes)
+    dtypes = dict() if dtypes is None else dtypes
+    for key in [f"{table}.{variable}", variable]:
+        if key in dtypes.keys():
+            return np.dtype(dtypes[key])
+    return np.dtype(np.float32 if variable in ["loading_percent", "vm_pu", "va_degree"] else
+                    np.float64)
@@ -1,12 +1,23 @@
+import json
 import os
 import shutil
+import tempfile
 from itertools import product
+from typing import Iterator, TYPE_CHECKING
 import numpy as np
 import pandas as pd
-import pandapower as pp
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from SimBench_EHV_HV_excerpt import data_path
-from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import set_time_step
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps, profiles_index
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import fingerprint, replace_folder
+from SimBench_EHV_HV_excerpt.toolbox.profile_statistics import Profiles
+
+# pandapower and simbench are imported by the functions which need them, so that processes which
+# only read profiles do not import them
+if TYPE_CHECKING:
+    import pandapower as pp
 
 try:
     import pandaplan.core.pplog as logging
@@ -15,6 +26,10 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+_ENCODING_KEY = b"SimBench_EHV_HV_excerpt.encoding"
+# file of the critical time step index stored next to the profile folders, cf. export_net()
+CRITICAL_TIME_STEPS_FILE = "critical_time_steps.parquet"
+
 
 def check_file_existence(file):
     if not os.path.exists(file):
@@ -28,60 +43,117 @@ def check_file_existence(file):
 
 
 def add_profiles_from_parquet_to_net(
-        net:pp.pandapowerNet,
-        time_steps:bool|list[int]|np.ndarray|pd.Index,
+        net:"pp.pandapowerNet",
+        time_steps:bool|list[int]|np.ndarray|pd.Index|TimeSteps,
         always_set_time_step:bool,
         profiles_folder:str|None=None,
+        generate_missing:bool=True,
+        simbench_profiles_folder:str|None=None,
         **kwargs) -> None:
-    """Reads time series profile data from parquet files and adds the data to net.profiles
+    """Reads time series profile data from parquet files and adds the data to net.profiles, a
+    Profiles dict which holds the profile_statistics() of the read DataFrames. If the profiles
+    folder contains a CRITICAL_TIME_STEPS_FILE, the stored CriticalTimeStepIndex is attached as
+    net.profiles.critical_time_steps, cf. critical_time_step_index(). The index of the bundled
+    and generated profiles (profiles_folder None) is computed at its first use and cached next
+    to the generated profiles.
 
     Parameters
     ----------
     net : pp.pandapowerNet
         net to be filled with profile data
-    time_steps : bool | list[int] | np.ndarray | pd.Index
-        time_steps that should be provided. If True, the whole year is provided, if False, no
-        profile data is provided
+    time_steps : bool | list[int] | np.ndarray | pd.Index | TimeSteps
+        time_steps that should be provided (in the given order), e.g. TimeSteps.every(4). If True,
+        the whole year is provided, if False, no profile data is provided
     always_set_time_step : bool
         decides whether profiles data should always be set to element tables, e.g. net.sgen.p_mw,
         even if time_steps starts with 0 (in that case, setting the time step is usually not needed)
     profiles_folder : str | None, optional
         Folder with profiles data. If None, this repositories data_path is used, by default None
+    generate_missing : bool, optional
+        If True, missing files of load and sgen profiles, e.g. the rest of the year which is not
+        bundled with this repository, are generated from SimBench's relative profiles and cached,
+        cf. simbench_profile_files(), by default True
+    simbench_profiles_folder : str | None, optional
+        cache folder of the generated profiles. If None, simbench_profiles_cache is used,
+        by default None
     """
 
-    if time_steps is False or (not isinstance(time_steps, bool) and not len(time_steps)):
+    from SimBench_EHV_HV_excerpt.toolbox.critical_time_steps import CriticalTimeStepIndex
+    from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import set_time_step
+    from SimBench_EHV_HV_excerpt.toolbox.simbench_profiles import SIMBENCH_PROFILE_KEYS, \
+        simbench_profile_files, simbench_profiles_cache
+
+    if time_steps is False or (not isinstance(time_steps, (bool, TimeSteps)) and not len(
+            time_steps)):
         return  # nothing to do
+    selector = TimeSteps(time_steps)
 
     folders, stored_time_steps = _folders_and_time_steps(profiles_folder=profiles_folder)
 
-    folders = [folder for folder, time_stepss in zip(folders, stored_time_steps) if pd.Series(
-        time_steps).isin(time_stepss).any()]
+    if not selector.is_mask:  # masks refer to the positions of the profiles to be read
+        selected = selector.resolve(pd.RangeIndex(stored_time_steps[0].start,
+                                                  stored_time_steps[-1].stop))
+        if not len(selected):
+            return  # nothing to do
+        folders = [folder for folder, time_stepss in zip(folders, stored_time_steps) if
+                   selected.isin(time_stepss).any()]
 
+    folder_time_steps = dict(zip(*_folders_and_time_steps(profiles_folder=profiles_folder)))
     filenames = os.listdir(folders[0])
+    if generate_missing:  # keys of all folders, e.g. load profiles only bundled for two days
+        filenames = sorted(set().union(*[os.listdir(folder) for folder in folder_time_steps if
+                                         os.path.isdir(folder)]))
+        generated_files = dict()
+        for folder in folders:
+            missing = [filename.replace(".parquet", "") for filename in filenames if not
+                       os.path.exists(os.path.join(folder, filename))]
+            generated_files[folder] = simbench_profile_files(
+                net, [key for key in missing if key in SIMBENCH_PROFILE_KEYS],
+                folder_time_steps[folder], cache_folder=simbench_profiles_folder)
     profiles = dict()
+    files = list()
     for filename, folder in product(filenames, folders):
         file = os.path.join(folder, filename)
         key = filename.replace(".parquet", "")
+        if generate_missing and not os.path.exists(file) and key in SIMBENCH_PROFILE_KEYS:
+            file = generated_files[folder][key]
         check_file_existence(file)
+        files.append((file, os.path.getmtime(file)))
         if key not in profiles:
-            profiles[key] = pd.read_parquet(file, **kwargs)
+            profiles[key] = read_profile_parquet(file, **kwargs)
         else:
-            profiles[key] = pd.concat([profiles[key], pd.read_parquet(file, **kwargs)])
+            profiles[key] = pd.concat([profiles[key], read_profile_parquet(file, **kwargs)])
 
-    net.profiles = profiles
+    net.profiles = Profiles(profiles)
 
-    if time_steps is not True:
-        reduce_profiles_by_time_steps(net.profiles, time_steps)
+    if not selector.is_all:
+        reduce_profiles_by_time_steps(net.profiles, selector)
+    net.profiles.compute_statistics()
+    if profiles_folder is not None:
+        index_file = os.path.join(profiles_folder, CRITICAL_TIME_STEPS_FILE)
+        if os.path.isfile(index_file):
+            net.profiles.critical_time_steps = CriticalTimeStepIndex.from_parquet(index_file)
+    else:  # the index of the read files and time steps is cached at its first computation
+        fp = fingerprint([files, profiles_index(net.profiles)])
+        net.profiles.critical_time_steps_cache = os.path.join(
+            simbench_profiles_cache if simbench_profiles_folder is None else
+            simbench_profiles_folder, f"critical_time_steps-{fp[:16]}")
 
-    if always_set_time_step or (time_steps is not True and time_steps[0] != 0):
-        set_time_step(net, time_steps[0])
+    first_time_step = profiles_index(net.profiles)[0]
+    if always_set_time_step or (not selector.is_all and first_time_step != 0):
+        set_time_step(net, first_time_step)
 
 
 def store_profiles_to_parquet_files(
         profiles:dict[str, pd.DataFrame], profiles_folder:str, except_permission_error:bool=False,
-        **kwargs) -> None:
+        upsert:bool=False, encoded_keys:list[str]|bool|None=None, **kwargs) -> None:
     """Generates parquet files for each DataFrame of a dictionary
 
+    Each folder of profiles_folder is written to a staging folder first which then replaces the
+    folder. Thus, a reader never finds a partially written folder and an interrupted call leaves
+    the former files unchanged. A CRITICAL_TIME_STEPS_FILE of profiles_folder is removed since it
+    may not match the new profiles, cf. export_net() which stores a new one.
+
     Parameters
     ----------
     profiles : dict[str, pd.DataFrame]
@@ -89,38 +161,239 @@ def store_profiles_to_parquet_files(
     profiles_folder : str
         path to the folders of the parquet files to be written
     except_permission_error : bool, optional
-        whether to raise an error if a file cannot be removed due to missing permission rights,
-        by default False
+        whether to raise an error if a folder cannot be replaced due to missing permission rights.
+        If True, the files are replaced one by one instead, by default False
+    upsert : bool, optional
+        If False, all existing files are removed. If True, only the time steps of the given
+        profiles are replaced or appended in the existing files while other keys, folders and
+        time steps remain unchanged, by default False
+    encoded_keys : list[str] | bool | None, optional
+        keys of profiles which are stored run-length encoded, e.g. ["gen.vm_pu"], cf.
+        write_profile_parquet(). If True, all keys are encoded. Constant columns, e.g. of sgens
+        without power injection, are then stored as one value, by default None
 
     Optional Parameters
     -------------------
     kwars
         key word arguments for pandas' to_parquet() function
+
+    Example
+    -------
+    >>> # update one week of sgen.p_mw without rewriting the year
+    >>> store_profiles_to_parquet_files(
+    ...     {"sgen.p_mw": net.profiles["sgen.p_mw"].loc[range(96*7, 96*14)]}, folder, upsert=True)
     """
     folders, time_steps = _folders_and_time_steps(profiles_folder=profiles_folder)
+    for folder, time_stepss in zip(folders, time_steps):
+        keys = [key for key, df in profiles.items() if not upsert or df.index.isin(
+            time_stepss).any()]
+        if upsert and not len(keys):
+            continue  # nothing to update in this folder
+        os.makedirs(os.path.dirname(os.path.abspath(folder)), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(folder)),
+                                   prefix=f".{os.path.basename(folder)}_staging_")
+        try:
+            # files of keys which are not updated are hard linked (or copied) to the staging folder
+            if upsert and os.path.isdir(folder):
+                for filename in os.listdir(folder):
+                    if filename.replace(".parquet", "") not in keys:
+                        _link_or_copy(os.path.join(folder, filename),
+                                      os.path.join(staging, filename))
+
+            # write files
+            for key in keys:
+                df = profiles[key]
+                to_store = df.loc[df.index.isin(time_stepss)]
+                file = os.path.join(folder, f"{key}.parquet")
+                if upsert and os.path.isfile(file):
+                    to_store = _upsert(read_profile_parquet(file), to_store, key)
+                encode = encoded_keys is True or (not isinstance(encoded_keys, bool) and
+                                                  encoded_keys is not None and key in encoded_keys)
+                write_profile_parquet(to_store, os.path.join(staging, f"{key}.parquet"),
+                                      encoding="run_length" if encode else None, **kwargs)
 
-    # clean up folders
-    for folder in folders:
-        if os.path.exists(folder) and os.path.isdir(folder):
             try:
-                shutil.rmtree(folder)
-                os.mkdir(folder)
+                replace_folder(staging, folder)
             except PermissionError as e:
                 if not except_permission_error:
                     raise PermissionError(e)
-                else:
-                    logger.info(e)
-        elif os.path.exists(folder):
-            os.remove(folder)
-            os.makedirs(folder)
-        else:
-            os.makedirs(folder)
+                logger.info(e)
+                _replace_files(staging, folder, remove_others=not upsert)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    index_file = os.path.join(profiles_folder, CRITICAL_TIME_STEPS_FILE)
+    if os.path.isfile(index_file):
+        os.remove(index_file)
+
 
-    # write files
-    for key, df in profiles.items():
-        for folder, time_stepss in zip(folders, time_steps):
-            to_store = df.loc[df.index.isin(time_stepss)]
-            to_store.to_parquet(os.path.join(folder, f"{key}.parquet"), **kwargs)
+def write_profile_parquet(df:pd.DataFrame, file:str, encoding:str|None=None, **kwargs) -> None:
+    """Writes a profile DataFrame (time steps x elements) to a parquet file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        profile data with the same dtype in all columns
+    file : str
+        parquet file to write
+    encoding : str | None, optional
+        If "run_length", each column is stored as runs of constant values (run length and value),
+        which shrinks step-like profiles such as gen.vm_pu. The file is decoded losslessly by
+        read_profile_parquet(). If None, the DataFrame is stored as is, by default None
+
+    Optional Parameters
+    -------------------
+    kwars
+        key word arguments for pyarrow's write_table() (if encoded) or pandas' to_parquet()
+    """
+    if encoding is None:
+        df.to_parquet(file, **kwargs)
+    elif encoding == "run_length":
+        table, meta = _run_length_encode(df)
+        table = table.replace_schema_metadata({**table.schema.metadata, _ENCODING_KEY: json.dumps(
+            meta).encode()})
+        pq.write_table(table, file, **kwargs)
+    else:
+        raise ValueError(f"{encoding=} is unknown. Use None or 'run_length'.")
+
+
+def read_profile_parquet(file:str, **kwargs) -> pd.DataFrame:
+    """Reads a profile DataFrame from a parquet file written by write_profile_parquet(),
+    decoding run-length encoded files.
+
+    Optional Parameters
+    -------------------
+    kwars
+        key word arguments for pandas' read_parquet() function. If the file is encoded, only
+        "columns" is considered.
+    """
+    meta = pq.read_schema(file).metadata
+    if meta is None or _ENCODING_KEY not in meta.keys():
+        return pd.read_parquet(file, **kwargs)
+    df = _run_length_decode(pd.read_parquet(file), json.loads(meta[_ENCODING_KEY]))
+    return df if kwargs.get("columns", None) is None else df[kwargs["columns"]]
+
+
+def iter_profile_parquet(
+        net:"pp.pandapowerNet",
+        key:str,
+        batch_size:int=96*7,
+        columns:list|None=None,
+        profiles_folder:str|None=None,
+        generate_missing:bool=True,
+        simbench_profiles_folder:str|None=None
+    ) -> Iterator[pd.DataFrame]:
+    """Yields the profiles of one key, e.g. "load.p_mw", of the whole year in batches of
+    consecutive time steps, read straight from the parquet files which
+    add_profiles_from_parquet_to_net() would read. Thus, only one batch is held in memory.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net whose element indices refer to the profiles, needed to generate missing files
+    key : str
+        profile key, e.g. "load.p_mw"
+    batch_size : int, optional
+        maximum number of time steps per batch, by default 96*7
+    columns : list | None, optional
+        columns to read, by default all
+    profiles_folder : str | None, optional
+        Folder with profiles data. If None, this repositories data_path is used, by default None
+    generate_missing : bool, optional
+        If True, missing files of load and sgen profiles are generated from SimBench's relative
+        profiles and cached, cf. simbench_profile_files(), by default True
+    simbench_profiles_folder : str | None, optional
+        cache folder of the generated profiles, by default None
+
+    Yields
+    ------
+    pd.DataFrame
+        profiles of a batch of time steps (time steps x elements)
+    """
+    from SimBench_EHV_HV_excerpt.toolbox.simbench_profiles import SIMBENCH_PROFILE_KEYS, \
+        simbench_profile_files
+
+    for folder, time_steps in zip(*_folders_and_time_steps(profiles_folder=profiles_folder)):
+        file = os.path.join(folder, f"{key}.parquet")
+        if not os.path.exists(file) and generate_missing and key in SIMBENCH_PROFILE_KEYS:
+            file = simbench_profile_files(net, [key], time_steps,
+                                          cache_folder=simbench_profiles_folder)[key]
+        check_file_existence(file)
+        meta = pq.read_schema(file).metadata
+        if meta is not None and _ENCODING_KEY in meta.keys():  # encoded files are decoded at once
+            df = read_profile_parquet(file, columns=columns)
+            for start in range(0, df.shape[0], batch_size):
+                yield df.iloc[start:start+batch_size]
+            continue
+        parquet_file = pq.ParquetFile(file)
+        str_columns = None if columns is None else [str(col) for col in columns]
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=str_columns,
+                                               use_pandas_metadata=True):
+            yield batch.to_pandas()
+
+
+def _run_length_encode(df:pd.DataFrame) -> tuple[pa.Table, dict]:
+    if len(set(df.dtypes.astype(str))) > 1:
+        raise ValueError("Only DataFrames with the same dtype in all columns can be run-length "
+                         "encoded.")
+    n_rows = df.shape[0]
+    values = df.values.T.ravel()  # column by column
+    starts = np.ones(values.size, dtype=bool)
+    starts[1:] = ~((values[1:] == values[:-1]) | (pd.isnull(values[1:]) & pd.isnull(values[:-1])))
+    starts[::max(n_rows, 1)] = True  # each column starts a new run
+    positions = np.flatnonzero(starts)
+    table = pa.Table.from_pandas(pd.DataFrame({
+        "run": np.diff(np.append(positions, values.size)).astype(np.int32),
+        "value": values[positions]}), preserve_index=False)
+
+    index = df.index
+    is_range = len(index) > 1 and pd.api.types.is_integer_dtype(index) and \
+        index.equals(pd.RangeIndex(index[0], index[0] + len(index)))
+    meta = {"encoding": "run_length", "n_rows": n_rows,
+            "index": {"start": int(index[0]), "stop": int(index[-1]) + 1} if is_range else
+            index.tolist(), "range_index": isinstance(index, pd.RangeIndex),
+            "index_dtype": str(index.dtype), "index_name": index.name,
+            "columns": df.columns.tolist(), "columns_dtype": str(df.columns.dtype),
+            "columns_name": df.columns.name}
+    return table, meta
+
+
+def _run_length_decode(runs:pd.DataFrame, meta:dict) -> pd.DataFrame:
+    n_rows = meta["n_rows"]
+    columns = pd.Index(meta["columns"], dtype=meta["columns_dtype"], name=meta["columns_name"])
+    values = np.repeat(runs["value"].values, runs["run"].values).reshape(len(columns), n_rows).T
+    if isinstance(meta["index"], dict):
+        index = pd.RangeIndex(meta["index"]["start"], meta["index"]["stop"], name=meta[
+            "index_name"])
+        if not meta["range_index"]:
+            index = pd.Index(index.values, dtype=meta["index_dtype"], name=meta["index_name"])
+    else:
+        index = pd.Index(meta["index"], dtype=meta["index_dtype"], name=meta["index_name"])
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def _upsert(existing:pd.DataFrame, new:pd.DataFrame, key:str) -> pd.DataFrame:
+    """Replaces the time steps of new in existing and appends the other time steps of new."""
+    if not existing.columns.equals(new.columns):
+        raise ValueError(f"The columns of the profiles '{key}' differ from the existing ones. "
+                         "Use upsert=False to replace the files.")
+    return pd.concat([existing.loc[~existing.index.isin(new.index)], new]).sort_index()
+
+
+def _link_or_copy(src:str, dst:str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _replace_files(src_folder:str, dst_folder:str, remove_others:bool) -> None:
+    os.makedirs(dst_folder, exist_ok=True)
+    filenames = os.listdir(src_folder)
+    for filename in filenames:
+        os.replace(os.path.join(src_folder, filename), os.path.join(dst_folder, filename))
+    if remove_others:
+        for filename in set(os.listdir(dst_folder)) - set(filenames):
+            os.remove(os.path.join(dst_folder, filename))
 
 
 def _folders_and_time_steps(profiles_folder:str|None=None) -> tuple[list[str], list]:
@@ -134,10 +407,11 @@ def _folders_and_time_steps(profiles_folder:str|None=None) -> tuple[list[str], l
 
 def reduce_profiles_by_time_steps(
         profiles:dict[str, pd.DataFrame],
-        time_steps:list[int]|np.ndarray|pd.Index
+        time_steps:list[int]|np.ndarray|pd.Index|TimeSteps
         ) -> None:
-
+    """Reduces the profiles to the given time steps in the given order, cf. TimeSteps. Ranges and
+    equidistant time steps result in views of the former profiles."""
+    selector = TimeSteps(time_steps)
     for key in profiles.keys():
         if profiles[key].shape[0]:
-            idx = profiles[key].index.intersection(set(time_steps))
-            profiles[key] = profiles[key].loc[idx]
+            profiles[key] = selector.select(profiles[key])
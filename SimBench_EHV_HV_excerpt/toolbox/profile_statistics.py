@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+
+def profile_statistics(df:pd.DataFrame, tol:float=1e-4) -> pd.DataFrame:
+    """Returns statistics per column of a profile DataFrame (time steps x elements), computed in
+    one vectorized pass.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        profile data
+    tol : float, optional
+        absolute values up to tol are considered as zero, by default 1e-4
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per column of df with the columns
+            "constant" -> whether all values equal the first one;
+            "value" -> first value;
+            "active" -> whether any absolute value exceeds tol;
+            "nonzero_share" -> share of time steps with absolute values exceeding tol
+    """
+    values = df.values
+    if not values.shape[0]:
+        return pd.DataFrame({"constant": True, "value": np.nan, "active": False,
+                             "nonzero_share": 0.}, index=df.columns)
+    nonzero = np.abs(values) > tol
+    return pd.DataFrame({
+        "constant": (values == values[0]).all(axis=0),
+        "value": values[0],
+        "active": nonzero.any(axis=0),
+        "nonzero_share": nonzero.mean(axis=0),
+    }, index=df.columns)
+
+
+def active_columns(df:pd.DataFrame, tol:float=1e-4) -> pd.Index:
+    """Returns the columns of a profile DataFrame with any absolute value exceeding tol, e.g. the
+    sgens with power injection. For profiles of a net, Profiles.active_columns() reuses the
+    statistics computed when the profiles were loaded."""
+    return df.columns[(np.abs(df.values) > tol).any(axis=0)]
+
+
+class Profiles(dict):
+    """Dict of profiles (key -> DataFrame of time steps x elements), e.g. net.profiles, which
+    holds the profile_statistics() of its DataFrames. The statistics are computed once, e.g. by
+    add_profiles_from_parquet_to_net() when the profiles are loaded, and reused by repeated
+    queries such as add_control_strategy() for multiple scenarios. Besides, it holds the
+    CriticalTimeStepIndex stored next to the profile files as critical_time_steps and, for
+    profiles without a stored index, the path prefix of the cache file of the index computed at
+    its first use as critical_time_steps_cache, cf. critical_time_step_index(). Replacing or
+    removing a DataFrame invalidates its statistics and both critical time step attributes.
+    Inplace changes of values do not. Copies, deep copies and pickles keep all of them.
+
+    The DataFrames stay dense: all-zero and constant columns are identified by the statistics
+    (e.g. active_columns()) but not stored as scalars, since pandas consolidates such columns
+    into the dense block of the DataFrame and sparse columns slow down the row access of
+    set_time_step() and the controllers. Constant columns are stored as one value in parquet
+    files written with encoded_keys=True, cf. store_profiles_to_parquet_files().
+
+    Example
+    -------
+    >>> net.profiles = Profiles(profiles)
+    >>> net.profiles.compute_statistics()
+    >>> net.profiles.active_columns("sgen.p_mw")
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statistics = dict()
+        self.critical_time_steps = None
+        self.critical_time_steps_cache = None
+        if len(args) and isinstance(args[0], Profiles):  # reuse the statistics of the same data
+            self._statistics = {stats_key: entry for stats_key, entry in args[
+                0]._statistics.items() if entry[0] is self.get(stats_key[0], None)}
+            if self.keys() == args[0].keys() and all(self[key] is df for key, df in args[
+                    0].items()):
+                self.critical_time_steps = args[0].critical_time_steps
+                self.critical_time_steps_cache = args[0].critical_time_steps_cache
+
+    def __reduce__(self):
+        # the items are passed to the constructor, so that restoring them by __setitem__() does
+        # not invalidate the restored statistics and critical time step index (deepcopy, pickle)
+        return self.__class__, (dict(self),), self.__dict__.copy()
+
+    def __setitem__(self, key, value):
+        self._invalidate(key, value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._invalidate(key)
+        super().__delitem__(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *args):
+        self._invalidate(key)
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._invalidate(key)
+        return key, value
+
+    def clear(self):
+        self._statistics = dict()
+        self.critical_time_steps = None
+        self.critical_time_steps_cache = None
+        super().clear()
+
+    def setdefault(self, key, default=None):
+        if key not in self.keys():
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def copy(self):
+        """Returns a shallow copy which shares the DataFrames, their statistics and the critical
+        time step index."""
+        return Profiles(self)
+
+    def compute_statistics(self, keys:list[str]|None=None, tol:float=1e-4) -> None:
+        """Computes the profile_statistics() of the given keys (by default of all keys) which are
+        not available yet."""
+        for key in self.keys() if keys is None else keys:
+            self.statistics(key, tol=tol)
+
+    def statistics(self, key:str, tol:float=1e-4) -> pd.DataFrame:
+        """Returns the profile_statistics() of the DataFrame of the key, computed at the first
+        query after the DataFrame was set."""
+        entry = self._statistics.get((key, tol), None)
+        if entry is None or entry[0] is not self[key]:
+            entry = (self[key], profile_statistics(self[key], tol=tol))
+            self._statistics[(key, tol)] = entry
+        return entry[1]
+
+    def active_columns(self, key:str, tol:float=1e-4) -> pd.Index:
+        """Returns the active columns of the DataFrame of the key, cf. active_columns()."""
+        stats = self.statistics(key, tol=tol)
+        return stats.index[stats.active.values]
+
+    def _invalidate(self, key, value=None) -> None:
+        statistics = getattr(self, "_statistics", None)  # not set yet while unpickling
+        if statistics is None:
+            return
+        if key not in self.keys() or self[key] is not value:
+            self.critical_time_steps = None
+            self.critical_time_steps_cache = None
+        for stats_key in [stats_key for stats_key, entry in statistics.items() if stats_key[
+                0] == key and entry[0] is not value]:
+            del statistics[stats_key]
@@ -0,0 +1,302 @@
+import numpy as np
+import pandas as pd
+
+
+class Reducer:
+    """Base class of online reducers which aggregate time series results over the time steps.
+    Each reducer keeps a state of O(n_columns) memory and is updated once per time step.
+    """
+    name = ""
+
+    def reset(self, n_columns:int) -> None:
+        raise NotImplementedError()
+
+    def update(self, values:np.ndarray) -> None:
+        """Updates the state by the values (one per column) of one time step."""
+        raise NotImplementedError()
+
+    def update_block(self, values:np.ndarray) -> None:
+        """Updates the state by a block of values (time steps x columns)."""
+        for row in np.asarray(values, dtype=float):
+            self.update(row)
+
+    def result(self) -> np.ndarray:
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}('{self.name}')"
+
+
+class Max(Reducer):
+    name = "max"
+
+    def reset(self, n_columns):
+        self.state = np.full(n_columns, np.nan)
+
+    def update(self, values):
+        np.fmax(self.state, values, out=self.state)
+
+    def update_block(self, values):
+        if len(values):
+            self.update(np.fmax.reduce(np.asarray(values, dtype=float), axis=0))
+
+    def result(self):
+        return self.state.copy()
+
+
+class Min(Reducer):
+    name = "min"
+
+    def reset(self, n_columns):
+        self.state = np.full(n_columns, np.nan)
+
+    def update(self, values):
+        np.fmin(self.state, values, out=self.state)
+
+    def update_block(self, values):
+        if len(values):
+            self.update(np.fmin.reduce(np.asarray(values, dtype=float), axis=0))
+
+    def result(self):
+        return self.state.copy()
+
+
+class Sum(Reducer):
+    name = "sum"
+
+    def reset(self, n_columns):
+        self.state = np.zeros(n_columns)
+        self.count = np.zeros(n_columns, dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        is_num = ~np.isnan(values)
+        self.state += np.where(is_num, values, 0.)
+        self.count += is_num
+
+    def update_block(self, values):
+        values = np.asarray(values, dtype=float)
+        is_num = ~np.isnan(values)
+        self.state += np.where(is_num, values, 0.).sum(axis=0)
+        self.count += is_num.sum(axis=0)
+
+    def result(self):
+        return self.state.copy()
+
+
+class Mean(Sum):
+    name = "mean"
+
+    def result(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > 0, self.state / self.count, np.nan)
+
+
+class Exceedance(Reducer):
+    """Counts the time steps in which the values exceed (lower=False) or fall below (lower=True) a
+    given threshold.
+    """
+
+    def __init__(self, threshold:float, lower:bool=False):
+        self.threshold = threshold
+        self.lower = lower
+        self.name = f"{'lt' if lower else 'gt'}{threshold:g}"
+
+    def reset(self, n_columns):
+        self.state = np.zeros(n_columns, dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.state += values < self.threshold if self.lower else values > self.threshold
+
+    def update_block(self, values):
+        values = np.asarray(values, dtype=float)
+        self.state += (values < self.threshold if self.lower else values > self.threshold).sum(
+            axis=0)
+
+    def result(self):
+        return self.state.copy()
+
+
+class Quantile(Reducer):
+    """Estimates a quantile per column by the P² algorithm (Jain & Chlamtac, 1985) which needs
+    five markers per column instead of storing all values. The estimation is vectorized over the
+    columns.
+    """
+
+    def __init__(self, q:float):
+        if not 0 < q < 1:
+            raise ValueError(f"The quantile must be in between 0 and 1, not {q=}.")
+        self.q = q
+        self.name = f"q{q:g}"
+        self.dn = np.array([0, q/2, q, (1+q)/2, 1])
+
+    def reset(self, n_columns):
+        q = self.q
+        self.count = np.zeros(n_columns, dtype=np.int64)
+        self.heights = np.full((5, n_columns), np.nan)
+        self.positions = np.repeat(np.arange(1., 6.)[:, None], n_columns, axis=1)
+        self.desired = np.repeat(np.array([1, 1+2*q, 1+4*q, 3+2*q, 5])[:, None], n_columns,
+                                 axis=1)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        is_num = ~np.isnan(values)
+
+        # --- fill the markers by the first five values
+        init = is_num & (self.count < 5)
+        if init.any():
+            cols = np.flatnonzero(init)
+            self.heights[self.count[cols], cols] = values[cols]
+            self.count[cols] += 1
+            full = cols[self.count[cols] == 5]
+            self.heights[:, full] = np.sort(self.heights[:, full], axis=0)
+
+        # --- P² update of the markers
+        run = is_num & ~init
+        if not run.any():
+            return
+        cols = np.flatnonzero(run)
+        x = values[cols]
+        h = self.heights[:, cols]
+        n = self.positions[:, cols]
+        nd = self.desired[:, cols]
+        h[0] = np.minimum(h[0], x)
+        h[4] = np.maximum(h[4], x)
+        k = (x[None, :] >= h[1:4]).sum(axis=0)
+        n += np.arange(5)[:, None] > k[None, :]
+        nd += self.dn[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i in range(1, 4):
+                d = nd[i] - n[i]
+                up = (d >= 1) & (n[i+1] - n[i] > 1)
+                down = (d <= -1) & (n[i-1] - n[i] < -1)
+                adjust = up | down
+                if not adjust.any():
+                    continue
+                s = np.where(up, 1., -1.)
+                parabolic = h[i] + s / (n[i+1] - n[i-1]) * (
+                    (n[i] - n[i-1] + s) * (h[i+1] - h[i]) / (n[i+1] - n[i]) +
+                    (n[i+1] - n[i] - s) * (h[i] - h[i-1]) / (n[i] - n[i-1]))
+                linear = h[i] + s * (np.where(up, h[i+1], h[i-1]) - h[i]) / (
+                    np.where(up, n[i+1], n[i-1]) - n[i])
+                new = np.where((h[i-1] < parabolic) & (parabolic < h[i+1]), parabolic, linear)
+                h[i] = np.where(adjust, new, h[i])
+                n[i] += np.where(adjust, s, 0.)
+        self.heights[:, cols] = h
+        self.positions[:, cols] = n
+        self.desired[:, cols] = nd
+        self.count[cols] += 1
+
+    def result(self):
+        res = self.heights[2].copy()
+        few = np.flatnonzero((self.count > 0) & (self.count < 5))
+        if len(few):
+            res[few] = np.nanquantile(self.heights[:, few], self.q, axis=0)
+        res[self.count == 0] = np.nan
+        return res
+
+
+def get_reducer(reducer:str|Reducer) -> Reducer:
+    """Returns a new Reducer object from a reducer or its short name.
+
+    Parameters
+    ----------
+    reducer : str | Reducer
+        Reducer object or short name. Possible short names are "max", "min", "sum", "mean",
+        quantiles like "q0.95" and threshold counters like ">100" or "<0.9"
+
+    Example
+    -------
+    >>> get_reducer(">100")
+    Exceedance('gt100')
+    """
+    if isinstance(reducer, Reducer):
+        return _copy_reducer(reducer)
+    if not isinstance(reducer, str):
+        raise TypeError(f"reducer is expected as str or Reducer, not as {type(reducer)}.")
+    simple = {"max": Max, "min": Min, "sum": Sum, "mean": Mean}
+    if reducer in simple.keys():
+        return simple[reducer]()
+    elif reducer[0] in [">", "<"]:
+        return Exceedance(float(reducer[1:]), lower=reducer[0] == "<")
+    elif reducer[0] == "q":
+        return Quantile(float(reducer[1:]))
+    raise ValueError(f"reducer '{reducer}' is unknown.")
+
+
+def _copy_reducer(reducer:Reducer) -> Reducer:
+    new = reducer.__class__.__new__(reducer.__class__)
+    new.__dict__.update({key: val for key, val in reducer.__dict__.items() if key not in [
+        "state", "count", "heights", "positions", "desired"]})
+    return new
+
+
+def split_output_vals(output_vals:list[tuple]) -> tuple[list[tuple[str, str]], dict]:
+    """Splits output_vals into variables to log completely and variables to reduce over the time
+    steps.
+
+    Parameters
+    ----------
+    output_vals : list[tuple]
+        list of tuples (table, variable) or (table, variable, reducers). reducers can be given as
+        single or as list of short names or Reducer objects, cf. get_reducer()
+
+    Returns
+    -------
+    tuple[list[tuple[str, str]], dict]
+        variables to log completely and dict of variables to reduce with lists of Reducer objects
+        as values
+
+    Example
+    -------
+    >>> split_output_vals([("res_bus", "vm_pu", ["min", "max"]), ("res_line", "loading_percent")])
+    ([('res_line', 'loading_percent')], {('res_bus', 'vm_pu'): [Min('min'), Max('max')]})
+    """
+    full = list()
+    reduced = dict()
+    for output_val in output_vals:
+        if len(output_val) == 2:
+            full.append(tuple(output_val))
+        elif len(output_val) == 3:
+            reducers = output_val[2]
+            if isinstance(reducers, (str, Reducer)):
+                reducers = [reducers]
+            reduced.setdefault(tuple(output_val[:2]), list()).extend(
+                [get_reducer(reducer) for reducer in reducers])
+        else:
+            raise ValueError(f"output_vals entries must have two or three items, not {output_val}.")
+    return full, reduced
+
+
+def reduce_results(res:dict, reduced:dict, keep_full:list[tuple[str, str]]|None=None) -> dict:
+    """Reduces complete time series results (time steps x elements) by the given reducers. The
+    complete results are removed from res unless they are in keep_full.
+
+    Parameters
+    ----------
+    res : dict
+        time series results with keys like "res_line.loading_percent"
+    reduced : dict
+        variables to reduce, cf. split_output_vals()
+    keep_full : list[tuple[str, str]] | None, optional
+        variables which should be kept completely in res, by default None
+
+    Returns
+    -------
+    dict
+        res with additional keys like "res_line.loading_percent.max"
+    """
+    keep_full = set() if keep_full is None else set(keep_full)
+    for (table, variable), reducers in reduced.items():
+        key = f"{table}.{variable}"
+        if key not in res.keys():
+            continue
+        df = res[key]
+        for reducer in reducers:
+            reducer.reset(df.shape[1])
+            reducer.update_block(df.values)
+            res[f"{key}.{reducer.name}"] = pd.Series(reducer.result(), index=df.columns, name=key)
+        if (table, variable) not in keep_full:
+            del res[key]
+    return res
@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import Artifact, ArtifactCache, fingerprint
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import profiles_index
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# profiles which describe the operating points by default
+REPRESENTATIVE_KEYS = ["load.p_mw", "sgen.p_mw", "gen.p_mw"]
+
+
+class RepresentativePeriods:
+    """Representative periods (e.g. days) of profiles together with their weights, i.e. the number
+    of periods they represent. Results of time series which are run for the representative time
+    steps only are mapped back to the full horizon via weighted_sum(), energy() or expand().
+
+    Parameters
+    ----------
+    index : pd.Index
+        time steps of the full horizon
+    period_length : int
+        number of time steps per period
+    medoids : np.ndarray
+        positions of the representative periods
+    labels : np.ndarray
+        position of the representative period (in medoids) of each clustered period
+    error : pd.DataFrame
+        approximation error per profile key, cf. representative_periods()
+    """
+
+    def __init__(self, index:pd.Index, period_length:int, medoids:np.ndarray, labels:np.ndarray,
+                 error:pd.DataFrame|None=None):
+        self.index = index
+        self.period_length = period_length
+        self.medoids = np.asarray(medoids)
+        self.labels = np.asarray(labels)
+        self.error = error
+
+        # time steps which are not part of a full period are represented proportionally
+        counts = np.bincount(self.labels, minlength=len(self.medoids)).astype(float)
+        counts *= len(index) / (len(self.labels) * period_length)
+        self.periods = pd.Index(self.medoids, name="period")
+        self.period_weights = pd.Series(counts, index=self.periods, name="weight")
+        self.assignment = pd.Series(self.medoids[self.labels], index=pd.RangeIndex(len(
+            self.labels), name="period"), name="representative_period")
+        positions = (self.medoids[:, None] * period_length + np.arange(period_length)).ravel()
+        self.time_steps = index[positions]
+        self.weights = pd.Series(np.repeat(counts, period_length), index=self.time_steps,
+                                 name="weight")
+
+    def __repr__(self) -> str:
+        return f"RepresentativePeriods({len(self.medoids)} of {len(self.labels)} periods of " + \
+            f"{self.period_length} time steps)"
+
+    def weighted_sum(self, results:pd.DataFrame|pd.Series) -> pd.Series|float:
+        """Returns the sum over the full horizon of results of the representative time steps,
+        e.g. of res_line.pl_mw, approximated by the weights."""
+        weights = self.weights.loc[results.index].values
+        if isinstance(results, pd.Series):
+            return float(results.values @ weights)
+        return pd.Series(weights @ results.values, index=results.columns)
+
+    def energy(self, results:pd.DataFrame|pd.Series,
+               steps_per_hour:int=4) -> pd.Series|float:
+        """Returns the energy over the full horizon of power results of the representative time
+        steps, e.g. the annual losses in MWh of res_line.pl_mw of quarter-hourly time steps."""
+        return self.weighted_sum(results) / steps_per_hour
+
+    def expand(self, results:pd.DataFrame) -> pd.DataFrame:
+        """Returns the results of the representative time steps mapped to all time steps of the
+        clustered periods, i.e. each period gets the results of its representative period."""
+        values = results.loc[self.time_steps].values.reshape(
+            len(self.medoids), self.period_length, -1)
+        expanded = values[self.labels].reshape(len(self.labels) * self.period_length, -1)
+        return pd.DataFrame(expanded, index=self.index[:expanded.shape[0]],
+                            columns=results.columns)
+
+
+def representative_periods(
+        profiles:dict[str, pd.DataFrame],
+        n_periods:int,
+        period_length:int=96,
+        keys:list[str]|None=None,
+        aggregate:bool=True,
+        seed:int=0,
+        max_iter:int=100,
+        cache_folder:str|None=None,
+    ) -> RepresentativePeriods:
+    """Selects representative periods (days by default, or time steps with period_length=1) of the
+    profiles via weighted k-medoids clustering. The clustering is deterministic for a given seed
+    and cached in cache_folder, if given.
+
+    Parameters
+    ----------
+    profiles : dict[str, pd.DataFrame]
+        profiles, e.g. net.profiles of SimBench_for_phd(time_steps=True)
+    n_periods : int
+        number of representative periods
+    period_length : int, optional
+        number of time steps per period, by default 96 (days of quarter-hourly time steps)
+    keys : list[str] | None, optional
+        profile keys to consider. If None, REPRESENTATIVE_KEYS are used, by default None
+    aggregate : bool, optional
+        If True, the sums over all elements per key are clustered, otherwise all element profiles.
+        Each key is weighted equally, by default True
+    seed : int, optional
+        seed of the initialization, by default 0
+    max_iter : int, optional
+        maximum number of iterations of the clustering, by default 100
+    cache_folder : str | None, optional
+        folder to cache the clustering results, cf. ArtifactCache, by default None
+
+    Returns
+    -------
+    RepresentativePeriods
+        representative periods, their time steps and weights. The attribute error provides per
+        key the relative error of the sum over the horizon ("sum_rel_error"), the peak
+        ("peak_rel_error") and the root mean squared deviation of the time steps relative to the
+        mean ("rmse_rel")
+
+    Example
+    -------
+    >>> rep = representative_periods(net.profiles, 12)
+    >>> res = run_custom_timeseries(net, rep.time_steps, "pp", None)
+    >>> rep.energy(res["res_line.pl_mw"]).sum()  # approximated annual line losses in MWh
+    """
+    keys = [key for key in (REPRESENTATIVE_KEYS if keys is None else keys) if key in
+            profiles.keys() and profiles[key].shape[1]]
+    if not len(keys):
+        raise ValueError("None of the given keys is available in the profiles.")
+    index = profiles_index({key: profiles[key] for key in keys})
+    n_full = len(index) // period_length
+    if n_full < n_periods:
+        raise ValueError(f"{n_periods=} exceeds the {n_full} periods of the profiles.")
+    if n_full * period_length < len(index):
+        logger.info(f"The last {len(index) - n_full * period_length} time steps are not part of "
+                    "a full period and thus not clustered.")
+
+    features = period_features(profiles, period_length, keys, aggregate)
+    params = {"n_clusters": n_periods, "seed": seed, "max_iter": max_iter}
+    clustered = ArtifactCache(cache_folder).run(
+        "representative_periods", _cluster, Artifact(features, fingerprint(
+            features) if cache_folder is not None else ""), params=params,
+        code=[k_medoids, _distances, _init_medoids])
+    medoids, labels = clustered.value
+
+    rep = RepresentativePeriods(index, period_length, medoids, labels)
+    rep.error = approximation_error(profiles, rep, keys)
+    logger.info(f"{n_periods} representative periods approximate the sums of {keys} with "
+                f"relative errors up to {rep.error.sum_rel_error.abs().max():.2%}.")
+    return rep
+
+
+def period_features(profiles:dict[str, pd.DataFrame], period_length:int, keys:list[str],
+                    aggregate:bool=True) -> np.ndarray:
+    """Returns the features (periods x features) of the full periods of the profiles. Each key is
+    scaled by the standard deviation of its values to be weighted equally."""
+    features = list()
+    for key in keys:
+        values = profiles[key].to_numpy(dtype=np.float64)
+        if aggregate:
+            values = values.sum(axis=1, keepdims=True)
+        n_full = values.shape[0] // period_length
+        values = values[:n_full * period_length].reshape(n_full, -1)
+        std = values.std()
+        features.append(values / std if std > 0 else values)
+    return np.concatenate(features, axis=1)
+
+
+def k_medoids(features:np.ndarray, n_clusters:int, weights:np.ndarray|None=None, seed:int=0,
+              max_iter:int=100) -> tuple[np.ndarray, np.ndarray]:
+    """Weighted k-medoids clustering (alternating assignment and medoid update) with Euclidean
+    distances and a deterministic k-medoids++ initialization. Distances are computed vectorized
+    in chunks, so that no full distance matrix of many samples is needed.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        sorted positions of the medoids and the cluster (position in the medoids) per sample
+    """
+    n = features.shape[0]
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=float)
+    medoids = _init_medoids(features, n_clusters, weights, seed)
+    for _ in range(max_iter):
+        labels = _distances(features, features[medoids]).argmin(axis=1)
+        new_medoids = medoids.copy()
+        for cluster in range(n_clusters):
+            members = np.flatnonzero(labels == cluster)
+            if not len(members):
+                continue
+            costs = np.concatenate([_distances(features[chunk], features[members]) @ weights[
+                members] for chunk in _chunks(members, len(members))])
+            new_medoids[cluster] = members[np.argmin(costs)]
+        if np.array_equal(np.sort(new_medoids), np.sort(medoids)):
+            break
+        medoids = new_medoids
+    medoids = np.sort(medoids)
+    return medoids, _distances(features, features[medoids]).argmin(axis=1)
+
+
+def approximation_error(profiles:dict[str, pd.DataFrame], rep:RepresentativePeriods,
+                        keys:list[str]) -> pd.DataFrame:
+    """Returns the approximation error of the profiles' sums over all elements by the
+    representative periods, cf. representative_periods()."""
+    error = dict()
+    for key in keys:
+        total = profiles[key].to_numpy(dtype=np.float64).sum(axis=1)
+        series = pd.Series(total, index=profiles[key].index)
+        expanded = rep.expand(series.to_frame()).iloc[:, 0]
+        full = series.loc[expanded.index]
+        mean = np.abs(full.values).mean()
+        error[key] = {
+            "sum": series.sum(), "approximated_sum": rep.weighted_sum(series.loc[rep.time_steps]),
+            "peak": full.max(), "approximated_peak": expanded.max(),
+            "rmse_rel": np.sqrt(((expanded.values - full.values)**2).mean()) / mean if mean else
+            0.}
+    error = pd.DataFrame(error).T
+    error.insert(2, "sum_rel_error", _rel(error.approximated_sum, error["sum"]))
+    error.insert(5, "peak_rel_error", _rel(error.approximated_peak, error.peak))
+    return error
+
+
+def _rel(approximated:pd.Series, exact:pd.Series) -> pd.Series:
+    return (approximated - exact) / exact.abs().where(exact != 0, np.nan)
+
+
+def _cluster(features:np.ndarray, n_clusters:int, seed:int,
+             max_iter:int) -> tuple[np.ndarray, np.ndarray]:
+    return k_medoids(features, n_clusters, seed=seed, max_iter=max_iter)
+
+
+def _init_medoids(features:np.ndarray, n_clusters:int, weights:np.ndarray,
+                  seed:int) -> np.ndarray:
+    """k-medoids++ initialization with a fixed seed."""
+    rng = np.random.default_rng(seed)
+    medoids = [int(np.argmin(_distances(features.mean(axis=0, keepdims=True), features)))]
+    min_dist = _distances(features, features[medoids])[:, 0]
+    for _ in range(1, n_clusters):
+        prob = weights * min_dist**2
+        if prob.sum() > 0:
+            candidate = int(rng.choice(len(prob), p=prob / prob.sum()))
+        else:
+            candidate = int(np.setdiff1d(np.arange(len(prob)), medoids)[0])
+        medoids.append(candidate)
+        min_dist = np.minimum(min_dist, _distances(features, features[[candidate]])[:, 0])
+    return np.array(medoids)
+
+
+def _distances(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    """Euclidean distances between the rows of a and b."""
+    sq = (a**2).sum(axis=1)[:, None] + (b**2).sum(axis=1)[None, :] - 2 * a @ b.T
+    return np.sqrt(np.maximum(sq, 0.))
+
+
+def _chunks(positions:np.ndarray, n_other:int, max_size:int=10**7) -> list[np.ndarray]:
+    size = max(1, max_size // max(n_other, 1))
+    return [positions[i:i+size] for i in range(0, len(positions), size)]
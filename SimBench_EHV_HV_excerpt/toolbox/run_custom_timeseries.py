@@ -4,13 +4,10 @@ import pandapower as pp
 import simbench as sb
 
 from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import set_time_step
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps
 from SimBench_EHV_HV_excerpt.toolbox.json_io import write_ts_results_to_json
-
-try:
-    from pandaplan.core.timeseries.run_profile_cython import run_static_profile
-    paco_imported = True
-except ImportError:
-    paco_imported = False
+from SimBench_EHV_HV_excerpt.toolbox.reducers import split_output_vals, reduce_results
+from SimBench_EHV_HV_excerpt.toolbox.output_writer import CustomOutputWriter, result_dtype
 
 try:
     import pandaplan.core.pplog as logging
@@ -28,7 +25,7 @@ def run_custom_timeseries(net, time_steps, kernel, output_path:str|None,
     ----------
     net : pp.pandapowernet
         pandapowernet
-    time_steps : iterable[int]
+    time_steps : iterable[int] | TimeSteps
         time steps to run
     kernel : str
         "pp" or "numba"
@@ -44,11 +41,19 @@ def run_custom_timeseries(net, time_steps, kernel, output_path:str|None,
         if not given here, net.profiles is used
 
     output_vals : list[tuple[str, str]], optional
-        such as [("line", "loading"), ("trafo", "i_hv_ka")]
+        such as [("line", "loading"), ("trafo", "i_hv_ka")]. To only store aggregates over the
+        time steps instead of complete time series results, reducers can be added as third tuple
+        item, e.g. ("res_line", "loading_percent", ["max", ">100"]) or
+        ("res_bus", "vm_pu", ["min", "max", "q0.05"]), cf. get_reducer(). The aggregates are
+        returned as Series with keys such as "res_line.loading_percent.max"
 
     add_output_vals : list[tuple[str, str]], optional
         for kernel=="pp" e.g. [("gen", "p_mw"), ("gen", "vm_pu")]
 
+    result_dtypes : np.dtype | dict | None, optional
+        dtype of the stored results, cf. result_dtype(). By default, loadings and voltages are
+        stored as float32 and all other results as float64
+
     include_bus_pq_results : bool, optional
         by default True
 
@@ -71,15 +76,22 @@ def run_custom_timeseries(net, time_steps, kernel, output_path:str|None,
         raise ValueError("No profiles are available.")
     profiles = kwargs.pop("profiles", getattr(net, "profiles", None))
     assert profiles is not None
+    if isinstance(time_steps, TimeSteps):
+        time_steps = time_steps.resolve(profiles).tolist()
 
     # define output values
-    output_vals = kwargs.get("output_vals", default_outputs_from_kernel(kernel))
-    if "add_output_vals" in kwargs.keys() and kernel == "pp":
-        output_vals += kwargs["add_output_vals"]
+    output_vals = kwargs.pop("output_vals", default_outputs_from_kernel(kernel))
+    add_output_vals = kwargs.pop("add_output_vals", list())
+    if kernel == "pp":
+        output_vals = output_vals + add_output_vals
+    output_vals, reduced_vals = split_output_vals(output_vals)
+    result_dtypes = kwargs.pop("result_dtypes", None)
 
     # --- kernel specific code
     if kernel == "numba":
-        if not paco_imported:
+        try:
+            from pandaplan.core.timeseries.run_profile_cython import run_static_profile
+        except ImportError:
             raise ModuleNotFoundError("Not open-source module pandaplan-core is needed for "
                                       "run_custom_timeseries(kernel='numba').")
         set_time_step(net, time_steps[0], abs_profiles=profiles)
@@ -87,14 +99,24 @@ def run_custom_timeseries(net, time_steps, kernel, output_path:str|None,
             0]].index].values for key, val in profiles.items() if val.shape[0]}
         pp.runpp(net, **kwargs)
         res = run_static_profile(
-            net, profile_arrays, output_vals, kernel="numba", num_threads=8,
+            net, profile_arrays, output_vals + [
+                et_col for et_col in reduced_vals.keys() if et_col not in output_vals],
+            kernel="numba", num_threads=8,
             errors="ignore", tolerance_mva=1e-7,
             include_bus_pq_results=kwargs.pop("include_bus_pq_results", True), **kwargs)
         res = {f"res_{key[0]}.{key[1]}" if len(key) == 2 and key[0] in pp.pp_elements() \
                else key: val if not isinstance(val, pd.DataFrame) else val.set_index(pd.Index(
                 time_steps)) for key, val in res.items()}
+        for key, val in res.items():
+            if isinstance(val, pd.DataFrame) and len(key.split(".")) == 2:
+                res[key] = val.astype(result_dtype(*key.split("."), result_dtypes), copy=False)
+        res = reduce_results(res, {(f"res_{et}" if et in pp.pp_elements() else et, col):
+                                   reducers for (et, col), reducers in reduced_vals.items()},
+                             keep_full=[(f"res_{et}" if et in pp.pp_elements() else et, col) for
+                                        et, col in output_vals])
         if kwargs.get("drop_non_df_result_data", False):
-            res = {key: val for key, val in res.items() if isinstance(val, pd.DataFrame)}
+            res = {key: val for key, val in res.items() if isinstance(val, (pd.DataFrame,
+                                                                              pd.Series))}
         if output_path is not None:
             write_ts_results_to_json(res, output_path)
 
@@ -106,14 +128,19 @@ def run_custom_timeseries(net, time_steps, kernel, output_path:str|None,
             del net["profiles"]
 
         # define OutputWriter
-        ow = pp.timeseries.OutputWriter(net, time_steps, output_path=output_path,
-                                        output_file_type=".json")
+        ow = CustomOutputWriter(net, time_steps, output_path=output_path,
+                                output_file_type=".json", dtypes=result_dtypes)
         not_logged = list()
         for et, col in output_vals:
             if col in net[et].columns:
                 ow.log_variable(et, col)
             else:
                 not_logged.append((et, col))
+        for (et, col), reducers in reduced_vals.items():
+            if col in net[et].columns:
+                ow.log_reduced_variable(et, col, reducers)
+            else:
+                not_logged.append((et, col))
         if len(not_logged):
             logger.warning(f"This output_vals could not be logged: {not_logged}")
 
@@ -0,0 +1,514 @@
+from copy import deepcopy
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from pandapower.pypower.dSbus_dV import dSbus_dV
+from pandapower.pypower.dSbr_dV import dSbr_dV
+from scipy.sparse import coo_matrix, csc_matrix, hstack, vstack
+from scipy.sparse.linalg import splu
+
+from SimBench_EHV_HV_excerpt.toolbox.set_values_to_net import get_et_col
+from SimBench_EHV_HV_excerpt.toolbox.run_custom_timeseries import run_custom_timeseries
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import Artifact, ArtifactCache, fingerprint
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# elements which inject power into the buses with the sign of their injection
+_INJECTING_ELEMENTS = {"load": -1, "sgen": 1, "gen": 1, "storage": -1}
+_LINE_FLOWS = ["p_from_mw", "q_from_mvar", "p_to_mw", "q_to_mvar"]
+
+
+class LineFlowSensitivities:
+    """Linearized AC sensitivities of line flows to changes of the bus power injections and of the
+    voltage setpoints of generator and slack buses. The sensitivities are derived from the
+    Jacobian at the operating point of the AC power flow of the given net.
+
+    The changed active power injection is balanced by the slack, i.e. by the reference bus or, if
+    distributed_slack is True, with regard to net.gen.slack_weight. Reactive power injections at
+    buses with voltage control have no influence.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net at the operating point to linearize. If the net has no valid power flow results,
+        pp.runpp() is run with the given kwargs
+    lines : pd.Index | None, optional
+        lines to consider, by default all lines
+    distributed_slack : bool, optional
+        whether the active power balance is distributed to the slack gens, by default False
+
+    Example
+    -------
+    >>> sens = LineFlowSensitivities(net, lines=boundary_lines)
+    >>> flows = sens.flows(dp_mw, dq_mvar, dvm_pu)  # time steps x buses (of net.bus)
+    """
+
+    def __init__(self, net:pp.pandapowerNet, lines:pd.Index|None=None,
+                 distributed_slack:bool=False, **kwargs):
+        lin = _linearization(net, distributed_slack, "LineFlowSensitivities", **kwargs)
+        self.lines = net.line.index if lines is None else pd.Index(lines)
+        self.buses = net.bus.index
+        ppci, pvpq, pq, ctrl = lin["ppci"], lin["pvpq"], lin["pq"], lin["ctrl"]
+
+        # --- derivatives of the line flows
+        start = net._pd2ppc_lookups["branch"]["line"][0]
+        rows = start + net.line.index.get_indexer(self.lines)
+        dSf_dVa, dSf_dVm, dSt_dVa, dSt_dVm, Sf, St = dSbr_dV(
+            ppci["branch"], ppci["Yf"], ppci["Yt"], lin["V"])
+        dflows = list()
+        for dVa, dVm in [(dSf_dVa, dSf_dVm), (dSt_dVa, dSt_dVm)]:
+            dVa, dVm = csc_matrix(dVa)[rows], csc_matrix(dVm)[rows]
+            dx, dvm = hstack([dVa[:, pvpq], dVm[:, pq]]).toarray(), dVm[:, ctrl].toarray()
+            dflows += [(dx.real, dvm.real), (dx.imag, dvm.imag)]
+        dflow_dx = np.vstack([dx for dx, _ in dflows])
+        dflow_dvm_ctrl = np.vstack([dvm for _, dvm in dflows])
+
+        # --- sensitivities: dflow/du = dflow/dx * J^-1 * dmismatch/du
+        self.sens_p, self.sens_q, self.sens_vm = _sensitivities(
+            net, lin, dflow_dx, dflow_dvm_ctrl, lin["base_mva"], distributed_slack)
+        self.flows_ref = net.res_line.loc[self.lines, _LINE_FLOWS].values.T.reshape(-1)
+
+    def flows(self, dp_mw:np.ndarray, dq_mvar:np.ndarray,
+              dvm_pu:np.ndarray|None=None) -> dict[str, np.ndarray]:
+        """Returns the linearized line flows (time steps x lines) for changes of the bus
+        injections and voltage setpoints (time steps x buses) compared to the operating point.
+        """
+        flows = self.flows_ref[None, :] + np.asarray(dp_mw) @ self.sens_p.T + \
+            np.asarray(dq_mvar) @ self.sens_q.T
+        if dvm_pu is not None:
+            flows += np.asarray(dvm_pu) @ self.sens_vm.T
+        n_lines = len(self.lines)
+        return {col: flows[:, i*n_lines:(i+1)*n_lines] for i, col in enumerate(_LINE_FLOWS)}
+
+
+class VoltageSensitivities:
+    """Linearized AC sensitivities of the bus voltage magnitudes to changes of the bus power
+    injections and of the voltage setpoints of generator and slack buses, derived as
+    LineFlowSensitivities.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net at the operating point to linearize. If the net has no valid power flow results,
+        pp.runpp() is run with the given kwargs
+    distributed_slack : bool, optional
+        whether the active power balance is distributed to the slack gens, by default False
+
+    Example
+    -------
+    >>> sens = VoltageSensitivities(net)
+    >>> vm_pu = sens.voltages(dp_mw, dq_mvar, dvm_pu)  # time steps x buses (of net.bus)
+    """
+
+    def __init__(self, net:pp.pandapowerNet, distributed_slack:bool=False, **kwargs):
+        lin = _linearization(net, distributed_slack, "VoltageSensitivities", **kwargs)
+        self.buses = net.bus.index
+        pvpq, pq, ctrl = lin["pvpq"], lin["pq"], lin["ctrl"]
+        n_ppc = len(net._ppc["bus"])
+
+        # voltage magnitudes of all buses as function of the state x = [Va(pvpq), Vm(pq)] and of
+        # the voltage setpoints
+        dvm_dx = np.zeros((n_ppc, len(pvpq) + len(pq)))
+        dvm_dx[pq, len(pvpq) + np.arange(len(pq))] = 1.
+        dvm_dvm_ctrl = np.zeros((n_ppc, len(ctrl)))
+        dvm_dvm_ctrl[ctrl, np.arange(len(ctrl))] = 1.
+        self.sens_p, self.sens_q, self.sens_vm = _sensitivities(
+            net, lin, dvm_dx, dvm_dvm_ctrl, 1., distributed_slack)
+        self.vm_ref = net.res_bus.vm_pu.loc[self.buses].values
+
+    def voltages(self, dp_mw:np.ndarray, dq_mvar:np.ndarray,
+                 dvm_pu:np.ndarray|None=None) -> np.ndarray:
+        """Returns the linearized voltage magnitudes (time steps x buses) for changes of the bus
+        injections and voltage setpoints (time steps x buses) compared to the operating point.
+        """
+        vm_pu = self.vm_ref[None, :] + np.asarray(dp_mw) @ self.sens_p.T + \
+            np.asarray(dq_mvar) @ self.sens_q.T
+        if dvm_pu is not None:
+            vm_pu += np.asarray(dvm_pu) @ self.sens_vm.T
+        return vm_pu
+
+
+class GridSensitivities:
+    """Linearized AC sensitivities of the loadings of all lines and of all bus voltages around the
+    operating point of the given net, cf. LineFlowSensitivities and VoltageSensitivities. The
+    current magnitudes of the lines are derived from the linearized flows and voltages.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net at the operating point to linearize
+    distributed_slack : bool, optional
+        whether the active power balance is distributed to the slack gens, by default False
+
+    Example
+    -------
+    >>> sens = grid_sensitivities(net, cache_folder=folder)
+    >>> loading_percent, vm_pu = sens.estimate(p_mw, q_mvar, vm_pu)  # time steps x lines/buses
+    """
+
+    def __init__(self, net:pp.pandapowerNet, distributed_slack:bool=False, **kwargs):
+        pp.runpp(net, distributed_slack=distributed_slack, **kwargs)
+        self.line_sens = LineFlowSensitivities(net, distributed_slack=distributed_slack)
+        self.vm_sens = VoltageSensitivities(net, distributed_slack=distributed_slack)
+        self.lines, self.buses = net.line.index, net.bus.index
+        self.p_ref, self.q_ref, self.vm_setpoints_ref = bus_injections(net, dict(), [0])
+        self._from_pos = self.buses.get_indexer(net.line.from_bus.values)
+        self._to_pos = self.buses.get_indexer(net.line.to_bus.values)
+        self._vn_from = net.bus.vn_kv.values[self._from_pos]
+        self._vn_to = net.bus.vn_kv.values[self._to_pos]
+        self._max_i_ka = (net.line.max_i_ka * net.line.df * net.line.parallel).values
+
+    def estimate(self, p_mw:np.ndarray, q_mvar:np.ndarray,
+                 vm_setpoints_pu:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the linearized line loadings in percent and bus voltages (time steps x lines
+        and buses) for the bus injections and voltage setpoints (time steps x buses), e.g. from
+        bus_injections()."""
+        dp, dq = p_mw - self.p_ref, q_mvar - self.q_ref
+        dvm = np.nan_to_num(vm_setpoints_pu - self.vm_setpoints_ref)
+        flows = self.line_sens.flows(dp, dq, dvm)
+        vm_pu = self.vm_sens.voltages(dp, dq, dvm)
+        i_from = np.hypot(flows["p_from_mw"], flows["q_from_mvar"]) / (
+            np.sqrt(3) * vm_pu[:, self._from_pos] * self._vn_from)
+        i_to = np.hypot(flows["p_to_mw"], flows["q_to_mvar"]) / (
+            np.sqrt(3) * vm_pu[:, self._to_pos] * self._vn_to)
+        return np.maximum(i_from, i_to) / self._max_i_ka * 100, vm_pu
+
+
+def grid_sensitivities(
+        net:pp.pandapowerNet,
+        profiles:dict[str, pd.DataFrame]|None=None,
+        time_steps:list[int]|TimeSteps|None=None,
+        distributed_slack:bool=False,
+        cache_folder:str|None=None,
+        **kwargs
+    ) -> GridSensitivities:
+    """Returns the GridSensitivities around the mean operating point of the profiles. The net is
+    not changed. The sensitivities are cached in cache_folder keyed by the fingerprint of the net
+    tables at the operating point, cf. ArtifactCache, so that they are only computed once for a
+    grid.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles of the time steps, by default net.profiles
+    time_steps : list[int] | TimeSteps | None, optional
+        time steps to determine the mean operating point. If None, all time steps of the
+        profiles are used, by default None
+    distributed_slack : bool, optional
+        cf. LineFlowSensitivities, by default False
+    cache_folder : str | None, optional
+        folder to cache the sensitivities. If None, nothing is cached, by default None
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments of pp.runpp()
+
+    Returns
+    -------
+    GridSensitivities
+        sensitivities of line loadings and bus voltages
+    """
+    profiles = net.profiles if profiles is None else profiles
+    profiles = {key: TimeSteps(True if time_steps is None else time_steps).select(df) for key, df
+                in profiles.items()}
+    net_profiles = net.pop("profiles", None)
+    try:
+        base = deepcopy(net)
+    finally:
+        if net_profiles is not None:
+            net["profiles"] = net_profiles
+    for key, df in profiles.items():
+        et, col = get_et_col(key)
+        if et in base.keys() and base[et].shape[0] and col in base[et].columns and df.shape[0]:
+            mean = df.mean()
+            has_profile = base[et].index.isin(mean.index)
+            base[et].loc[has_profile, col] = mean.loc[base[et].index[has_profile]].values
+    tables = {key: value for key, value in base.items() if isinstance(value, pd.DataFrame) and
+              not key.startswith("res_") and key != "controller" and value.shape[0]}
+    return ArtifactCache(cache_folder).run(
+        "grid_sensitivities", GridSensitivities, Artifact(base, fingerprint(
+            tables) if cache_folder is not None else ""),
+        params={"distributed_slack": distributed_slack, **kwargs},
+        code=[LineFlowSensitivities, VoltageSensitivities, _linearization, _sensitivities,
+              bus_injections], salt=pp.__version__).value
+
+
+def screen_time_steps(
+        net:pp.pandapowerNet,
+        profiles:dict[str, pd.DataFrame]|None=None,
+        time_steps:list[int]|TimeSteps|None=None,
+        sens:GridSensitivities|None=None,
+        max_loading_percent:float=100.,
+        vm_limits:tuple[float, float]=(0.9, 1.1),
+        loading_margin:float=10.,
+        vm_margin:float=0.01,
+        chunk_size:int=96*28,
+        **kwargs
+    ) -> pd.DataFrame:
+    """Screens the time steps by linearized line loadings and bus voltages, cf.
+    GridSensitivities. Time steps whose estimated maximum loading or voltage band violation is
+    within the margins of the limits are shortlisted for exact AC power flows.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles of the time steps, by default net.profiles
+    time_steps : list[int] | TimeSteps | None, optional
+        time steps to screen. If None, all time steps of the profiles are screened,
+        by default None
+    sens : GridSensitivities | None, optional
+        sensitivities. If None, grid_sensitivities() is called with the kwargs, by default None
+    max_loading_percent : float, optional
+        maximum line loading, by default 100.
+    vm_limits : tuple[float, float], optional
+        minimum and maximum bus voltages, by default (0.9, 1.1)
+    loading_margin : float, optional
+        margin of the loading limit in percent points, which covers the linearization error,
+        by default 10.
+    vm_margin : float, optional
+        margin of the voltage limits, by default 0.01
+    chunk_size : int, optional
+        number of time steps which are screened at once, by default 96*28
+
+    Returns
+    -------
+    pd.DataFrame
+        per time step: the estimated maximum line loading and the corresponding line, the
+        minimum and maximum bus voltage, a severity (maximum relative use of the limits) and
+        whether the time step is shortlisted
+
+    Example
+    -------
+    >>> screening = screen_time_steps(net, cache_folder=folder)
+    >>> run_custom_timeseries(net, screening.index[screening.shortlisted], "pp", None)
+    """
+    profiles = net.profiles if profiles is None else profiles
+    if sens is None:
+        sens = grid_sensitivities(net, profiles, time_steps, **kwargs)
+    time_steps = TimeSteps(True if time_steps is None else time_steps).resolve(profiles)
+    screening = list()
+    for start in range(0, len(time_steps), chunk_size):
+        chunk = list(time_steps[start:start+chunk_size])
+        loading, vm_pu = sens.estimate(*bus_injections(net, profiles, chunk))
+        max_pos = loading.argmax(axis=1)
+        screening.append(pd.DataFrame({
+            "max_loading_percent": loading[np.arange(len(chunk)), max_pos],
+            "line": sens.lines[max_pos], "min_vm_pu": vm_pu.min(axis=1),
+            "max_vm_pu": vm_pu.max(axis=1)}, index=chunk))
+    screening = pd.concat(screening) if len(screening) else pd.DataFrame(columns=[
+        "max_loading_percent", "line", "min_vm_pu", "max_vm_pu"])
+    vm_band = (vm_limits[1] - vm_limits[0]) / 2
+    vm_mid = (vm_limits[1] + vm_limits[0]) / 2
+    screening["severity"] = np.maximum(screening.max_loading_percent / max_loading_percent, (
+        np.maximum(screening.max_vm_pu - vm_mid, vm_mid - screening.min_vm_pu)) / vm_band)
+    screening["shortlisted"] = \
+        (screening.max_loading_percent > max_loading_percent - loading_margin) | \
+        (screening.min_vm_pu < vm_limits[0] + vm_margin) | \
+        (screening.max_vm_pu > vm_limits[1] - vm_margin)
+    logger.info(f"{screening.shortlisted.sum()} of {screening.shape[0]} time steps are "
+                "shortlisted for AC power flows.")
+    return screening
+
+
+def bus_injections(net:pp.pandapowerNet, profiles:dict[str, pd.DataFrame],
+                   time_steps:list[int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the active and reactive power injections as well as the voltage setpoints of the
+    generators per bus (time steps x buses of net.bus) as given by the profiles or, if no profile
+    exists, by the net values. Buses without generator get a voltage setpoint of NaN.
+    """
+    n_buses = net.bus.shape[0]
+    p_mw = np.zeros((len(time_steps), n_buses))
+    q_mvar = np.zeros((len(time_steps), n_buses))
+    for et, sign in _INJECTING_ELEMENTS.items():
+        if et not in net.keys() or not net[et].shape[0]:
+            continue
+        factor = sign * net[et].in_service.values * net[et].get(
+            "scaling", pd.Series(1., index=net[et].index)).values
+        incidence = _incidence(net, et)
+        cols = [("p_mw", p_mw)] + ([("q_mvar", q_mvar)] if et != "gen" else [])
+        for col, injection in cols:
+            injection += (_element_values(net, profiles, time_steps, et, col) * factor) @ \
+                incidence
+
+    vm_pu = np.full((len(time_steps), n_buses), np.nan)
+    gens = net.gen.index[net.gen.in_service]
+    if len(gens):
+        incidence = _incidence(net, "gen")[net.gen.index.get_indexer(gens)]
+        counts = np.asarray(incidence.sum(axis=0)).ravel()
+        vm_sum = _element_values(net, profiles, time_steps, "gen", "vm_pu")[
+            :, net.gen.index.get_indexer(gens)] @ incidence
+        has_gen = counts > 0
+        vm_pu[:, has_gen] = vm_sum[:, has_gen] / counts[has_gen]
+    return p_mw, q_mvar, vm_pu
+
+
+def linearized_line_flows(
+        net:pp.pandapowerNet,
+        time_steps:list[int],
+        lines:pd.Index|None = None,
+        profiles:dict[str, pd.DataFrame]|None = None,
+        distributed_slack:bool = False,
+        **kwargs
+    ) -> dict[str, pd.DataFrame]:
+    """Calculates the line flows of all time steps at once via linearized AC sensitivities, cf.
+    LineFlowSensitivities. The operating point to linearize is the mean of the profiles over the
+    time steps.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles. The power values of the net are set to the mean operating point
+    time_steps : list[int]
+        time steps to calculate
+    lines : pd.Index | None, optional
+        lines to consider, by default all lines
+    profiles : dict[str, pd.DataFrame] | None, optional
+        profiles of the time steps, by default net.profiles
+    distributed_slack : bool, optional
+        cf. LineFlowSensitivities, by default False
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        line flows with keys as run_custom_timeseries(), e.g. "res_line.p_from_mw"
+    """
+    profiles = net.profiles if profiles is None else profiles
+    time_steps = list(time_steps)
+    p_mw, q_mvar, vm_pu = bus_injections(net, profiles, time_steps)
+
+    # --- set the mean operating point to the net and derive the sensitivities there
+    for key, df in profiles.items():
+        et, col = get_et_col(key)
+        if et in net.keys() and net[et].shape[0] and col in net[et].columns:
+            net[et][col] = df.loc[time_steps, net[et].index].mean().values
+    pp.runpp(net, distributed_slack=distributed_slack, **kwargs)
+    sens = LineFlowSensitivities(net, lines=lines, distributed_slack=distributed_slack)
+    p_ref, q_ref, vm_ref = bus_injections(net, dict(), [time_steps[0]])
+
+    flows = sens.flows(p_mw - p_ref, q_mvar - q_ref, np.nan_to_num(vm_pu - vm_ref))
+    return {f"res_line.{col}": pd.DataFrame(vals, index=time_steps, columns=sens.lines) for
+            col, vals in flows.items()}
+
+
+def compare_to_ac(net:pp.pandapowerNet, linearized:dict[str, pd.DataFrame],
+                  n_steps:int = 10, kernel:str = "pp", **kwargs) -> pd.DataFrame:
+    """Compares linearized line flows to AC power flow results on a sample of equally spaced time
+    steps.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with profiles
+    linearized : dict[str, pd.DataFrame]
+        line flows, e.g. from linearized_line_flows()
+    n_steps : int, optional
+        number of time steps to compare, by default 10
+    kernel : str, optional
+        kernel of run_custom_timeseries(), by default "pp"
+
+    Returns
+    -------
+    pd.DataFrame
+        maximum and mean absolute deviation as well as the maximum absolute AC value per line
+        flow quantity (rows)
+    """
+    time_steps = next(iter(linearized.values())).index
+    sample = list(time_steps[np.unique(np.linspace(0, len(time_steps)-1, n_steps).astype(int))])
+    prefix = "res_" if kernel == "pp" else ""
+    if kernel == "pp":
+        kwargs["verbose"] = kwargs.get("verbose", False)
+    res = run_custom_timeseries(net, sample, kernel, None, output_vals=[
+        (f"{prefix}line", col) for col in _LINE_FLOWS], **kwargs)
+    report = dict()
+    for key, df in linearized.items():
+        ac = res[key][df.columns]
+        deviation = (df.loc[sample] - ac).abs()
+        report[key.split(".")[1]] = {"max_abs_dev": deviation.max().max(),
+                                     "mean_abs_dev": deviation.mean().mean(),
+                                     "max_abs_ac": ac.abs().max().max()}
+    report = pd.DataFrame(report).T
+    report.index.name = f"{len(sample)} time steps"
+    return report
+
+
+def _incidence(net:pp.pandapowerNet, et:str) -> csc_matrix:
+    n_elm = net[et].shape[0]
+    return csc_matrix(coo_matrix((np.ones(n_elm), (np.arange(n_elm), net.bus.index.get_indexer(
+        net[et].bus.values))), shape=(n_elm, net.bus.shape[0])))
+
+
+def _element_values(net:pp.pandapowerNet, profiles:dict[str, pd.DataFrame],
+                    time_steps:list[int], et:str, col:str) -> np.ndarray:
+    key = f"{et}.{col}"
+    values = np.tile(net[et][col].values.astype(float), (len(time_steps), 1))
+    if key in profiles.keys():
+        profile = profiles[key]
+        has_profile = net[et].index.isin(profile.columns)
+        values[:, has_profile] = profile.loc[time_steps, net[et].index[has_profile]].values
+    return values
+
+
+def _linearization(net:pp.pandapowerNet, distributed_slack:bool, name:str, **kwargs) -> dict:
+    """Returns the data of the AC power flow Jacobian at the operating point of net which is
+    needed to derive sensitivities."""
+    if kwargs or not net.converged or net._ppc is None:
+        pp.runpp(net, distributed_slack=distributed_slack, **kwargs)
+    ppci = net._ppc["internal"]
+    if len(ppci["bus"]) != len(net._ppc["bus"]):
+        raise NotImplementedError(f"{name} does not consider out of service buses.")
+    ref, pv, pq = ppci["ref"], ppci["pv"], ppci["pq"]
+    pvpq = np.r_[pv, pq]
+    ctrl = np.r_[ref, pv]
+
+    # --- Jacobian and its derivatives to the voltage setpoints
+    V = ppci["V"]
+    dS_dVm, dS_dVa = dSbus_dV(ppci["Ybus"], V)
+    jacobian = vstack([
+        hstack([dS_dVa[pvpq][:, pvpq].real, dS_dVm[pvpq][:, pq].real]),
+        hstack([dS_dVa[pq][:, pvpq].imag, dS_dVm[pq][:, pq].imag])], format="csc")
+    dmis_dvm_ctrl = vstack([dS_dVm[pvpq][:, ctrl].real, dS_dVm[pq][:, ctrl].imag]).toarray()
+    return {"ppci": ppci, "ppc_bus": net._pd2ppc_lookups["bus"][net.bus.index.values],
+            "pvpq": pvpq, "pq": pq, "ctrl": ctrl, "V": V, "base_mva": ppci["baseMVA"],
+            "jacobian_T": splu(csc_matrix(jacobian.T)), "dmis_dvm_ctrl": dmis_dvm_ctrl}
+
+
+def _sensitivities(net:pp.pandapowerNet, lin:dict, dy_dx:np.ndarray, dy_dvm_ctrl:np.ndarray,
+                   y_base:float, distributed_slack:bool
+                   ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the sensitivities of quantities y to the active and reactive power injections in
+    MW and Mvar and to the voltage setpoints (y x buses of net.bus), given the per unit
+    derivatives of y to the state and to the voltage setpoints: dy/du = dy/dx * J^-1 *
+    dmismatch/du. y_base is the base of y, e.g. baseMVA for power flows or 1 for voltages."""
+    pvpq, pq, ctrl = lin["pvpq"], lin["pq"], lin["ctrl"]
+    z = lin["jacobian_T"].solve(dy_dx.T).T
+    n_y, n_ppc = dy_dx.shape[0], len(net._ppc["bus"])
+    sens_p = np.zeros((n_y, n_ppc))
+    sens_q = np.zeros((n_y, n_ppc))
+    sens_vm = np.zeros((n_y, n_ppc))
+    sens_p[:, pvpq] = z[:, :len(pvpq)] * y_base / lin["base_mva"]
+    sens_q[:, pq] = z[:, len(pvpq):] * y_base / lin["base_mva"]
+    sens_vm[:, ctrl] = (dy_dvm_ctrl - z @ lin["dmis_dvm_ctrl"]) * y_base
+
+    # --- balance of active power changes by the slack(s)
+    if distributed_slack and (net.gen.slack_weight > 0).any():
+        weights = np.zeros(n_ppc)
+        gens = net.gen.index[net.gen.in_service & (net.gen.slack_weight > 0)]
+        np.add.at(weights, net._pd2ppc_lookups["bus"][net.gen.bus.loc[gens].values],
+                  net.gen.slack_weight.loc[gens].values)
+        weights /= weights.sum()
+        sens_p -= (sens_p @ weights)[:, None]
+
+    # sensitivities in relation to the buses of net.bus
+    ppc_bus = lin["ppc_bus"]
+    return sens_p[:, ppc_bus], sens_q[:, ppc_bus], sens_vm[:, ppc_bus]
@@ -2,17 +2,24 @@ import numpy as np
 import pandas as pd
 import pandapower as pp
 
+from SimBench_EHV_HV_excerpt.toolbox.time_step_selection import TimeSteps
+
 
 def set_time_step(net: pp.pandapowerNet,
-                  time_step: int,
+                  time_step: int|TimeSteps,
                   abs_profiles: dict|pd.io.pytables.HDFStore|None = None,
                   intersection: bool = False):
     """
     Sets values from abs_profiles (or if not given from net.profiles) to the net.
     Can handle dict keys "et.col" and (et, col).
+    If time_step is a TimeSteps selection, its first time step is set.
     """
     if abs_profiles is None:
         abs_profiles = net.profiles
+    if isinstance(time_step, TimeSteps):
+        if not isinstance(abs_profiles, dict):
+            raise NotImplementedError("TimeSteps can only be resolved for profiles of type dict.")
+        time_step = time_step.resolve(abs_profiles)[0]
     keys = abs_profiles.keys()
     for key in keys:
         et, col = key[1:].split("/") if isinstance(abs_profiles, pd.io.pytables.HDFStore) else \
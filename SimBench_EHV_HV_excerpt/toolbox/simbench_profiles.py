@@ -0,0 +1,278 @@
+import os
+import typing
+import warnings
+import numpy as np
+import pandas as pd
+import pandapower as pp
+import pyarrow as pa
+import pyarrow.parquet as pq
+import simbench as sb
+
+from SimBench_EHV_HV_excerpt import home
+from SimBench_EHV_HV_excerpt.toolbox.artifact_cache import fingerprint, write_atomic
+from SimBench_EHV_HV_excerpt.toolbox.element_groups import element_groups
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+SIMBENCH_CODE = "1-EHVHV-mixed-all-0-no_sw"
+SIMBENCH_PROFILE_KEYS = ["load.p_mw", "load.q_mvar", "sgen.p_mw"]
+simbench_profiles_cache = os.path.join(home, ".SimBench_EHV_HV_excerpt_cache", "simbench_profiles")
+_BOUNDARY_FLOW_KEYS = ["load.p_mw", "load.q_mvar"]
+_BOUNDARY_FLOW_CHUNK = 96*2  # time steps per cached file of the boundary flows
+
+
+class SimBenchProfiles:
+    """Generator of the absolute load and sgen profiles of the net's elements from the relative
+    profiles of SimBench. The scaling follows simbench.get_absolute_values(): the relative profile
+    given in the element's column "profile" (with the suffix "_pload" or "_qload" for loads) is
+    multiplied by the element's power in the SimBench grid. The profiles are computed vectorized
+    per window of time steps, so that year-long profiles never need to be stored in the package.
+
+    Elements which are not part of the SimBench grid, such as the ExtL_* loads replacing the
+    boundary lines, get their absolute profiles from the boundary flows, cf.
+    boundary_flow_profiles(). Elements without any source profile raise a ValueError.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net whose element indices refer to the SimBench grid
+    sb_net : pp.pandapowerNet | None, optional
+        SimBench grid including relative profiles. If None, it is loaded via simbench_grid(),
+        by default None
+    boundary_flows : dict[str, pd.DataFrame] | None, optional
+        absolute profiles (time steps x elements) per key of the elements which are not part of
+        the SimBench grid. If None, the ExtL_* loads get the boundary_flow_profiles() of the
+        time steps of each window which are derived at first use, by default None
+    cache_folder : str | None, optional
+        cache folder of boundary_flow_profiles(), by default None
+
+    Example
+    -------
+    >>> generator = SimBenchProfiles(net)
+    >>> generator.window("sgen.p_mw", 96*100, 96*107)  # 101st to 107th day
+    """
+
+    def __init__(self, net:pp.pandapowerNet, sb_net:pp.pandapowerNet|None=None,
+                 boundary_flows:dict[str, pd.DataFrame]|None=None,
+                 cache_folder:str|None=None):
+        if sb_net is None:
+            sb_net = simbench_grid()
+        self._net = net
+        self._boundary_flows = boundary_flows
+        self._cache_folder = cache_folder
+        relative = {"load": sb_net.profiles["load"],
+                    "sgen": pd.concat([sb_net.profiles[key] for key in ["powerplants",
+                                       "renewables"] if key in sb_net.profiles.keys()], axis=1)}
+        self._relative = {et: df.loc[:, ~df.columns.duplicated()].drop(columns="time",
+                                                                      errors="ignore")
+                          for et, df in relative.items()}
+        self.n_time_steps = self._relative["load"].shape[0]
+
+        self._plans = dict()
+        self._boundary = dict()
+        for key in SIMBENCH_PROFILE_KEYS:
+            et, col = key.split(".")
+            suffix = {"p_mw": "_pload", "q_mvar": "_qload"}[col] if et == "load" else ""
+            in_sb = net[et].index.isin(sb_net[et].index)
+            profiles = pd.Series(None, index=net[et].index, dtype=object)
+            profiles.loc[in_sb] = sb_net[et].profile.loc[net[et].index[in_sb]] + suffix
+            positions = self._relative[et].columns.get_indexer(profiles.fillna("").values)
+            factor = np.where(positions >= 0, sb_net[et][col].reindex(net[et].index).fillna(
+                0.).values, 0.)
+            self._plans[key] = (net[et].index, positions, factor)
+
+            # elements without SimBench profile
+            missing = net[et].index[positions < 0]
+            if not len(missing):
+                continue
+            if boundary_flows is None:  # derived boundary flows exist for ExtL_* loads only
+                no_source = missing if key not in _BOUNDARY_FLOW_KEYS else missing[
+                    element_groups(net, et).loc[missing].values != "ExtL"]
+            else:
+                no_source = missing.difference(boundary_flows.get(key, pd.DataFrame()).columns)
+            if len(no_source):
+                raise ValueError(
+                    f"{len(no_source)} {et}s have neither a SimBench profile nor a boundary "
+                    f"flow profile of {key}: {net[et].name.loc[no_source].tolist()}")
+            self._boundary[key] = (np.flatnonzero(positions < 0), missing)
+
+    def window(self, key:str, start:int, stop:int) -> pd.DataFrame:
+        """Returns the absolute profiles of the key, e.g. "load.p_mw", for the time steps from
+        start to stop (exclusive)."""
+        columns, positions, factor = self._plans[key]
+        relative = self._relative[key.split(".")[0]].values[start:stop]
+        values = (relative[:, np.maximum(positions, 0)].astype(np.float64) * factor).astype(
+            np.float32)
+        index = pd.Index(np.arange(start, start + values.shape[0]), dtype=np.int64)
+        if key in self._boundary.keys():
+            boundary_positions, elements = self._boundary[key]
+            boundary_flows = self._boundary_flows if self._boundary_flows is not None else \
+                boundary_flow_profiles(self._net, range(start, start + values.shape[0]),
+                                       cache_folder=self._cache_folder)
+            boundary = boundary_flows[key]
+            if not index.isin(boundary.index).all():
+                raise ValueError(f"The boundary flow profiles of {key} do not include all time "
+                                 f"steps from {start} to {stop - 1}.")
+            values[:, boundary_positions] = boundary.loc[index, elements].to_numpy(
+                dtype=np.float32)
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def iter_windows(self, key:str, time_steps:range,
+                     window:int=96*28) -> typing.Iterator[pd.DataFrame]:
+        """Yields the absolute profiles of the key for the time steps in windows."""
+        for start in range(time_steps.start, time_steps.stop, window):
+            yield self.window(key, start, min(start + window, time_steps.stop))
+
+    def to_parquet(self, key:str, file:str, time_steps:range, window:int=96*28) -> None:
+        """Writes the absolute profiles of the key for the time steps window by window to a
+        parquet file (one row group per window)."""
+        tmp = file + ".tmp"
+        writer = None
+        try:
+            for df in self.iter_windows(key, time_steps, window):
+                table = pa.Table.from_pandas(df, preserve_index=True)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp, file)
+
+
+def simbench_profile_files(
+        net:pp.pandapowerNet,
+        keys:list[str],
+        time_steps:range,
+        cache_folder:str|None=None,
+        **kwargs
+    ) -> dict[str, str]:
+    """Returns the parquet files of the absolute SimBench profiles of the keys, e.g.
+    ["load.p_mw"], for the net's elements and the given time steps. Missing files are generated
+    by SimBenchProfiles at first use and cached for later use. The cache files depend on the
+    SimBench version, the element indices, their profile names and the given boundary flow
+    profiles of the elements. If no boundary flows are given, the boundary_flow_profiles() of
+    the time steps are derived (if not cached yet) and cached in the same folder.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net whose element indices refer to the SimBench grid
+    keys : list[str]
+        keys of SIMBENCH_PROFILE_KEYS
+    time_steps : range
+        time steps of the files
+    cache_folder : str | None, optional
+        folder of the cached files. If None, simbench_profiles_cache is used, by default None
+
+    Other Parameters
+    ----------------
+    kwargs
+        key word arguments of SimBenchProfiles, e.g. sb_net or boundary_flows
+
+    Returns
+    -------
+    dict[str, str]
+        paths of the parquet files per key
+    """
+    cache_folder = simbench_profiles_cache if cache_folder is None else cache_folder
+    boundary_flows = kwargs.get("boundary_flows", None)
+    files = dict()
+    for key in keys:
+        et = key.split(".")[0]
+        if boundary_flows is None:  # derived boundary flows depend on the SimBench version only
+            boundary = "derived" if key in _BOUNDARY_FLOW_KEYS else None
+        else:
+            boundary = boundary_flows.get(key, pd.DataFrame())
+            boundary = boundary[boundary.columns.intersection(net[et].index)]
+        fp = fingerprint([sb.__version__, SIMBENCH_CODE, key, time_steps, net[et].index,
+                          net[et].profile if "profile" in net[et].columns else None,
+                          net[et].name if boundary is not None else None, boundary])
+        files[key] = os.path.join(
+            cache_folder, f"{key}-{time_steps.start}-{time_steps.stop}-{fp[:16]}.parquet")
+
+    missing = [key for key, file in files.items() if not os.path.isfile(file)]
+    if len(missing):
+        logger.info(f"{missing} profiles of the time steps {time_steps.start} to "
+                    f"{time_steps.stop - 1} are generated from SimBench and cached in "
+                    f"{cache_folder}.")
+        os.makedirs(cache_folder, exist_ok=True)
+        if boundary_flows is None and any(key in _BOUNDARY_FLOW_KEYS for key in missing) and \
+                (element_groups(net, "load") == "ExtL").any():
+            # derived once for all windows of the time steps
+            kwargs["boundary_flows"] = boundary_flow_profiles(net, time_steps,
+                                                              cache_folder=cache_folder)
+        generator = SimBenchProfiles(net, cache_folder=cache_folder, **kwargs)
+        for key in missing:
+            generator.to_parquet(key, files[key], time_steps)
+    return files
+
+
+def boundary_flow_profiles(net:pp.pandapowerNet, time_steps:range,
+                           cache_folder:str|None=None) -> dict[str, pd.DataFrame]:
+    """Returns the absolute profiles of the ExtL_* loads which replace the boundary lines of the
+    grid excerpt, i.e. the flows over the boundary lines in the time series of SimBench's
+    complete grid which reduce_ehv() is based on. The flows are derived at first use in chunks
+    of two days (gen time series with distributed slack and AC time series of the complete grid,
+    cf. SimBench_for_phd_base_net(from_json=False)) and cached, so that they are not stored in
+    the package. Deriving the flows of the whole year takes a while.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with ExtL_* loads, e.g. SimBench_for_phd()
+    time_steps : range
+        time steps of the profiles
+    cache_folder : str | None, optional
+        folder of the cached flows. If None, simbench_profiles_cache is used, by default None
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        profiles (time steps x ExtL_* loads) of "load.p_mw" and "load.q_mvar"
+    """
+    cache_folder = simbench_profiles_cache if cache_folder is None else cache_folder
+    starts = range(time_steps.start // _BOUNDARY_FLOW_CHUNK * _BOUNDARY_FLOW_CHUNK,
+                   time_steps.stop, _BOUNDARY_FLOW_CHUNK)
+    missing = [start for start in starts if not all(os.path.isfile(_boundary_flow_file(
+        cache_folder, key, start)) for key in _BOUNDARY_FLOW_KEYS)]
+    if len(missing):
+        from SimBench_EHV_HV_excerpt.SimBench_for_phd import _iter_boundary_flows
+        logger.info(f"The boundary flows of {len(missing)} chunks of {_BOUNDARY_FLOW_CHUNK} "
+                    f"time steps are derived from SimBench's complete grid and cached in "
+                    f"{cache_folder}.")
+        os.makedirs(cache_folder, exist_ok=True)
+        for chunk, flows in _iter_boundary_flows([range(start, start + _BOUNDARY_FLOW_CHUNK) for
+                                                  start in missing]):
+            for key, df in flows.items():
+                write_atomic(_boundary_flow_file(cache_folder, key, chunk.start),
+                             lambda f: df.astype(np.float32).to_parquet(f), "wb")
+
+    loads = net.load.index[element_groups(net, "load").values == "ExtL"]
+    profiles = dict()
+    for key in _BOUNDARY_FLOW_KEYS:
+        df = pd.concat([pd.read_parquet(_boundary_flow_file(cache_folder, key, start)) for start
+                        in starts])
+        df = df.loc[df.index.isin(time_steps), net.load.name.loc[loads].values]
+        df.columns = loads
+        profiles[key] = df
+    return profiles
+
+
+def simbench_grid(code:str=SIMBENCH_CODE) -> pp.pandapowerNet:
+    """Returns SimBench's grid of the code including its relative profiles. The FutureWarning of
+    pandas about the concatenation of empty DataFrames by simbench's converter is suppressed."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=FutureWarning,
+                                message="The behavior of DataFrame concatenation with empty")
+        return sb.get_simbench_net(code)
+
+
+def _boundary_flow_file(cache_folder:str, key:str, start:int) -> str:
+    fp = fingerprint([sb.__version__, SIMBENCH_CODE, key, _BOUNDARY_FLOW_CHUNK])
+    return os.path.join(cache_folder, f"boundary_flows-{key}-{start}-{fp[:16]}.parquet")
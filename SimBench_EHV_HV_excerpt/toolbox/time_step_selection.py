@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TimeSteps:
+    """Selection of time steps which is mapped to positions of the (time step) index of profiles.
+    Ranges, slices and explicit time steps whose positions are equidistant and increasing are
+    mapped to positional slices, so that selecting them from the profiles returns views instead of
+    copies. Explicit time steps are returned in the given order. Time steps which are not in the
+    index are neglected.
+
+    Parameters
+    ----------
+    selection : typing.Any, optional
+        one of
+            True -> all time steps;
+            False -> no time step;
+            int -> one time step;
+            range, slice -> time steps from start to stop (exclusive, None for the end of the
+            index) with step, e.g. every 4th quarter-hour: slice(None, None, 4);
+            list, np.ndarray, pd.Index of integers -> explicit time steps;
+            np.ndarray of booleans -> positional mask of the index;
+            pd.Series of booleans -> time steps which are True;
+            TimeSteps -> the same selection;
+        by default True
+
+    Example
+    -------
+    >>> TimeSteps(range(96, 192)).select(net.profiles["load.p_mw"])  # view of the 2nd day
+    >>> TimeSteps.every(4).resolve(net.profiles)  # full hours
+    >>> reduce_profiles_by_time_steps(net.profiles, TimeSteps([2, 1]))  # in this order
+    """
+
+    def __init__(self, selection=True):
+        if isinstance(selection, TimeSteps):
+            self.kind, self.selection = selection.kind, selection.selection
+        elif isinstance(selection, (bool, np.bool_)):
+            self.kind, self.selection = ("all", None) if selection else ("labels", np.array(
+                [], dtype=np.int64))
+        elif isinstance(selection, (int, np.integer)):
+            self.kind, self.selection = "labels", np.array([selection], dtype=np.int64)
+        elif isinstance(selection, range) and selection.step > 0:
+            self.kind, self.selection = "slice", slice(selection.start, selection.stop,
+                                                       selection.step)
+        elif isinstance(selection, slice):
+            if selection.step is not None and selection.step <= 0:
+                raise ValueError("Only slices with positive steps are supported.")
+            self.kind, self.selection = "slice", selection
+        elif isinstance(selection, pd.Series) and pd.api.types.is_bool_dtype(selection):
+            self.kind, self.selection = "labels", selection.index[selection.values].values
+        else:
+            values = np.asarray(selection)
+            if values.dtype == bool:
+                self.kind, self.selection = "mask", values
+            elif not len(values) or pd.api.types.is_integer_dtype(values):
+                self.kind, self.selection = "labels", values.astype(np.int64)
+            else:
+                raise TypeError(f"Time steps of type {type(selection)} are not supported.")
+
+    @classmethod
+    def every(cls, n:int, start:int|None=None, stop:int|None=None):
+        """Returns a selection of every n-th time step from start to stop."""
+        return cls(slice(start, stop, n))
+
+    @property
+    def is_all(self) -> bool:
+        return self.kind == "all"
+
+    @property
+    def is_mask(self) -> bool:
+        return self.kind == "mask"
+
+    def positions(self, index:pd.Index) -> slice|np.ndarray:
+        """Returns the positions of the selected time steps in the index as slice, if possible,
+        or as integer array."""
+        if self.kind == "all":
+            return slice(None)
+        elif self.kind == "mask":
+            if len(self.selection) != len(index):
+                raise ValueError(f"The mask of {len(self.selection)} time steps does not match "
+                                 f"the {len(index)} time steps of the index.")
+            return _as_slice(np.flatnonzero(self.selection))
+        elif self.kind == "slice":
+            start, stop, step = self.selection.start, self.selection.stop, \
+                self.selection.step or 1
+            if not len(index):
+                return slice(0, 0)
+            if _is_contiguous(index):
+                first = int(index[0])
+                start = first if start is None else start
+                if start < first:  # first time step of the stride within the index
+                    start += -((start - first) // step) * step
+                stop = first + len(index) if stop is None else min(stop, first + len(index))
+                return slice(start - first, max(stop - first, start - first), step)
+            labels = np.arange(index.min() if start is None else start,
+                               index.max() + 1 if stop is None else stop, step)
+            return _as_slice(_label_positions(index, labels))
+        else:
+            return _as_slice(_label_positions(index, self.selection))
+
+    def resolve(self, index:pd.Index|dict[str, pd.DataFrame]) -> pd.Index:
+        """Returns the selected time steps of the index or, if profiles are given, of the index of
+        the profiles with the most time steps."""
+        if isinstance(index, dict):
+            index = profiles_index(index)
+        return index[self.positions(index)]
+
+    def select(self, df:pd.DataFrame) -> pd.DataFrame:
+        """Returns the selected rows of df, as view if the positions are a slice."""
+        return df.iloc[self.positions(df.index)]
+
+    def __repr__(self) -> str:
+        if self.kind == "all":
+            return "TimeSteps(True)"
+        elif self.kind == "mask":
+            return f"TimeSteps(mask of {self.selection.sum()}/{len(self.selection)})"
+        return f"TimeSteps({self.selection!r})"
+
+
+def profiles_index(profiles:dict[str, pd.DataFrame]) -> pd.Index:
+    """Returns the index of the profile with the most time steps."""
+    if not len(profiles):
+        return pd.Index([], dtype=np.int64)
+    return max(profiles.values(), key=lambda df: df.shape[0]).index
+
+
+def _is_contiguous(index:pd.Index) -> bool:
+    if isinstance(index, pd.RangeIndex):
+        return index.step == 1
+    return pd.api.types.is_integer_dtype(index) and index.is_monotonic_increasing and \
+        int(index[-1]) - int(index[0]) == len(index) - 1
+
+
+def _label_positions(index:pd.Index, labels:np.ndarray) -> np.ndarray:
+    if _is_contiguous(index):
+        positions = np.asarray(labels, dtype=np.int64) - int(index[0])
+        return positions[(positions >= 0) & (positions < len(index))]
+    positions = index.get_indexer(labels)
+    return positions[positions >= 0]
+
+
+def _as_slice(positions:np.ndarray) -> slice|np.ndarray:
+    """Converts equidistant increasing positions to a slice."""
+    if not len(positions):
+        return slice(0, 0)
+    if len(positions) == 1:
+        return slice(positions[0], positions[0] + 1)
+    steps = np.diff(positions)
+    if steps[0] > 0 and (steps == steps[0]).all():
+        return slice(positions[0], positions[-1] + 1, steps[0])
+    return positions
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# branch tables with their bus columns which are converted to edges
+_BRANCHES = {
+    "line": [("from_bus", "to_bus")],
+    "impedance": [("from_bus", "to_bus")],
+    "dcline": [("from_bus", "to_bus")],
+    "trafo": [("hv_bus", "lv_bus")],
+    "trafo3w": [("hv_bus", "mv_bus"), ("hv_bus", "lv_bus"), ("mv_bus", "lv_bus")],
+}
+_SWITCH_ET = {"line": "l", "trafo": "t", "trafo3w": "t3"}
+
+
+class TopologyIndex:
+    """Topology of a net as sparse adjacency matrix which is built once and answers connectivity
+    queries in vectorized form via scipy.sparse.csgraph.connected_components(). The queries follow
+    the semantics of pandapower.topology.connected_component(): buses in notravbuses are included
+    into the components but not traversed. The connected components are cached per set of
+    notravbuses.
+
+    In accordance to pandapower.topology.create_nxgraph(), out of service elements are neglected
+    as well as branches with open switches. Closed bus-bus switches connect their buses.
+
+    Example
+    -------
+    >>> topology = TopologyIndex(net)
+    >>> topology.connected_buses([104, 1902], notravbuses={68, 106})
+    >>> topology.labels(notravbuses={68, 106})
+    """
+
+    def __init__(self, net:pp.pandapowerNet, respect_switches:bool=True):
+        self.buses = net.bus.index
+        self._labels = dict()
+        bus_in_service = net.bus.in_service.values.astype(bool)
+
+        f_buses, t_buses = list(), list()
+        for table, bus_columns in _BRANCHES.items():
+            if table not in net.keys() or not isinstance(net[table], pd.DataFrame) or \
+                    not net[table].shape[0]:
+                continue
+            in_service = net[table].in_service.values.astype(bool)
+            if respect_switches and table in _SWITCH_ET.keys():
+                open_sw = net.switch.loc[(net.switch.et == _SWITCH_ET[table]) &
+                                         ~net.switch.closed.astype(bool)]
+                in_service &= ~net[table].index.isin(open_sw.element)
+            for f_col, t_col in bus_columns:
+                f_buses.append(net[table][f_col].values[in_service])
+                t_buses.append(net[table][t_col].values[in_service])
+        if net.switch.shape[0]:
+            bus_sw = (net.switch.et == "b").values
+            if respect_switches:
+                bus_sw &= net.switch.closed.values.astype(bool)
+            f_buses.append(net.switch.bus.values[bus_sw])
+            t_buses.append(net.switch.element.values[bus_sw])
+
+        f_pos = self.positions(np.concatenate(f_buses)) if len(f_buses) else np.array([], int)
+        t_pos = self.positions(np.concatenate(t_buses)) if len(t_buses) else np.array([], int)
+        in_service = bus_in_service[f_pos] & bus_in_service[t_pos]
+        self._edges = (f_pos[in_service], t_pos[in_service])
+        self.adjacency = self._adjacency()
+
+    def _adjacency(self, keep:np.ndarray|None=None) -> csr_matrix:
+        f_pos, t_pos = self._edges
+        if keep is not None:
+            kept_edges = keep[f_pos] & keep[t_pos]
+            f_pos, t_pos = f_pos[kept_edges], t_pos[kept_edges]
+        n = len(self.buses)
+        return csr_matrix(coo_matrix((np.ones(2*len(f_pos), dtype=bool), (
+            np.concatenate([f_pos, t_pos]), np.concatenate([t_pos, f_pos]))), shape=(n, n)))
+
+    def positions(self, buses) -> np.ndarray:
+        """Returns the positions of the given bus indices in net.bus."""
+        positions = self.buses.get_indexer(pd.Index(buses))
+        if np.any(positions < 0):
+            raise KeyError("The topology includes not all of the given buses.")
+        return positions
+
+    def _notrav_mask(self, notravbuses) -> np.ndarray:
+        mask = np.zeros(len(self.buses), dtype=bool)
+        if notravbuses is not None and len(notravbuses):
+            mask[self.positions(list(notravbuses))] = True
+        return mask
+
+    def _component_labels(self, notravbuses) -> np.ndarray:
+        key = frozenset() if notravbuses is None else frozenset(notravbuses)
+        if key not in self._labels.keys():
+            _, labels = connected_components(self._adjacency(~self._notrav_mask(key)),
+                                             directed=False)
+            self._labels[key] = labels
+        return self._labels[key]
+
+    def labels(self, notravbuses=None) -> pd.Series:
+        """Returns the component number per bus if the edges at notravbuses are cut. Each bus of
+        notravbuses forms its own component.
+        """
+        return pd.Series(self._component_labels(notravbuses), index=self.buses)
+
+    def connected_mask(self, buses, notravbuses=None) -> np.ndarray:
+        """Returns a boolean mask (in order of net.bus) of all buses which are connected to at
+        least one of the given buses without traversing notravbuses.
+        """
+        notrav = self._notrav_mask(notravbuses)
+        labels = self._component_labels(notravbuses)
+        mask = np.zeros(len(self.buses), dtype=bool)
+        mask[self.positions(list(buses))] = True
+
+        # as in pandapower's connected_component(), the start buses are traversed in any case
+        start_notrav = mask & notrav
+        if start_notrav.any():
+            mask |= self.adjacency[start_notrav].sum(axis=0).A1 > 0
+        mask |= np.isin(labels, labels[mask & ~notrav])
+
+        # notravbuses are reached but not traversed
+        mask |= notrav & (self.adjacency @ (mask & ~notrav) > 0)
+        return mask
+
+    def connected_buses(self, buses, notravbuses=None) -> set[int]:
+        """Returns all buses which are connected to at least one of the given buses without
+        traversing notravbuses, i.e. the union of
+        pandapower.topology.connected_component(mg, bus, notravbuses) for all given buses.
+        """
+        return set(self.buses[self.connected_mask(buses, notravbuses)].tolist())
+
+    def component(self, bus:int, notravbuses=None) -> set[int]:
+        """Returns the buses connected to the given bus without traversing notravbuses."""
+        return self.connected_buses([bus], notravbuses)
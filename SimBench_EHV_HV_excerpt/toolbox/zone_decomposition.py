@@ -0,0 +1,296 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import typing
+import numpy as np
+import pandas as pd
+import pandapower as pp
+
+try:
+    import pandaplan.core.pplog as logging
+except ImportError:
+    import logging
+
+logger = logging.getLogger(__name__)
+
+# state of the worker processes (or, if n_jobs=1, of the main process)
+_subnets = None
+_layouts = None
+_arrays = None
+_shms = list()
+
+
+class ZoneDecomposition:
+    """Decomposition of a net into one subnet per zone (net.bus.zone). Each subnet contains the
+    buses and elements of its zone as well as the branches connecting it to other zones. The
+    foreign buses of these branches are boundary buses whose voltages are given by ext_grids
+    named "equivalent grid <bus>".
+
+    The voltages of all boundary buses form the boundary vector (boundary_buses x [vm_pu,
+    va_degree]). Per-zone computations run by run() get their boundary voltages from this vector
+    and return the resulting voltages of the zone's own boundary buses to a result vector. With
+    n_jobs > 1, the subnets are sent once to persistent worker processes and both vectors are
+    exchanged via shared memory, so that repeated runs (e.g. the iterations of
+    distributed_power_flow()) do not pickle nets.
+
+    Parameters
+    ----------
+    net : pp.pandapowerNet
+        net with zones, e.g. from SimBench_for_phd(). With wbb=True, the neutral buses form the
+        zone 0
+    zones : list | None, optional
+        zones to build subnets for, by default all zones
+    include_profiles : bool, optional
+        whether the subnets get the profiles of their elements, by default True
+
+    Example
+    -------
+    >>> with ZoneDecomposition(net) as zd:
+    ...     res_bus = zd.distributed_power_flow(n_jobs=4)
+    ...     losses = zd.run(zone_losses, n_jobs=4)  # zone_losses(net, zone) defined on module level
+    """
+
+    def __init__(self, net:pp.pandapowerNet, zones:list|None=None, include_profiles:bool=True):
+        self.zones = pd.Index(sorted(net.bus.zone.unique()) if zones is None else zones,
+                              name="zone")
+        net_wo_profiles = pp.pandapowerNet({key: value for key, value in net.items() if key !=
+                                            "profiles"})
+        tie_buses = {zone: _foreign_buses(net, zone) for zone in self.zones}
+        self.boundary_buses = pd.Index(sorted(set().union(*tie_buses.values())), name="bus")
+        self.owner = net.bus.zone.loc[self.boundary_buses]
+
+        self.subnets = dict()
+        self._layouts = dict()
+        for zone in self.zones:
+            subnet = _zone_subnet(net_wo_profiles, zone, tie_buses[zone])
+            if include_profiles and "profiles" in net.keys():
+                subnet.profiles = {key: df[df.columns.intersection(subnet[key.split(".")[
+                    0]].index)] for key, df in net.profiles.items()}
+            own = self.boundary_buses[self.owner.values == zone]
+            eq = subnet.ext_grid.index[subnet.ext_grid.name.str.startswith("equivalent grid")]
+            self._layouts[zone] = {
+                "ext_grids": eq,
+                "eq_positions": self.boundary_buses.get_indexer(subnet.ext_grid.bus.loc[eq]),
+                "own_buses": own,
+                "own_positions": self.boundary_buses.get_indexer(own)}
+            self.subnets[zone] = subnet
+
+        self.values = np.column_stack([np.ones(len(self.boundary_buses)), np.zeros(len(
+            self.boundary_buses))])
+        self.results = np.full(self.values.shape, np.nan)
+        self._executor = None
+        self._n_jobs = None
+        self._shm = list()
+
+    def __repr__(self) -> str:
+        return f"ZoneDecomposition(zones {list(self.zones)}, {len(self.boundary_buses)} " + \
+            "boundary buses)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def boundary_values(self, net:pp.pandapowerNet) -> np.ndarray:
+        """Returns the boundary vector from power flow results of the complete net."""
+        return net.res_bus.loc[self.boundary_buses, ["vm_pu", "va_degree"]].to_numpy(
+            dtype=np.float64)
+
+    def run(self, fct:typing.Callable, zones:list|None=None,
+            boundary_values:np.ndarray|None=None, n_jobs:int=1,
+            **kwargs) -> dict[typing.Any, typing.Any]:
+        """Runs fct(subnet, zone, **kwargs) for the zones concurrently and returns the results
+        per zone. Before, the equivalent grids of each subnet get their voltages from the
+        boundary vector. If fct runs a converged power flow, the resulting voltages of the
+        zone's own boundary buses are written to self.results.
+
+        Parameters
+        ----------
+        fct : typing.Callable
+            function of a subnet and its zone. With n_jobs > 1, fct and the results must be
+            picklable, i.e. fct must be defined on module level
+        zones : list | None, optional
+            zones to run, by default all zones
+        boundary_values : np.ndarray | None, optional
+            boundary vector, by default self.values (initially flat voltages)
+        n_jobs : int, optional
+            number of worker processes, by default 1
+        """
+        zones = self.zones if zones is None else zones
+        if boundary_values is not None:
+            self.values[:] = boundary_values
+        if n_jobs == 1:
+            _init_worker(self.subnets, self._layouts, (self.values, self.results))
+            try:
+                return {zone: _run_zone(zone, fct, kwargs) for zone in zones}
+            finally:
+                _init_worker(None, None, None)
+        executor = self._pool(n_jobs)
+        return dict(zip(zones, executor.map(_run_zone, zones, [fct]*len(zones),
+                                            [kwargs]*len(zones))))
+
+    def distributed_power_flow(self, boundary_values:np.ndarray|None=None,
+                               tol_vm_pu:float=1e-6, tol_va_degree:float=1e-4,
+                               max_iter:int=100, acceleration:int=8, n_jobs:int=1,
+                               **kwargs) -> pd.DataFrame:
+        """Runs the power flows of all zones concurrently and exchanges the boundary voltages
+        after each iteration (Jacobi iteration), until the boundary voltages converge. Given the
+        boundary voltages of the complete net's power flow, cf. boundary_values(), the results
+        are reproduced in one iteration.
+
+        Parameters
+        ----------
+        boundary_values : np.ndarray | None, optional
+            initial boundary vector, by default self.values (initially flat voltages)
+        tol_vm_pu : float, optional
+            tolerance of the boundary voltage magnitudes, by default 1e-6
+        tol_va_degree : float, optional
+            tolerance of the boundary voltage angles, by default 1e-4
+        max_iter : int, optional
+            maximum number of iterations, by default 100
+        acceleration : int, optional
+            number of previous iterations considered by the Anderson acceleration of the
+            boundary voltage updates. 0 results in plain Jacobi iterations, which converge slowly
+            since the angles are only exchanged via the tie branches, by default 8
+        n_jobs : int, optional
+            number of worker processes, by default 1
+
+        Other Parameters
+        ----------------
+        kwargs
+            key word arguments of pp.runpp()
+
+        Returns
+        -------
+        pd.DataFrame
+            vm_pu and va_degree of the buses of all zones
+        """
+        if boundary_values is not None:
+            self.values[:] = boundary_values
+        inputs, outputs = list(), list()
+        for i in range(max_iter):
+            self.results[:] = np.nan
+            res = self.run(_zone_power_flow, n_jobs=n_jobs, **kwargs)
+            if np.isnan(self.results).any():
+                raise ValueError("The boundary values are incomplete. Each zone of boundary buses "
+                                 "must be part of the decomposition.")
+            diff = np.abs(self.results - self.values).max(axis=0)
+            if diff[0] <= tol_vm_pu and diff[1] <= tol_va_degree:
+                self.values[:] = self.results
+                logger.info(f"The distributed power flow converged after {i+1} iterations.")
+                break
+            inputs = (inputs + [self.values.ravel().copy()])[-(acceleration+1):]
+            outputs = (outputs + [self.results.ravel().copy()])[-(acceleration+1):]
+            self.values[:] = _anderson_update(inputs, outputs).reshape(self.values.shape)
+        else:
+            raise pp.LoadflowNotConverged(
+                f"The boundary voltages did not converge within {max_iter} iterations (maximum "
+                f"deviations {diff[0]:.2e} pu and {diff[1]:.2e} degree).")
+        return pd.concat(res.values()).sort_index()
+
+    def close(self) -> None:
+        """Shuts down the worker processes and releases the shared memory."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            values, results = self.values.copy(), self.results.copy()
+            self.values, self.results = values, results
+            for shm in self._shm:
+                shm.close()
+                shm.unlink()
+            self._shm = list()
+
+    def _pool(self, n_jobs:int) -> ProcessPoolExecutor:
+        if self._executor is not None and self._n_jobs == n_jobs:
+            return self._executor
+        self.close()
+        self._shm = list()
+        arrays = list()
+        for array in [self.values, self.results]:
+            shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            shared[:] = array
+            self._shm.append(shm)
+            arrays.append(shared)
+        self.values, self.results = arrays
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_jobs, initializer=_init_worker, initargs=(
+                self.subnets, self._layouts, tuple((shm.name, self.values.shape) for shm in
+                                                    self._shm)))
+        self._n_jobs = n_jobs
+        return self._executor
+
+
+def _foreign_buses(net:pp.pandapowerNet, zone) -> set:
+    """Returns the buses of other zones connected to the zone by branches."""
+    buses = set()
+    zone_buses = net.bus.index[net.bus.zone == zone]
+    for et, bus_cols in _branch_bus_columns(net).items():
+        in_zone = net[et][bus_cols].isin(zone_buses)
+        ties = in_zone.any(axis=1) & ~in_zone.all(axis=1)
+        buses |= set(net[et].loc[ties, bus_cols].values.ravel()) - set(zone_buses)
+    return buses
+
+
+def _branch_bus_columns(net:pp.pandapowerNet) -> dict[str, list[str]]:
+    bus_cols = dict()
+    for et, col in pp.element_bus_tuples(bus_elements=False, branch_elements=True):
+        if et in net.keys() and isinstance(net[et], pd.DataFrame) and net[et].shape[0]:
+            bus_cols.setdefault(et, list()).append(col)
+    return bus_cols
+
+
+def _zone_subnet(net:pp.pandapowerNet, zone, foreign_buses:set) -> pp.pandapowerNet:
+    zone_buses = net.bus.index[net.bus.zone == zone]
+    subnet = pp.select_subnet(net, zone_buses.union(foreign_buses))
+    foreign = pd.Index(sorted(foreign_buses), dtype=np.int64)
+
+    # the foreign buses only keep the branches to the zone and get equivalent grids
+    for et, col in pp.element_bus_tuples(bus_elements=True, branch_elements=False):
+        if et in subnet.keys() and isinstance(subnet[et], pd.DataFrame) and subnet[et].shape[0]:
+            subnet[et] = subnet[et].loc[~subnet[et][col].isin(foreign)]
+    for et, bus_cols in _branch_bus_columns(subnet).items():
+        subnet[et] = subnet[et].loc[subnet[et][bus_cols].isin(zone_buses).any(axis=1)]
+    for bus in foreign:
+        pp.create_ext_grid(subnet, bus, vm_pu=1., va_degree=0., name=f"equivalent grid {bus}")
+    subnet.name = f"zone {zone}"
+    return subnet
+
+
+def _anderson_update(inputs:list[np.ndarray], outputs:list[np.ndarray]) -> np.ndarray:
+    """Returns the next input of the fixed point iteration outputs[-1] = G(inputs[-1]) by
+    Anderson acceleration, i.e. the combination of the previous outputs whose residuals
+    (output - input) have the least squares."""
+    if len(inputs) < 2:
+        return outputs[-1]
+    residuals = np.array(outputs) - np.array(inputs)
+    gamma = np.linalg.lstsq(np.diff(residuals, axis=0).T, residuals[-1], rcond=None)[0]
+    return outputs[-1] - np.diff(np.array(outputs), axis=0).T @ gamma
+
+
+def _init_worker(subnets:dict|None, layouts:dict|None, arrays:tuple|None) -> None:
+    global _subnets, _layouts, _arrays, _shms
+    _subnets, _layouts = subnets, layouts
+    if arrays is not None and isinstance(arrays[0], tuple):
+        _shms = [shared_memory.SharedMemory(name=name) for name, _ in arrays]
+        arrays = tuple(np.ndarray(shape, dtype=np.float64, buffer=shm.buf) for shm, (_, shape) in
+                       zip(_shms, arrays))
+    _arrays = arrays
+
+
+def _run_zone(zone, fct:typing.Callable, kwargs:dict):
+    values, results = _arrays
+    net, layout = _subnets[zone], _layouts[zone]
+    net.ext_grid.loc[layout["ext_grids"], "vm_pu"] = values[layout["eq_positions"], 0]
+    net.ext_grid.loc[layout["ext_grids"], "va_degree"] = values[layout["eq_positions"], 1]
+    net.converged = False
+    output = fct(net, zone, **kwargs)
+    if net.converged and len(layout["own_buses"]):
+        results[layout["own_positions"]] = net.res_bus.loc[layout["own_buses"], [
+            "vm_pu", "va_degree"]].values
+    return output
+
+
+def _zone_power_flow(net:pp.pandapowerNet, zone, **kwargs) -> pd.DataFrame:
+    pp.runpp(net, **kwargs)
+    return net.res_bus.loc[net.bus.zone == zone, ["vm_pu", "va_degree"]]